@@ -0,0 +1,62 @@
+"""Session creation and per-turn crew construction overhead.
+
+Run from the crew/ directory:
+
+    python benchmarks/bench_crew_resources.py [--sessions 20] [--turns 50]
+
+"Before" builds a CookCrew per session and a crew per turn the way the UI used
+to. "After" uses the process-wide shared templates and copies a crew per turn.
+No kickoff is run, so no API calls are made.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Constructing clients needs keys to be present, but nothing is sent
+os.environ.setdefault("GEMINI_API_KEY", "benchmark")
+os.environ.setdefault("SERPER_API_KEY", "benchmark")
+
+from src.crew.cook_crew import CookCrew, get_shared_crews  # noqa: E402
+
+
+def timed(fn, n):
+    samples = []
+    for _ in range(n):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    print(f"  {name:<28} p50 {statistics.median(samples):8.2f} ms   p95 {p95:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--turns", type=int, default=50)
+    args = parser.parse_args()
+
+    print("Before (per-session CookCrew, crew rebuilt per turn):")
+    report("session creation", timed(CookCrew, args.sessions))
+    session = CookCrew()
+    report("per turn: cooking_crew()", timed(session.cooking_crew, args.turns))
+
+    print("After (shared templates, crew copied per turn):")
+    start = time.perf_counter()
+    shared = get_shared_crews()
+    print(f"  {'process warm-up (once)':<28} {(time.perf_counter() - start) * 1000:8.2f} ms")
+    report("session creation", timed(get_shared_crews, args.sessions))
+    report("per turn: cooking_crew()", timed(shared.cooking_crew, args.turns))
+    report("per turn: planning_crew()", timed(shared.planning_crew, args.turns))
+
+
+if __name__ == "__main__":
+    main()
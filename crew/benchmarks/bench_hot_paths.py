@@ -0,0 +1,243 @@
+"""Microbenchmarks for the pure-Python code that runs on every chat turn or rerun.
+
+Run from the crew/ directory:
+
+    python benchmarks/bench_hot_paths.py                     # print results
+    python benchmarks/bench_hot_paths.py --write-baseline    # save benchmarks/baseline_hot_paths.json
+    python benchmarks/bench_hot_paths.py --compare           # flag regressions against the baseline
+
+Histories of 10, 100 and 1000 messages are generated from Gemini-shaped
+outputs: bare, fenced and prose-wrapped JSON, plain text answers and
+malformed JSON, as free-form answers still arrive, plus the CookingStep JSON
+the final_output guardrail produces. Neither Streamlit nor the crew is
+imported.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.crew.context_builder import ContextBuilder  # noqa: E402
+from src.crew.intent_router import get_router  # noqa: E402
+from src.crew.messages import (  # noqa: E402
+    build_message, clean_for_speech, format_recipe_step, parse_cooking_step, parse_json_response,
+)
+from src.crew.quantities import scale_texts  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline_hot_paths.json")
+HISTORY_SIZES = (10, 100, 1000)
+REGRESSION_TOLERANCE = 1.5
+
+DISHES = ["pasta carbonara", "chicken tikka masala", "banana bread", "beef stew", "pad thai",
+          "french omelette", "mushroom risotto", "chocolate chip cookies", "fish tacos", "ramen"]
+INSTRUCTIONS = [
+    "Bring a large pot of salted water to a rolling boil",
+    "Whisk the eggs with the grated pecorino until smooth",
+    "Dice the onion finely and mince two cloves of garlic",
+    "Sear the meat in batches so the pan stays hot",
+    "Fold the dry ingredients into the wet ones without overmixing",
+]
+DETAILS = [
+    "Use about 1 tablespoon of salt per 4 liters of water (it should taste like the sea).",
+    "Keep the heat at medium - if the butter browns too fast, lower it.",
+    "A few lumps are fine; overmixing makes the crumb tough.",
+]
+QUESTIONS = [
+    "How do I make {dish}?", "next", "done", "What can I substitute for eggs in {dish}?",
+    "how long should it rest?", "repeat that please", "can I use olive oil instead of butter?",
+    "I want a {dish} recipe", "what temperature for the oven?",
+]
+
+
+def recipe_markdown(step, total):
+    return (f"### Current Step: Step {step}\n**{random.choice(INSTRUCTIONS)}.**\n*{random.choice(DETAILS)}*\n"
+            f"*Let me know when you're done with this step!*\n\n"
+            f"**Progress:** Step {step} of {total} | Next up: {random.choice(INSTRUCTIONS).lower()}")
+
+
+def gemini_output(step, total):
+    """One raw final_output answer in one of the shapes the model actually produces"""
+    payload = {"cook_recipe": recipe_markdown(step, total),
+               "notes_making": f"Step {step}: {random.choice(INSTRUCTIONS)}. {random.choice(DETAILS)}"}
+    body = json.dumps(payload, indent=2)
+    shape = random.random()
+    if shape < 0.35:
+        return body
+    if shape < 0.55:
+        return f"```json\n{body}\n```"
+    if shape < 0.65:
+        return f"Here is the next step for you:\n{body}\nEnjoy your cooking!"
+    if shape < 0.72:
+        # Raw newlines inside strings, as Gemini often emits
+        return body.replace("\\n", "\n")
+    if shape < 0.80:
+        return body[:random.randint(20, len(body) - 5)]  # truncated
+    if shape < 0.85:
+        return body.replace('",\n  "notes_making"', '",,\n  "notes_making"')  # stray comma
+    if shape < 0.90:
+        return "{" + body  # unbalanced braces
+    return (f"Sure! For {random.choice(DISHES)} you can {random.choice(INSTRUCTIONS).lower()}. "
+            f"{random.choice(DETAILS)} Let me know if you have more questions.")
+
+
+def structured_output(step, total):
+    """One final_output result as normalized by the guardrail; one in ten is a non-step answer"""
+    instruction = random.choice(INSTRUCTIONS)
+    if random.random() < 0.1:
+        step = total = 0
+    return json.dumps({"step_number": step, "total_steps": total, "instruction": instruction,
+                       "details": random.choice(DETAILS), "next_up": random.choice(INSTRUCTIONS).lower(),
+                       "notes": f"Step {step}: {instruction}. {random.choice(DETAILS)}"}, separators=(",", ":"))
+
+
+def build_history(size, seed=11):
+    random.seed(seed + size)
+    raw, structured, questions = [], [], []
+    total = 12
+    for i in range(size):
+        questions.append(random.choice(QUESTIONS).format(dish=random.choice(DISHES)))
+        raw.append(gemini_output(i % total + 1, total))
+        structured.append(structured_output(i % total + 1, total))
+    messages = [build_message(q, r) for q, r in zip(questions, structured)]
+    notes = [m.notes for m in messages if m.notes]
+    return {"raw": raw, "structured": structured, "questions": questions, "messages": messages,
+            "notes": notes, "recipes": [m.step_text for m in messages if m.step_number]}
+
+
+def legacy_brace_scan(answer):
+    """The brace-matching JSON scan the render loop used to run on every message, every rerun"""
+    try:
+        start_idx = answer.find('{')
+        if start_idx != -1:
+            brace_count = 0
+            end_idx = start_idx
+            for i, char in enumerate(answer[start_idx:], start_idx):
+                if char == '{':
+                    brace_count += 1
+                elif char == '}':
+                    brace_count -= 1
+                    if brace_count == 0:
+                        end_idx = i
+                        break
+            if end_idx > start_idx:
+                json_data = json.loads(answer[start_idx:end_idx + 1])
+                if 'cook_recipe' in json_data:
+                    return json_data['cook_recipe']
+    except (json.JSONDecodeError, ValueError):
+        pass
+    return None
+
+
+def cases(history):
+    """name -> (callable, items processed per call)"""
+    router = get_router()
+    raw, structured = history["raw"], history["structured"]
+    questions, messages = history["questions"], history["messages"]
+    recipes, notes = history["recipes"], history["notes"]
+    # Steady state between turns: every note already folded in, prefix cached
+    builder = ContextBuilder()
+    builder.build(messages, notes)
+    return {
+        "parse_json_response": (lambda: [parse_json_response(r) for r in raw], len(raw)),
+        "legacy_brace_scan": (lambda: [legacy_brace_scan(r) for r in raw], len(raw)),
+        "parse_cooking_step": (lambda: [parse_cooking_step(r) for r in structured], len(structured)),
+        "build_message": (lambda: [build_message(q, r) for q, r in zip(questions, structured)], len(structured)),
+        "format_recipe_step": (lambda: [format_recipe_step(r) for r in recipes], len(recipes)),
+        "clean_for_speech": (lambda: [clean_for_speech(r) for r in raw], len(raw)),
+        "detect_topic": (lambda: [router.detect_topic(q) for q in questions], len(questions)),
+        "context_builder": (lambda: builder.build(messages, notes), 1),
+        "render_rerun": (lambda: sum(len(m.html) for m in messages), len(messages)),
+        "scale_texts": (lambda: scale_texts(notes, 1.5), len(notes)),
+    }
+
+
+def measure(fn, repeat):
+    """Best per-call time; cheap calls are looped so each sample runs for at least 0.2 s"""
+    timer = timeit.Timer(fn)
+    loops, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=loops)) / loops
+
+
+def run(repeat):
+    get_router()  # build the gazetteer outside the timings
+    results = {}
+    for size in HISTORY_SIZES:
+        history = build_history(size)
+        for name, (fn, items) in cases(history).items():
+            seconds = measure(fn, repeat)
+            results[f"{name}[{size}]"] = {
+                "total_us": round(seconds * 1e6, 2),
+                "per_item_us": round(seconds * 1e6 / max(items, 1), 3),
+                "items": items,
+            }
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def machine_info():
+    """Where the numbers were measured; timings only compare on the same machine and Python"""
+    return {"platform": platform.platform(), "machine": platform.machine(),
+            "processor": platform.processor() or None, "cpus": os.cpu_count(),
+            "python": platform.python_version(), "implementation": platform.python_implementation()}
+
+
+def compare(results, baseline):
+    regressions = 0
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if not before or not before["total_us"]:
+            continue
+        ratio = result["total_us"] / before["total_us"]
+        flag = "  REGRESSION" if ratio > REGRESSION_TOLERANCE else ""
+        regressions += bool(flag)
+        print(f"  {name:<28} {before['total_us']:>12,.1f} -> {result['total_us']:>12,.1f} us  x{ratio:5.2f}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument("--write-baseline", action="store_true")
+    parser.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    results = run(args.repeat)
+    for name, result in results.items():
+        print(f"{name:<28} {result['total_us']:>12,.1f} us total  {result['per_item_us']:>9,.2f} us/item")
+
+    if args.compare:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"\nAgainst baseline from commit {baseline.get('commit')} (tolerance x{REGRESSION_TOLERANCE}):")
+        recorded = baseline.get("machine") or {"python": baseline.get("python")}
+        current = machine_info()
+        if any(recorded.get(key) != current[key] for key in ("platform", "machine", "python")):
+            print(f"  Note: baseline was recorded on {recorded.get('platform')} {recorded.get('machine')} "
+                  f"with Python {recorded.get('python')}; ratios are only indicative here")
+        if compare(results, baseline):
+            sys.exit(1)
+
+    if args.write_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump({"commit": git_commit(), "python": platform.python_version(), "machine": machine_info(),
+                       "repeat": args.repeat, "results": results}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Throughput benchmark for the local intent router.
+
+Run from the crew/ directory:
+
+    python benchmarks/bench_intent_router.py [--queries 5000] [--repeat 5]
+
+Generates a corpus of real-style kitchen queries and compares the router
+against the regex topic detection it replaced.
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.crew.intent_router import DISHES_FILE, IntentRouter  # noqa: E402
+
+NAVIGATION_QUERIES = [
+    "next", "done", "ready", "repeat this step", "ok I'm done", "next please", "what's next?",
+    "repeat that please", "done with this step", "ok next", "alright, ready", "say that again",
+]
+TOPIC_TEMPLATES = [
+    "How do I make {dish}?", "I want a {dish} recipe", "recipe for {dish}", "how to cook {dish}",
+    "Can you teach me to make {dish} tonight?", "{dish} please", "let's make {dish} for dinner",
+    "what's the best way to prepare {dish}", "give me an easy {dish} recipe",
+]
+SUBSTITUTION_TEMPLATES = [
+    "What can I substitute for {ingredient} in baking?", "I don't have {ingredient}, what can I use?",
+    "can I use {other} instead of {ingredient}?", "what's a good replacement for {ingredient}",
+    "how do I make {dish} without {ingredient}",
+]
+CONVERSION_TEMPLATES = [
+    "what is {n} g of {ingredient} in cups?", "how many tablespoons in {n} ml?", "make it for {n} people",
+    "convert {n} ounces to grams", "can you double the recipe?", "{n} fahrenheit in celsius",
+]
+QUESTION_TEMPLATES = [
+    "how long should I rest the dough?", "is the {ingredient} supposed to look like this?",
+    "why is my sauce splitting?", "should the pan be smoking?", "can I prep this the night before?",
+    "what does fold in mean?", "my {ingredient} burned a little, is that ok?", "how do I know it's done cooking?",
+]
+INGREDIENTS = [
+    "eggs", "butter", "milk", "buttermilk", "heavy cream", "sour cream", "flour", "sugar", "brown sugar",
+    "baking powder", "yeast", "garlic", "onion", "shallots", "olive oil", "parmesan", "pecorino", "guanciale",
+    "bacon", "soy sauce", "fish sauce", "lemon juice", "rice vinegar", "cornstarch", "honey", "yogurt",
+]
+
+
+def build_corpus(size, seed=7):
+    rng = random.Random(seed)
+    with open(DISHES_FILE, encoding="utf-8") as f:
+        dishes = [line.strip() for line in f if line.strip() and not line.startswith("#")]
+    # Roughly the mix we see in production: lots of navigation, then new dishes and questions
+    weighted = [
+        (0.40, lambda: rng.choice(NAVIGATION_QUERIES)),
+        (0.20, lambda: rng.choice(TOPIC_TEMPLATES).format(dish=rng.choice(dishes))),
+        (0.12, lambda: rng.choice(SUBSTITUTION_TEMPLATES).format(
+            ingredient=rng.choice(INGREDIENTS), other=rng.choice(INGREDIENTS), dish=rng.choice(dishes))),
+        (0.10, lambda: rng.choice(CONVERSION_TEMPLATES).format(n=rng.randint(2, 500), ingredient=rng.choice(INGREDIENTS))),
+        (0.18, lambda: rng.choice(QUESTION_TEMPLATES).format(ingredient=rng.choice(INGREDIENTS))),
+    ]
+    weights = [w for w, _ in weighted]
+    makers = [m for _, m in weighted]
+    return [rng.choices(makers, weights)[0]() for _ in range(size)]
+
+
+def legacy_detect_recipe_topic(query):
+    """The regex topic detection previously inlined in cooking_ui.py, kept for comparison"""
+    patterns = [
+        r'\b(?:recipe|cook|make|prepare)\s+(?:for\s+)?(?:a\s+)?(\w+(?:\s+\w+)?)',
+        r'\b(?:how to (?:make|cook|prepare))\s+(\w+(?:\s+\w+)?)',
+        r'\b(\w+(?:\s+\w+)?)\s+recipe\b',
+        r'\bwant\s+(?:a\s+)?(\w+(?:\s+\w+)?)\s+recipe\b'
+    ]
+    query_lower = query.lower()
+    for pattern in patterns:
+        matches = re.findall(pattern, query_lower)
+        if matches:
+            topic = matches[0].strip()
+            stop_words = {'the', 'a', 'an', 'some', 'good', 'best', 'easy', 'quick'}
+            topic_words = [word for word in topic.split() if word not in stop_words]
+            if topic_words:
+                return ' '.join(topic_words)
+    return None
+
+
+def timed(fn, corpus, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for query in corpus:
+            fn(query)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    router = IntentRouter()
+    build_ms = (time.perf_counter() - start) * 1000
+    corpus = build_corpus(args.queries)
+
+    route_s = timed(lambda q: router.route(q, "pasta carbonara"), corpus, args.repeat)
+    legacy_s = timed(legacy_detect_recipe_topic, corpus, args.repeat)
+    kinds = Counter(router.route(q, "pasta carbonara").kind for q in corpus)
+
+    print(f"Gazetteer: {len(router.gazetteer)} dishes, built in {build_ms:.1f} ms")
+    print(f"Corpus: {len(corpus)} queries, best of {args.repeat}")
+    print(f"Router:        {len(corpus) / route_s:>12,.0f} queries/s  {route_s / len(corpus) * 1e6:6.2f} us/query")
+    print(f"Legacy regex:  {len(corpus) / legacy_s:>12,.0f} queries/s  {legacy_s / len(corpus) * 1e6:6.2f} us/query (topic only)")
+    print("Intent mix:")
+    for kind, count in kinds.most_common():
+        print(f"  {kind:<13} {count / len(corpus):6.1%}")
+
+
+if __name__ == "__main__":
+    main()
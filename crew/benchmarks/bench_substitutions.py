@@ -0,0 +1,79 @@
+"""Load time and lookup latency of the local substitution index.
+
+Run from the crew/ directory:
+
+    python benchmarks/bench_substitutions.py [--queries 5000] [--repeat 5]
+
+Builds the index from config/substitutions.txt, then answers a corpus of
+substitution questions (known and unknown ingredients, with and without a
+usage context) and reports per-lookup latency percentiles.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.crew.substitutions import SubstitutionIndex  # noqa: E402
+
+TEMPLATES = [
+    "What can I substitute for {ingredient}?", "I don't have {ingredient}, what can I use?",
+    "can I use {other} instead of {ingredient} in my cake?", "what's a good replacement for {ingredient}",
+    "how do I make {dish} without {ingredient}", "I ran out of {ingredient} for the sauce",
+    "replace {ingredient} with something for frying", "swap {ingredient} in a salad dressing",
+]
+UNKNOWN = ["dragon fruit powder", "yuzu kosho", "black garlic oil", "sumac onions", "quail eggs yolks"]
+DISHES = ["pancakes", "brownies", "fried rice", "pasta carbonara", "caesar salad", "chicken curry", "banana bread"]
+
+
+def build_corpus(index, size, seed=7):
+    rng = random.Random(seed)
+    names = sorted(index._canonical)
+    corpus = []
+    for _ in range(size):
+        # Roughly one question in ten asks about an ingredient the index doesn't know
+        ingredient = rng.choice(UNKNOWN) if rng.random() < 0.1 else rng.choice(names)
+        corpus.append(rng.choice(TEMPLATES).format(
+            ingredient=ingredient, other=rng.choice(names), dish=rng.choice(DISHES)))
+    return corpus
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = SubstitutionIndex.from_file()
+    load_ms = (time.perf_counter() - start) * 1000
+    corpus = build_corpus(index, args.queries)
+
+    samples = []
+    answered = 0
+    for run in range(args.repeat):
+        for query in corpus:
+            start = time.perf_counter()
+            answer = index.answer(query, "pasta carbonara")
+            samples.append((time.perf_counter() - start) * 1e6)
+            if run == 0 and answer:
+                answered += 1
+    samples.sort()
+
+    stats = index.stats()
+    print(f"Index: {stats['ingredients']} ingredients, {stats['names']} names, "
+          f"{stats['substitutes']} substitutes, loaded in {load_ms:.1f} ms")
+    print(f"Corpus: {len(corpus)} questions x {args.repeat}, {answered / len(corpus):.1%} answered locally")
+    print(f"Lookup: p50 {statistics.median(samples):6.1f} us   p95 {percentile(samples, 0.95):6.1f} us   "
+          f"p99 {percentile(samples, 0.99):6.1f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Step audio tail latency with and without the hedged TTS scheduler.
+
+Run from the crew/ directory:
+
+    python benchmarks/bench_tts_scheduler.py [--steps 400] [--time-scale 0.01]
+
+Simulates a user stepping through recipes against two backends: a fast primary
+with a heavy tail that degrades (hangs until the timeout) for part of the run,
+and a slower but steady secondary. Compares the sequential fallback the UI used
+before (try the primary, wait for it to fail or time out, then the secondary)
+with TTSScheduler. Latencies are reported in simulated seconds; --time-scale
+shrinks them so the run takes seconds.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("TTS_CACHE_DIR", tempfile.mkdtemp(prefix="bench_tts_"))
+
+from src.crew import tts, tts_scheduler  # noqa: E402
+from src.crew.tts_scheduler import TTSScheduler  # noqa: E402
+
+TIMEOUT_S = 10.0  # per backend attempt
+
+
+class SimulatedBackend(tts.TTSBackend):
+    """Backend whose latency is drawn from a lognormal with a stalling tail"""
+
+    def __init__(self, name, median_s, sigma, stall_rate, scale, seed, local=False):
+        self.name = name
+        self.local = local
+        self.median_s = median_s
+        self.sigma = sigma
+        self.stall_rate = stall_rate
+        self.degraded = False
+        self.scale = scale
+        self.rng = random.Random(seed)
+        self.calls = 0
+
+    async def synthesize(self, text, voice=None):
+        self.calls += 1
+        stall_rate = 0.6 if self.degraded else self.stall_rate
+        if self.rng.random() < stall_rate:
+            await asyncio.sleep(TIMEOUT_S * 2 * self.scale)
+            raise TimeoutError(f"{self.name} stalled")
+        await asyncio.sleep(self.median_s * self.rng.lognormvariate(0, self.sigma) * self.scale)
+        return text.encode()
+
+
+def make_backends(scale):
+    tts._backends.clear()
+    primary = tts.register_backend(SimulatedBackend("Primary", 0.8, 0.5, 0.03, scale, seed=1))
+    secondary = tts.register_backend(SimulatedBackend("Secondary", 1.2, 0.3, 0.0, scale, seed=2, local=True))
+    return primary, secondary
+
+
+async def sequential(text, backends, scale):
+    for backend in backends:
+        try:
+            audio_bytes = await asyncio.wait_for(backend.synthesize(text), TIMEOUT_S * scale)
+            if audio_bytes:
+                return audio_bytes
+        except Exception:
+            pass
+    return None
+
+
+async def run(mode, steps, scale):
+    primary, secondary = make_backends(scale)
+    scheduler = TTSScheduler(hedging=mode == "hedged", timeout_s=3 * TIMEOUT_S * scale,
+                             attempt_timeout_s=TIMEOUT_S * scale)
+    samples = []
+    failed = 0
+    for step in range(steps):
+        # The primary degrades for a stretch in the middle of the run
+        primary.degraded = 0.4 * steps <= step < 0.55 * steps
+        text = f"{mode} step {step}"
+        start = time.perf_counter()
+        if mode == "sequential":
+            audio_bytes = await sequential(text, (primary, secondary), scale)
+        else:
+            audio_bytes, _ = await scheduler.synthesize(text, primary.name)
+        samples.append((time.perf_counter() - start) / scale)
+        failed += not audio_bytes
+    return sorted(samples), failed, primary.calls + secondary.calls, scheduler.stats()
+
+
+def percentile(samples, q):
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, default=400)
+    parser.add_argument("--time-scale", type=float, default=0.01)
+    args = parser.parse_args()
+
+    # Failures and timeouts are simulated by the hundred; keep their warnings out of the table
+    logging.getLogger(tts_scheduler.__name__).setLevel(logging.ERROR)
+
+    # Scheduler timings are in real seconds; shrink them with the simulation
+    for name in ("DEFAULT_HEDGE_DELAY_S", "MIN_HEDGE_DELAY_S", "BREAKER_BACKOFF_S", "MAX_BREAKER_BACKOFF_S"):
+        setattr(tts_scheduler, name, getattr(tts_scheduler, name) * args.time_scale)
+
+    print(f"{'mode':<12}{'p50':>8}{'p95':>8}{'p99':>8}{'max':>8}{'failed':>8}{'calls/step':>12}")
+    for mode in ("sequential", "breaker", "hedged"):
+        samples, failed, calls, stats = asyncio.run(run(mode, args.steps, args.time_scale))
+        print(f"{mode:<12}{percentile(samples, 0.5):8.2f}{percentile(samples, 0.95):8.2f}"
+              f"{percentile(samples, 0.99):8.2f}{samples[-1]:8.2f}{failed:8d}{calls / args.steps:12.2f}")
+        if mode != "sequential":
+            print(f"{'':<12}hedged {stats['hedged']}, hedge wins {stats['hedge_wins']}, "
+                  f"failovers {stats['failovers']}, breaker trips {stats['backends']['Primary']['trips']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,17 +3,32 @@ import sys
 sys.modules['sqlite3'] = sys.modules.pop('pysqlite3')
 sys.modules["sqlite3.dbapi2"] = sys.modules["pysqlite3.dbapi2"]
 import streamlit as st
-import re
-import json
-from datetime import datetime
-from src.crew.cook_crew import CookCrew
-import fal_client
+import time
+from src.crew.cook_crew import STREAMING, get_shared_crews
+from src.crew.intent_router import get_router
+from src.crew.messages import RECIPE_STEP, SYSTEM, clean_for_speech, format_recipe_step, text_message
+from src.crew.audio_cache import audio_key, get_audio_cache
+from src.crew.async_runtime import get_background_loop
+from src.crew.audio_delivery import get_audio_store, sniff_mime
+from src.crew.prefetch import SpeechPrefetcher
+from src.crew.jobs import JobQueueFull, get_job_runner
+from src.crew.response_cache import get_response_cache
+from src.crew.streaming import stream_metrics
+from src.crew.substitutions import get_substitution_index
+from src.crew.tools.contextsaver import get_session_store
+from src.crew.tools.search_cache import get_search_cache
+from src.crew.tracing import Trace, activate, span
+from src.crew.tts import (
+    EDGE_TTS, FAL_TTS, LOCAL_TTS, backend_names, backends_summary, get_backend,
+    speech_metrics, split_sentences,
+)
+from src.crew.tts_scheduler import get_tts_scheduler
+from src.crew.turns import BUSY_MESSAGE, Conversation, SessionBusy
+import streamlit.components.v1 as components
 import base64
 from dotenv import load_dotenv
 import os
-import asyncio
 import tempfile
-import edge_tts
 import io
 import logging
 
@@ -25,20 +40,51 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 os.getenv("FAL_KEY")
 
+# Messages drawn on each rerun; older history is paged in on request
+CHAT_WINDOW = int(os.getenv("CHAT_WINDOW", 30))
+
+# Most recent messages kept in memory; everything is in the session store
+MAX_MEMORY_MESSAGES = 2 * CHAT_WINDOW
+
+def restore_session():
+    """Resume the conversation named in the URL from the store, or start a new one"""
+    store = get_session_store()
+    conversation = Conversation.load(store, st.query_params.get("session"), max_messages=MAX_MEMORY_MESSAGES)
+    if conversation is None:
+        conversation = Conversation.create(store, max_messages=MAX_MEMORY_MESSAGES)
+        st.query_params["session"] = conversation.id
+    else:
+        # Resumed steps were already heard; don't autoplay them again
+        st.session_state.spoken_until = time.time()
+        logger.info(f"✅ Resumed session {conversation.id} with {conversation.message_total} messages")
+    st.session_state.conversation = conversation
+
+def new_chat_session():
+    """Forget the stored conversation and continue under a fresh session id"""
+    store = get_session_store()
+    old = st.session_state.conversation
+    # Each kickoff runs on a fresh crew copy, so there is no agent state to reset
+    if old.pending:
+        old.pending["job"].cancel()
+    store.delete_session(old.id)
+    conversation = Conversation.create(store, max_messages=MAX_MEMORY_MESSAGES)
+    conversation.memory_active = old.memory_active
+    st.query_params["session"] = conversation.id
+    st.session_state.conversation = conversation
+
 def init_session_state():
     """Initialize all session state variables with defaults"""
     defaults = {
         "crew_instance": None,
-        "chat_history": [],
-        "recipe_notes": [],
-        "current_topic": None,
-        "memory_active": True,
-        "current_recipe_step": None,
         "tts_enabled": False,
-        "tts_service": "Edge TTS",
+        "tts_service": get_backend().name,
         "edge_voice": "en-US-AriaNeural",
+        "tts_prefetch": False,
         "audio_playing": False,
-        "processing": False,
+        "chat_window": CHAT_WINDOW,
+        "spoken_until": 0.0,
+        "turn_trace": None,
+        "traces": [],
         "stt_enabled": False,
         "listening": False,
         "debug": False,
@@ -49,10 +95,16 @@ def init_session_state():
         if key not in st.session_state:
             st.session_state[key] = value
     
-    # Initialize crew instance if not exists
+    if "speech_prefetcher" not in st.session_state:
+        st.session_state.speech_prefetcher = SpeechPrefetcher()
+    
+    if "conversation" not in st.session_state:
+        restore_session()
+    
+    # Crew templates are shared by every session; only chat state lives in the session
     if st.session_state.crew_instance is None:
         try:
-            st.session_state.crew_instance = CookCrew()
+            st.session_state.crew_instance = get_shared_crews()
             logger.info("✅ Crew instance initialized successfully")
         except Exception as e:
             logger.error(f"❌ Failed to initialize crew: {str(e)}")
@@ -494,103 +546,140 @@ def add_speech_to_text_js():
     </script>
     """, unsafe_allow_html=True)
 
-async def generate_edge_speech(text, voice="en-US-AriaNeural"):
-    """Generate speech using Edge TTS"""
-    try:
-        # Clean text for TTS
-        clean_text = re.sub(r'[*#`]', '', text)  # Remove markdown
-        clean_text = re.sub(r'\n+', ' ', clean_text)  # Replace newlines with spaces
-        clean_text = clean_text.strip()
-        
-        if not clean_text:
-            return None
-            
-        # Limit text length for TTS
-        if len(clean_text) > 1000:
-            clean_text = clean_text[:1000] + "..."
-        
-        # Create Edge TTS communicator
-        communicate = edge_tts.Communicate(clean_text, voice)
-        
-        # Generate audio to bytes
-        audio_bytes = b""
-        async for chunk in communicate.stream():
-            if chunk["type"] == "audio":
-                audio_bytes += chunk["data"]
-        
-        return audio_bytes
-        
-    except Exception as e:
-        logger.error(f"Edge TTS Error: {str(e)}")
-        st.error(f"Edge TTS Error: {str(e)}")
-        return None
+def selected_backend():
+    """The chosen TTS backend, or the first available one if it can't be used here"""
+    return get_backend(st.session_state.tts_service)
 
-def generate_fal_speech(text):
-    """Generate speech using fal.ai TTS"""
-    try:
-        # Clean text for TTS
-        clean_text = re.sub(r'[*#`]', '', text)  # Remove markdown
-        clean_text = re.sub(r'\n+', ' ', clean_text)  # Replace newlines with spaces
-        clean_text = clean_text.strip()
-        
-        if not clean_text:
-            return None
-            
-        # Limit text length for TTS
-        if len(clean_text) > 500:
-            clean_text = clean_text[:500] + "..."
-        
-        def on_queue_update(update):
-            if isinstance(update, fal_client.InProgress):
-                for log in update.logs:
-                    logger.info(log["message"])
-        
-        result = fal_client.subscribe(
-            "fal-ai/kokoro/american-english",
-            arguments={"text": clean_text},
-            with_logs=True,
-            on_queue_update=on_queue_update,
-        )
-        
-        if result and 'audio_url' in result:
-            return result['audio_url']
-        return None
-        
-    except Exception as e:
-        logger.error(f"FAL TTS Error: {str(e)}")
-        st.error(f"FAL TTS Error: {str(e)}")
-        return None
+def current_voice(backend):
+    """Voice identifier used for a backend, part of the audio cache key"""
+    return backend.voice_for(st.session_state.edge_voice if backend.name == EDGE_TTS else None)
 
-def generate_speech_with_fallback(text):
-    """Generate speech using selected TTS service with fallback"""
-    if st.session_state.tts_service == "Edge TTS":
+def generate_speech_with_fallback(text, exclude=()):
+    """Generate speech with the selected backend, hedged and failed over by the TTS scheduler"""
+    scheduler = get_tts_scheduler()
+    backend = selected_backend()
+    voice = current_voice(backend)
+    audio_bytes, winner = scheduler.cached(text, backend.name, voice)
+    if audio_bytes:
+        return audio_bytes
+    with span("tts", "tts", service=backend.name, chars=len(text)) as attrs:
         try:
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            audio_bytes = loop.run_until_complete(
-                generate_edge_speech(text, st.session_state.edge_voice)
-            )
-            loop.close()
-            return audio_bytes
+            audio_bytes, winner = get_background_loop().run(
+                scheduler.synthesize(text, backend.name, voice, exclude=exclude), timeout=scheduler.timeout_s + 1)
         except Exception as e:
-            logger.warning(f"Edge TTS failed, trying FAL.ai: {str(e)}")
-            return generate_fal_speech(text)
+            logger.error(f"{backend.name} Error: {str(e)}")
+            st.error(f"{backend.name} Error: {str(e)}")
+            return None
+        if not audio_bytes:
+            logger.error("All TTS backends failed")
+            return None
+        attrs["backend"] = winner.name
+    return audio_bytes
+
+def show_audio(audio_bytes, autoplay=False, compact=True):
+    """Audio player fed from the API server's /audio endpoint when AUDIO_BASE_URL is set, else through Streamlit.
+
+    A URL lets the browser cache the clip and fetch it in ranges, and points at
+    the compact encoding when there is one; compact=False skips encoding on
+    latency-critical paths.
+    """
+    store = get_audio_store()
+    if store.base_url:
+        url, mime = store.publish_url(audio_bytes, compact)
+        st.audio(url, format=mime, autoplay=autoplay)
     else:
+        # Label by content: backends and fallbacks don't all produce the same format
+        st.audio(audio_bytes, format=sniff_mime(audio_bytes), autoplay=autoplay)
+
+def audio_src(audio_bytes):
+    """src attribute for a raw <audio> element: a content-hash URL, or a data URI without an audio server"""
+    store = get_audio_store()
+    if store.base_url:
+        return store.publish_url(audio_bytes)[0]
+    return f"data:{sniff_mime(audio_bytes)};base64,{base64.b64encode(audio_bytes).decode('ascii')}"
+
+def queue_after_current_audio(audio_bytes):
+    """Play audio right after the most recent player on the page finishes"""
+    components.html(f"""
+    <audio id="rest" src="{audio_src(audio_bytes)}"></audio>
+    <script>
+        const rest = document.getElementById('rest');
+        try {{
+            const players = window.parent.document.querySelectorAll('audio');
+            const current = players[players.length - 1];
+            if (!current || current.ended) {{
+                rest.play();
+            }} else {{
+                current.addEventListener('ended', () => rest.play(), {{ once: true }});
+            }}
+        }} catch (error) {{
+            rest.play();
+        }}
+    </script>
+    """, height=0)
+
+def play_step_audio(text):
+    """Autoplay a recipe step, starting as soon as its first sentence is synthesized"""
+    if not split_sentences(clean_for_speech(text)):
+        # Nothing to say; synthesizing it would only count as a backend failure
+        return False
+    scheduler = get_tts_scheduler()
+    primary = selected_backend()
+    voice = current_voice(primary)
+    if st.session_state.tts_prefetch:
+        # Waits for an in-flight prefetch of this step instead of synthesizing it twice
+        st.session_state.speech_prefetcher.claim(text, primary.name, voice)
+    
+    # A prefetch may have been served by a fallback backend, so any of them can hold the audio
+    audio_data, _ = scheduler.cached(text, primary.name, voice)
+    if audio_data:
+        scheduler.observe(0.0)
+        show_audio(audio_data, autoplay=True)
+        return True
+    
+    # Stream from the chosen backend unless its circuit is open; the backend records its own real-time factor
+    backend = scheduler.pick(primary.name)
+    voice = scheduler.voice(backend, primary.name, voice)
+    start = time.perf_counter()
+    chunks = []
+    failed = False
+    with span("tts stream", "tts", service=backend.name, chars=len(text)) as attrs:
         try:
-            return generate_fal_speech(text)
+            for chunk in backend.iterate(text, voice):
+                chunks.append(chunk)
+                if len(chunks) == 1:
+                    # Start playing the first sentence while the rest is still synthesizing
+                    first_audio_s = time.perf_counter() - start
+                    attrs["first_audio_ms"] = round(first_audio_s * 1000, 1)
+                    scheduler.observe(first_audio_s)
+                    show_audio(chunk, autoplay=True, compact=False)
         except Exception as e:
-            logger.warning(f"FAL TTS failed, trying Edge TTS: {str(e)}")
-            try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                audio_bytes = loop.run_until_complete(
-                    generate_edge_speech(text, st.session_state.edge_voice)
-                )
-                loop.close()
-                return audio_bytes
-            except Exception as e2:
-                logger.error(f"All TTS services failed: {str(e2)}")
-                return None
+            failed = True
+            logger.warning(f"Streaming {backend.name} failed: {str(e)}")
+    scheduler.report(backend, time.perf_counter() - start, bool(chunks) and not failed)
+    
+    if not chunks:
+        audio_data = generate_speech_with_fallback(text, exclude=(backend.name,))
+        if audio_data:
+            show_audio(audio_data, autoplay=True)
+        return bool(audio_data)
+    
+    if not failed:
+        get_audio_cache().put(audio_key(text, backend.name, voice), backend.join(chunks))
+    if len(chunks) > 1:
+        queue_after_current_audio(backend.join(chunks[1:]))
+    return True
+
+def prefetch_upcoming_steps():
+    """Speculatively synthesize the current and next plan steps in the background"""
+    session = st.session_state.conversation.recipe_session
+    if not (st.session_state.tts_enabled and st.session_state.tts_prefetch and session) or session.finished:
+        return
+    texts = [session.render_step()]
+    if session.upcoming:
+        texts.append(session.render_step(session.upcoming))
+    backend = selected_backend()
+    st.session_state.speech_prefetcher.prefetch(texts, backend.name, current_voice(backend))
 
 def validate_api_keys():
     """Validate that all required API keys are present"""
@@ -600,129 +689,9 @@ def validate_api_keys():
         return False
     return True
 
-def format_recipe_step(recipe_text):
-    """Format recipe step for display with proper styling"""
-    if not recipe_text:
-        return ""
-    
-    # Clean up the recipe text
-    recipe_text = recipe_text.replace('\\n', '\n').replace('\n\n', '\n').strip()
-    
-    # Parse different parts of the recipe step
-    html_parts = []
-    
-    # Split by lines to process each part
-    lines = recipe_text.split('\n')
-    current_section = ""
-    
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-            
-        # Check for step header (### Current Step: Step X)
-        if line.startswith('### Current Step:') or line.startswith('## Current Step:'):
-            step_title = line.replace('###', '').replace('##', '').strip()
-            html_parts.append(f'<h3>{step_title}</h3>')
-            
-        # Check for main instruction (usually in **bold**)
-        elif line.startswith('**') and line.endswith('**'):
-            instruction = line.replace('**', '').strip()
-            html_parts.append(f'<div class="step-instruction">{instruction}</div>')
-            
-        # Check for details/tips (usually in *italics* or contains parentheses/details)
-        elif line.startswith('*') and line.endswith('*'):
-            details = line.replace('*', '').strip()
-            if details.lower().startswith('let me know when'):
-                html_parts.append(f'<div class="step-prompt">{details}</div>')
-            else:
-                html_parts.append(f'<div class="step-details">{details}</div>')
-                
-        # Check for progress info (usually starts with **Progress:**)
-        elif line.startswith('**Progress:**'):
-            progress = line.replace('**Progress:**', '').replace('**', '').strip()
-            html_parts.append(f'<div class="progress-info"><strong>Progress:</strong> {progress}</div>')
-            
-        # Handle mixed formatting lines
-        else:
-            # Clean up mixed bold/italic formatting
-            formatted_line = line
-            
-            # Convert **text** to bold
-            formatted_line = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', formatted_line)
-            
-            # Convert *text* to italic (but not if it's already in strong tags)
-            formatted_line = re.sub(r'(?<!<strong>)\*([^*]+)\*(?!</strong>)', r'<em>\1</em>', formatted_line)
-            
-            # Determine the type based on content
-            if 'let me know when' in formatted_line.lower() or 'say "done"' in formatted_line.lower():
-                html_parts.append(f'<div class="step-prompt">{formatted_line}</div>')
-            elif 'progress:' in formatted_line.lower():
-                html_parts.append(f'<div class="progress-info">{formatted_line}</div>')
-            elif formatted_line.startswith('<strong>') or 'Step' in formatted_line:
-                html_parts.append(f'<div class="step-instruction">{formatted_line}</div>')
-            else:
-                html_parts.append(f'<div class="step-details">{formatted_line}</div>')
-    
-    # Join all parts
-    formatted_content = ''.join(html_parts)
-    
-    return f'<div class="recipe-step">{formatted_content}</div>'
-
-def parse_json_response(response_text):
-    """Parse JSON response and extract recipe and notes"""
-    try:
-        # Look for JSON in the response
-        json_match = re.search(r'```json\s*({.*?})\s*```', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(1)
-            parsed_data = json.loads(json_str)
-            return parsed_data
-        else:
-            # Try to parse the entire response as JSON
-            return json.loads(response_text)
-    except (json.JSONDecodeError, AttributeError):
-        return None
-
-def build_context_with_notes():
-    """Build context including recipe notes for better continuity"""
-    context_parts = []
-    
-    # Add recent recipe notes
-    if st.session_state.recipe_notes:
-        recent_notes = st.session_state.recipe_notes[-5:]  # Last 5 notes
-        notes_text = "\n".join([f"Note {i+1}: {note}" for i, note in enumerate(recent_notes)])
-        context_parts.append(f"Previous recipe steps and notes:\n{notes_text}")
-    
-    # Add recent chat history
-    if st.session_state.chat_history:
-        recent_chat = st.session_state.chat_history[-3:]  # Last 3 exchanges
-        chat_text = "\n".join([f"User: {q}\nChef: {a[:100]}..." if len(a) > 100 else f"User: {q}\nChef: {a}" 
-                              for q, a in recent_chat if q != "SYSTEM"])
-        if chat_text:
-            context_parts.append(f"Recent conversation:\n{chat_text}")
-    
-    return "\n\n".join(context_parts)
-
 def detect_recipe_topic(query):
     """Extract recipe/cooking topic from user query"""
-    patterns = [
-        r'\b(?:recipe|cook|make|prepare)\s+(?:for\s+)?(?:a\s+)?(\w+(?:\s+\w+)?)',
-        r'\b(?:how to (?:make|cook|prepare))\s+(\w+(?:\s+\w+)?)',
-        r'\b(\w+(?:\s+\w+)?)\s+recipe\b',
-        r'\bwant\s+(?:a\s+)?(\w+(?:\s+\w+)?)\s+recipe\b'
-    ]
-    
-    query_lower = query.lower()
-    for pattern in patterns:
-        matches = re.findall(pattern, query_lower)
-        if matches:
-            topic = matches[0].strip()
-            stop_words = {'the', 'a', 'an', 'some', 'good', 'best', 'easy', 'quick'}
-            topic_words = [word for word in topic.split() if word not in stop_words]
-            if topic_words:
-                return ' '.join(topic_words)
-    return None
+    return get_router().detect_topic(query)
 
 def cleanup_session_state():
     """Clean up old temporary data from session state"""
@@ -730,11 +699,56 @@ def cleanup_session_state():
     for key in temp_keys:
         del st.session_state[key]
     
-    # Limit chat history to prevent memory issues
-    if len(st.session_state.chat_history) > 50:
-        st.session_state.chat_history = st.session_state.chat_history[-25:]
+    # Older messages stay in the session store and are paged back in when scrolled to
+    history = st.session_state.conversation.history
+    if len(history) > CHAT_WINDOW:
+        del history[:-CHAT_WINDOW]
+        st.session_state.chat_window = CHAT_WINDOW
         logger.info("Cleaned up old chat history")
 
+def speak_first_sentence():
+    """Hook that speaks the first streamed sentence of an answer, or None when speech is off"""
+    backend = selected_backend() if st.session_state.tts_enabled else None
+    if not backend or not backend.streams_sentences:
+        return None
+    voice = current_voice(backend)
+    return lambda sentence: backend.prefetch_sentence(sentence, voice)
+
+def finish_crew_job():
+    """Ingest a finished background kickoff into the chat on the script thread"""
+    conversation = st.session_state.conversation
+    pending = conversation.pending
+    if not pending or not pending["job"].done:
+        return
+    conversation.finish_turn(pending)
+
+@st.fragment(run_every=1)
+def show_job_progress():
+    """Live status of the background kickoff; reruns the page once it finishes"""
+    pending = st.session_state.conversation.pending
+    if not pending:
+        return
+    job = pending["job"]
+    if job.done:
+        st.rerun()
+    
+    status = f"{job.agent} is working" if job.agent else "Waiting for a free chef"
+    if job.tasks_total:
+        status += f" (task {min(job.tasks_done + 1, job.tasks_total)} of {job.tasks_total})"
+    st.markdown(f"""
+    <div class="system-message">
+        🤔 Chef is thinking... {status} · {job.elapsed:.0f}s
+    </div>
+    """, unsafe_allow_html=True)
+    
+    # Step text streamed so far, formatted the same way the final answer will be
+    if job.stream is not None and job.stream.text:
+        st.markdown(format_recipe_step(job.stream.text), unsafe_allow_html=True)
+    
+    if st.button("⏹️ Cancel", key=f"cancel_{job.id}"):
+        job.cancel()
+        st.rerun()
+
 # Available Edge TTS voices
 EDGE_VOICES = {
     # English voices
@@ -767,15 +781,20 @@ st.markdown("*Your personal cooking assistant with voice interaction*")
 add_speech_to_text_js()
 
 # Sidebar
-with st.sidebar:
+@st.fragment
+def render_sidebar():
+    """Settings run as a fragment so changing them doesn't redraw the conversation"""
     st.header("⚙️ Settings")
     
-    # Debug mode
+    # Debug mode; the debug panel lives in the main area, so redraw the page
     debug_enabled = st.toggle("🐛 Debug Mode", value=st.session_state.debug)
-    st.session_state.debug = debug_enabled
+    if debug_enabled != st.session_state.debug:
+        st.session_state.debug = debug_enabled
+        st.rerun()
     
-    memory_enabled = st.toggle("🧠 Memory", value=st.session_state.memory_active)
-    st.session_state.memory_active = memory_enabled
+    conversation = st.session_state.conversation
+    memory_enabled = st.toggle("🧠 Memory", value=conversation.memory_active)
+    conversation.memory_active = memory_enabled
     
     # Validate API keys
     if st.button("🔑 Validate API Keys"):
@@ -787,7 +806,9 @@ with st.sidebar:
     st.markdown("### 🎤 Speech-to-Text Settings")
     with st.expander("STT Configuration", expanded=st.session_state.stt_enabled):
         stt_enabled = st.toggle("Enable Speech-to-Text", value=st.session_state.stt_enabled)
-        st.session_state.stt_enabled = stt_enabled
+        if stt_enabled != st.session_state.stt_enabled:
+            st.session_state.stt_enabled = stt_enabled
+            st.rerun()
         
         if stt_enabled:
             st.info("🎤 Uses your browser's built-in speech recognition")
@@ -799,19 +820,32 @@ with st.sidebar:
     st.markdown("### 🔊 Text-to-Speech Settings")
     with st.expander("TTS Configuration", expanded=st.session_state.tts_enabled):
         tts_enabled = st.toggle("Enable Text-to-Speech", value=st.session_state.tts_enabled)
-        st.session_state.tts_enabled = tts_enabled
+        if tts_enabled != st.session_state.tts_enabled:
+            # Don't read out the whole existing conversation once speech is switched on
+            st.session_state.spoken_until = time.time()
+            st.session_state.tts_enabled = tts_enabled
+            st.rerun()
+        
+        if tts_enabled:
+            tts_prefetch = st.toggle(
+                "⚡ Prefetch next step audio",
+                value=st.session_state.tts_prefetch,
+                help="Synthesize the upcoming step in the background so Next/Repeat play instantly"
+            )
+            st.session_state.tts_prefetch = tts_prefetch
         
         if tts_enabled:
             # TTS Service Selection
+            services = backend_names()
             tts_service = st.selectbox(
                 "TTS Service:",
-                ["Edge TTS", "FAL.ai TTS"],
-                index=0 if st.session_state.tts_service == "Edge TTS" else 1
+                services,
+                index=services.index(st.session_state.tts_service) if st.session_state.tts_service in services else 0
             )
             st.session_state.tts_service = tts_service
             
             # Voice selection for Edge TTS
-            if tts_service == "Edge TTS":
+            if tts_service == EDGE_TTS:
                 current_voice_name = next(
                     (name for name, code in EDGE_VOICES.items() if code == st.session_state.edge_voice),
                     "Aria (US Female)"
@@ -823,67 +857,56 @@ with st.sidebar:
                     index=list(EDGE_VOICES.keys()).index(current_voice_name)
                 )
                 st.session_state.edge_voice = EDGE_VOICES[selected_voice_name]
-                
-                # Voice preview
-                if st.button("🎵 Test Voice"):
-                    test_text = "Hello! I'm your cooking assistant. Let me help you create delicious meals!"
-                    with st.spinner("Generating voice sample..."):
-                        audio_data = generate_speech_with_fallback(test_text)
-                        if audio_data:
-                            st.audio(audio_data, format='audio/wav')
-                        else:
-                            st.error("Could not generate voice sample")
             
-            elif tts_service == "FAL.ai TTS":
+            elif tts_service == FAL_TTS:
                 st.info("🎯 FAL.ai uses Kokoro American English voice")
-                if st.button("🎵 Test Voice"):
-                    test_text = "Hello! I'm your cooking assistant. Let me help you create delicious meals!"
-                    with st.spinner("Generating voice sample..."):
-                        audio_url = generate_speech_with_fallback(test_text)
-                        if audio_url:
-                            st.audio(audio_url, format='audio/wav')
-                        else:
-                            st.error("Could not generate voice sample")
+            
+            elif tts_service == LOCAL_TTS:
+                st.info(f"💻 Local TTS runs offline on this machine ({get_backend(LOCAL_TTS).engine})")
+            
+            # Voice preview
+            if st.button("🎵 Test Voice"):
+                test_text = "Hello! I'm your cooking assistant. Let me help you create delicious meals!"
+                with st.spinner("Generating voice sample..."):
+                    audio_data = generate_speech_with_fallback(test_text)
+                    if audio_data:
+                        show_audio(audio_data)
+                    else:
+                        st.error("Could not generate voice sample")
     
     # Status indicators
-    if st.session_state.current_topic:
-        st.info(f"📝 Current Topic: {st.session_state.current_topic.title()}")
+    if conversation.topic:
+        st.info(f"📝 Current Topic: {conversation.topic.title()}")
     
-    if st.session_state.current_recipe_step:
-        st.success(f"🍳 Current Step: {st.session_state.current_recipe_step}")
+    if conversation.current_step:
+        st.success(f"🍳 Current Step: {conversation.current_step}")
     
-    st.metric("💬 Messages", len(st.session_state.chat_history))
-    st.metric("📝 Recipe Notes", len(st.session_state.recipe_notes))
+    st.metric("💬 Messages", conversation.message_total)
+    st.metric("📝 Recipe Notes", conversation.notes_total)
     
     # Show recent notes
-    if st.session_state.recipe_notes:
+    if conversation.notes:
         st.markdown("### 📋 Recent Notes")
-        for i, note in enumerate(st.session_state.recipe_notes[-3:], 1):
-            st.text_area(f"Note {len(st.session_state.recipe_notes)-3+i}", 
+        for i, note in enumerate(conversation.notes[-3:], 1):
+            st.text_area(f"Note {conversation.notes_total - len(conversation.notes[-3:]) + i}", 
                         note[:100] + "..." if len(note) > 100 else note, 
                         height=68, disabled=True)
     
     # Maintenance buttons
     if st.button("🧹 Cleanup Memory"):
         cleanup_session_state()
-        st.success("✅ Memory cleaned up")
+        st.toast("✅ Memory cleaned up")
+        st.rerun()
     
     if st.button("🗑️ Clear Chat"):
-        if st.session_state.crew_instance:
-            try:
-                crew = st.session_state.crew_instance.cooking_crew()
-                for agent in crew.agents:
-                    if hasattr(agent, 'reset'):
-                        agent.reset()
-            except Exception as e:
-                logger.error(f"Error resetting crew: {str(e)}")
-        
-        st.session_state.chat_history = []
-        st.session_state.recipe_notes = []
-        st.session_state.current_topic = None
-        st.session_state.current_recipe_step = None
+        new_chat_session()
+        st.session_state.speech_prefetcher.cancel()
+        st.session_state.chat_window = CHAT_WINDOW
         st.rerun()
 
+with st.sidebar:
+    render_sidebar()
+
 # Debug panel
 if st.session_state.debug:
     with st.expander("🐛 Debug Information", expanded=False):
@@ -895,16 +918,118 @@ if st.session_state.debug:
         
         st.markdown("#### Environment")
         st.write(f"FAL_KEY present: {'✅' if os.getenv('FAL_KEY') else '❌'}")
-        st.write(f"Chat history length: {len(st.session_state.chat_history)}")
-        st.write(f"Recipe notes length: {len(st.session_state.recipe_notes)}")
+        conversation = st.session_state.conversation
+        st.write(f"Chat history length: {conversation.message_total} ({len(conversation.history)} in memory)")
+        st.write(f"Recipe notes length: {conversation.notes_total} ({len(conversation.notes)} in memory)")
+        
+        st.markdown("#### Session Store")
+        st.json({"session_id": conversation.id, **get_session_store().stats()})
+        
+        st.markdown("#### Crew Workers")
+        st.json(get_job_runner().stats())
+        
+        if STREAMING:
+            st.markdown("#### Token Streaming")
+            st.json(stream_metrics.summary())
+        
+        st.markdown("#### Response Cache")
+        st.json(get_response_cache().stats())
+        
+        st.markdown("#### Web Search Cache")
+        st.json(get_search_cache().stats())
+        
+        st.markdown("#### Substitution Index")
+        st.json(get_substitution_index().stats())
+        
+        st.markdown("#### TTS Audio Cache")
+        st.json(get_audio_cache().stats())
+        
+        st.markdown("#### Prompt Context")
+        st.json(st.session_state.conversation.context.stats())
+        
+        st.markdown("#### Turn Latency Waterfall")
+        if st.session_state.traces:
+            st.code(st.session_state.traces[-1].format_waterfall(), language=None)
+            for trace in reversed(st.session_state.traces[:-1]):
+                st.caption(f"{trace.name[:60]} · {trace.duration_ms / 1000:.2f}s")
+        else:
+            st.caption("No completed turns yet")
+        
+        st.markdown("#### TTS Latency (time to first audio, real-time factor)")
+        st.json(speech_metrics.summary())
+        
+        st.markdown("#### TTS Backends")
+        st.json(backends_summary())
+        
+        st.markdown("#### TTS Scheduler (health, hedging, step audio latency)")
+        st.json(get_tts_scheduler().stats())
+        
+        st.markdown("#### Audio Delivery")
+        st.json(get_audio_store().stats())
+        
+        st.markdown("#### TTS Prefetch")
+        st.json(st.session_state.speech_prefetcher.summary())
+
+def render_message(message):
+    """Draw one exchange from its cached HTML; only a newly arrived step autoplays"""
+    st.markdown(message.bubble, unsafe_allow_html=True)
+    if message.kind == SYSTEM or not st.session_state.tts_enabled:
+        return
+    
+    # Auto-generate TTS for a recipe step the first time it is shown
+    if message.kind == RECIPE_STEP and message.created > st.session_state.spoken_until:
+        st.session_state.spoken_until = message.created
+        with st.spinner(f"🔊 Generating speech using {st.session_state.tts_service}..."):
+            if play_step_audio(message.speech_text):
+                st.success(f"🎵 Recipe step audio ready! ({st.session_state.tts_service})")
+            else:
+                st.warning(f"⚠️ Could not generate audio")
+        return
+    
+    # Manual TTS for everything else
+    col1, col2 = st.columns([1, 6])
+    with col1:
+        if st.button("🔊", key=f"tts_{message.created}", help=f"Play with {st.session_state.tts_service}"):
+            with st.spinner(f"Generating speech using {st.session_state.tts_service}..."):
+                audio_data = generate_speech_with_fallback(message.speech_text)
+                if audio_data:
+                    show_audio(audio_data)
+                    st.success(f"🎵 Audio ready! ({st.session_state.tts_service})")
+                else:
+                    st.warning(f"⚠️ Could not generate audio")
+
+@st.fragment
+def render_chat():
+    """Draw the most recent messages; older ones load a page at a time on request"""
+    conversation = st.session_state.conversation
+    history = conversation.history
+    window = st.session_state.chat_window
+    visible = history[-window:]
+    if window > len(history) and conversation.message_total > len(history):
+        # Older pages are read from the session store for this render only
+        visible = get_session_store().read_messages(
+            conversation.id, window - len(history), skip_newest=len(history)) + history
+    hidden = conversation.message_total - len(visible)
+    if hidden > 0:
+        if st.button(f"📜 Show earlier messages ({hidden} hidden)", key="show_earlier"):
+            st.session_state.chat_window += CHAT_WINDOW
+            st.rerun(scope="fragment")
+    for message in visible:
+        render_message(message)
+
+# Pick up a kickoff that finished in the background since the last run
+finish_crew_job()
 
 # Chat container
 chat_container = st.container()
 
-with chat_container:
+# The turn's trace ends with the first render after its answer arrived
+turn_trace = None if st.session_state.conversation.pending else st.session_state.turn_trace
+
+with chat_container, activate(turn_trace), span("render", "ui"):
     st.markdown('<div class="chat-container">', unsafe_allow_html=True)
     
-    if not st.session_state.chat_history:
+    if not st.session_state.conversation.history:
         st.markdown("""
         <div class="welcome-message">
             <h4>👋 Welcome to Chef AI!</h4>
@@ -917,155 +1042,21 @@ with chat_container:
         </div>
         """, unsafe_allow_html=True)
     else:
-        for question, answer in st.session_state.chat_history:
-            if question == "SYSTEM":
-                st.markdown(f'<div class="system-message">{answer}</div>', unsafe_allow_html=True)
-            else:
-                # User message
-                current_time = datetime.now().strftime('%H:%M')
-                st.markdown(f"""
-                <div class="user-message">
-                    <div>{question}</div>
-                    <div class="message-time">{current_time}</div>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                # Bot message - enhanced JSON parsing and display
-                recipe_data = None
-                is_recipe_step = False
-                
-                # Try multiple methods to extract recipe data
-                try:
-                    # Method 1: Use existing parse_json_response function
-                    parsed_data = parse_json_response(answer)
-                    if parsed_data and 'cook_recipe' in parsed_data:
-                        recipe_data = parsed_data['cook_recipe']
-                        is_recipe_step = True
-                    else:
-                        # Method 2: Check if answer starts with { (raw JSON)
-                        if answer.strip().startswith('{'):
-                            json_data = json.loads(answer.strip())
-                            if 'cook_recipe' in json_data:
-                                recipe_data = json_data['cook_recipe']
-                                is_recipe_step = True
-                        
-                        # Method 3: Look for JSON patterns anywhere in the text
-                        elif '{' in answer and '}' in answer:
-                            # Find JSON object in the text - improved pattern for nested objects
-                            try:
-                                # Find the start and end of JSON object
-                                start_idx = answer.find('{')
-                                if start_idx != -1:
-                                    # Find matching closing brace
-                                    brace_count = 0
-                                    end_idx = start_idx
-                                    for i, char in enumerate(answer[start_idx:], start_idx):
-                                        if char == '{':
-                                            brace_count += 1
-                                        elif char == '}':
-                                            brace_count -= 1
-                                            if brace_count == 0:
-                                                end_idx = i
-                                                break
-                                    
-                                    if end_idx > start_idx:
-                                        json_str = answer[start_idx:end_idx + 1]
-                                        json_data = json.loads(json_str)
-                                        if 'cook_recipe' in json_data:
-                                            recipe_data = json_data['cook_recipe']
-                                            is_recipe_step = True
-                            except (json.JSONDecodeError, ValueError):
-                                pass
-                        
-                        # Method 4: Check for markdown code blocks with JSON
-                        elif '```json' in answer or '```' in answer:
-                            code_blocks = re.findall(r'```(?:json)?\s*({.*?})\s*```', answer, re.DOTALL)
-                            for block in code_blocks:
-                                try:
-                                    json_data = json.loads(block)
-                                    if 'cook_recipe' in json_data:
-                                        recipe_data = json_data['cook_recipe']
-                                        is_recipe_step = True
-                                        break
-                                except json.JSONDecodeError:
-                                    continue
-                
-                except (json.JSONDecodeError, AttributeError, TypeError) as e:
-                    # If all parsing fails, treat as regular message
-                    is_recipe_step = False
-                    recipe_data = None
-                    # Debug: log parsing error if debug mode is on
-                    if st.session_state.debug:
-                        st.warning(f"🐛 JSON parsing failed: {str(e)[:100]}...")
-                        st.text_area("Raw response for debugging:", answer[:500], height=100)
-                
-                # Display the message
-                if is_recipe_step and recipe_data:
-                    # Display formatted recipe step
-                    recipe_html = format_recipe_step(recipe_data)
-                    st.markdown(recipe_html, unsafe_allow_html=True)
-                    
-                    # Auto-generate TTS for recipe steps
-                    if st.session_state.tts_enabled:
-                        with st.spinner(f"🔊 Generating speech using {st.session_state.tts_service}..."):
-                            audio_data = generate_speech_with_fallback(recipe_data)
-                            if audio_data:
-                                st.audio(audio_data, format='audio/wav', autoplay=True)
-                                st.success(f"🎵 Recipe step audio ready! ({st.session_state.tts_service})")
-                            else:
-                                st.warning(f"⚠️ Could not generate audio")
-                else:
-                    # Display as regular message, but format JSON nicely if detected
-                    display_text = answer
-                    
-                    # If the response looks like JSON but wasn't a recipe, format it nicely
-                    try:
-                        if answer.strip().startswith('{') and answer.strip().endswith('}'):
-                            # Try to parse and format the JSON for better readability
-                            json_data = json.loads(answer.strip())
-                            display_text = json.dumps(json_data, indent=2)
-                        elif '```json' in answer:
-                            # Extract and format JSON from code blocks
-                            json_match = re.search(r'```json\s*({.*?})\s*```', answer, re.DOTALL)
-                            if json_match:
-                                json_data = json.loads(json_match.group(1))
-                                formatted_json = json.dumps(json_data, indent=2)
-                                display_text = answer.replace(json_match.group(0), f'```json\n{formatted_json}\n```')
-                    except (json.JSONDecodeError, AttributeError):
-                        # If formatting fails, use original text
-                        pass
-                    
-                    st.markdown(f"""
-                    <div class="bot-message">
-                        <div><pre style="white-space: pre-wrap; font-family: inherit;">{display_text}</pre></div>
-                        <div class="message-time">{current_time}</div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                    
-                    # Manual TTS for regular messages
-                    if st.session_state.tts_enabled:
-                        col1, col2 = st.columns([1, 6])
-                        with col1:
-                            tts_key = f"tts_regular_{len(st.session_state.chat_history)}_{hash(answer)}"
-                            if st.button("🔊", key=tts_key, help=f"Play with {st.session_state.tts_service}"):
-                                with st.spinner(f"Generating speech using {st.session_state.tts_service}..."):
-                                    audio_data = generate_speech_with_fallback(answer)
-                                    if audio_data:
-                                        st.audio(audio_data, format='audio/wav')
-                                        st.success(f"🎵 Audio ready! ({st.session_state.tts_service})")
-                                    else:
-                                        st.warning(f"⚠️ Could not generate audio")
+        render_chat()
     
-    # Show processing indicator
-    if st.session_state.processing:
-        st.markdown("""
-        <div class="system-message">
-            🤔 Chef is thinking...
-        </div>
-        """, unsafe_allow_html=True)
+    prefetch_upcoming_steps()
+    
+    # Show live progress of a running kickoff
+    show_job_progress()
     
     st.markdown('</div>', unsafe_allow_html=True)
 
+if turn_trace is not None:
+    st.session_state.traces = (st.session_state.traces + [turn_trace.finish()])[-10:]
+    st.session_state.turn_trace = None
+
+st.session_state.conversation.save()
+
 # Input area
 st.markdown("---")
 
@@ -1096,7 +1087,7 @@ if st.session_state.stt_enabled:
     st.markdown("---")
 
 # Quick recipe navigation buttons
-if st.session_state.current_recipe_step:
+if st.session_state.conversation.current_step:
     st.markdown("### 🍳 Recipe Navigation")
     col1, col2, col3 = st.columns(3)
     
@@ -1121,93 +1112,35 @@ with col1:
 
 # Process input function
 def process_user_input(input_text):
-    """Process user input and get response from crew"""
+    """Process user input, timing every stage of the turn"""
     if not input_text.strip():
         return
-    
-    st.session_state.processing = True
-    
+    trace = Trace(input_text)
+    st.session_state.turn_trace = trace
+    with activate(trace):
+        handle_user_input(input_text)
+
+def handle_user_input(input_text):
+    """Serve user input locally or hand it to the crew worker pool"""
+    conversation = st.session_state.conversation
+    topic = conversation.topic
     try:
         if not st.session_state.crew_instance:
             st.error("❌ AI crew not initialized. Please refresh the page.")
             return
-        
-        crew = st.session_state.crew_instance.cooking_crew()
-        
-        # Topic detection
-        new_topic = detect_recipe_topic(input_text)
-        topic_changed = False
-        
-        if st.session_state.memory_active and new_topic:
-            if new_topic != st.session_state.current_topic:
-                topic_changed = True
-                
-                if st.session_state.current_topic:
-                    st.session_state.chat_history.append(("SYSTEM", f"🔄 Switched topic from {st.session_state.current_topic} to {new_topic}"))
-                
-                # Reset memory but keep some context
-                for agent in crew.agents:
-                    if hasattr(agent, 'reset'):
-                        agent.reset()
-                
-                st.session_state.current_topic = new_topic
-                st.session_state.current_recipe_step = None
-                
-                # Keep limited history
-                if len(st.session_state.chat_history) > 4:
-                    st.session_state.chat_history = st.session_state.chat_history[-2:]
-            elif not st.session_state.current_topic:
-                st.session_state.current_topic = new_topic
-        
-        # Build context with notes
-        context_query = input_text
-        if st.session_state.memory_active:
-            context = build_context_with_notes()
-            if context:
-                context_query = f"""
-Current question: "{input_text}"
-
-Context:
-{context}
-
-Please respond to the current question considering the context and previous steps.
-"""
-        
-        # Get response
-        logger.info(f"Processing query: {input_text[:50]}...")
-        result = crew.kickoff(inputs={"user_query": context_query})
-        result_str = str(result)
-        
-        # Parse JSON response
-        parsed_data = parse_json_response(result_str)
-        if parsed_data:
-            # Save notes to history
-            if 'notes_making' in parsed_data:
-                st.session_state.recipe_notes.append(parsed_data['notes_making'])
-            
-            # Update current step info
-            if 'cook_recipe' in parsed_data:
-                recipe_text = parsed_data['cook_recipe']
-                # Extract step number if present
-                step_match = re.search(r'Step (\d+)', recipe_text)
-                if step_match:
-                    st.session_state.current_recipe_step = f"Step {step_match.group(1)}"
-            
-            # Store the original response for display
-            st.session_state.chat_history.append((input_text, result_str))
-        else:
-            # Regular response without JSON
-            st.session_state.chat_history.append((input_text, result_str))
-        
-        logger.info("✅ Query processed successfully")
-        
+        conversation.start_turn(input_text, on_first_sentence=speak_first_sentence())
+    except SessionBusy:
+        st.toast("👩‍🍳 Chef is still working on your last message - cancel it or wait a moment.")
+    except JobQueueFull:
+        conversation.add_message(text_message(input_text, BUSY_MESSAGE))
+        logger.warning("Crew worker pool saturated, rejected query")
     except Exception as e:
         error_msg = f"🚫 Sorry, I encountered an error: {str(e)}. Please try again!"
-        st.session_state.chat_history.append((input_text, error_msg))
+        conversation.add_message(text_message(input_text, error_msg))
         logger.error(f"Error processing query: {str(e)}")
-    
-    finally:
-        st.session_state.processing = False
+    # Steps prefetched for the old dish won't be asked for
+    if conversation.topic != topic:
+        st.session_state.speech_prefetcher.cancel()
 
 # Process input
 if send_clicked and user_input.strip():
@@ -0,0 +1,461 @@
+"""HTTP and WebSocket API for the cooking crew.
+
+Run from the crew/ directory:
+
+    python -m src.crew.api --host 0.0.0.0 --port 8000
+
+Every client conversation is a session whose messages, notes and recipe plan
+live in the session store, so a restarted or rebalanced replica picks up
+where another left off. Only recently used sessions are kept in memory.
+Kickoffs run on the process-wide crew worker pool. When the pool is
+saturated, new turns are rejected with 503 and a Retry-After header instead
+of being queued without bound, so a load balancer can shed or reroute them.
+Turns can be answered in one response, streamed as NDJSON events, or run
+over a WebSocket. Step navigation and speech never touch the crew. Audio
+the Streamlit UI publishes is served from /audio by content hash, with
+immutable cache headers and range support.
+
+One server process owns one worker pool; scale out by running more replicas
+behind a load balancer that routes by session id.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from fastapi import FastAPI, Header, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+
+from src.crew.async_runtime import get_background_loop
+from src.crew.audio_cache import audio_key, get_audio_cache
+from src.crew.audio_delivery import CACHE_CONTROL, byte_range, get_audio_store, is_content_key, sniff_mime
+from src.crew.cook_crew import get_shared_crews
+from src.crew.intent_router import get_router
+from src.crew.jobs import JobQueueFull, get_job_runner
+from src.crew.messages import message_to_dict
+from src.crew.substitutions import get_substitution_index
+from src.crew.tools.contextsaver import get_session_store
+from src.crew.tracing import Trace, activate
+from src.crew.tts import get_backend
+from src.crew.tts_scheduler import get_tts_scheduler
+from src.crew.turns import Conversation, SessionBusy
+
+logger = logging.getLogger(__name__)
+
+MAX_SESSIONS = int(os.getenv("API_MAX_SESSIONS", 1000))
+POLL_INTERVAL_S = 0.1
+RETRY_AFTER_S = 5
+
+
+class ApiSession(Conversation):
+    """Conversation of one API client; turns may arrive from several request threads"""
+
+    def __init__(self, session_id, state, store):
+        super().__init__(session_id, state, store)
+        self._lock = threading.Lock()
+
+    def start_turn(self, input_text, speak=False):
+        """Route one input under its own trace; see Conversation.start_turn"""
+        on_first_sentence = None
+        if speak:
+            backend = get_backend()
+            on_first_sentence = backend.prefetch_sentence if backend.streams_sentences else None
+        with self._lock:
+            trace = Trace(input_text)
+            with activate(trace):
+                pending = super().start_turn(input_text, on_first_sentence)
+            if pending is None:
+                trace.finish()
+            return pending
+
+    def finish_turn(self, pending):
+        """Ingest a finished kickoff and close its trace unless the plan fell back to a turn"""
+        with self._lock:
+            try:
+                return super().finish_turn(pending)
+            finally:
+                trace = pending["job"].trace
+                if trace is not None and self.pending is None:
+                    trace.finish()
+
+    def navigate(self, command):
+        """Move through the stored plan without routing or a kickoff"""
+        with self._lock:
+            if not self.recipe_session or self.recipe_session.navigate(command) is None:
+                return False
+            self.show_step(command)
+            self.save()
+            return True
+
+    def messages_since(self, total):
+        """Messages added after the session held total messages"""
+        return self.history[len(self.history) - min(self.message_total - total, len(self.history)):]
+
+    def state(self):
+        session = self.recipe_session
+        return {
+            "session_id": self.id,
+            "topic": self.topic,
+            "current_step": self.current_step,
+            "plan": {"dish": session.dish, "step": session.current.number, "total": session.total,
+                     "finished": session.finished} if session else None,
+            "message_total": self.message_total,
+            "busy": self.busy,
+        }
+
+
+class SessionRegistry:
+    """Recently used sessions in memory, everything else loaded from the store on demand"""
+
+    def __init__(self, max_sessions=MAX_SESSIONS):
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self):
+        store = get_session_store()
+        return self.get(store.create_session())
+
+    def get(self, session_id):
+        """The session, or None if the store doesn't know it"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is not None:
+                self._sessions.move_to_end(session_id)
+                return session
+        store = get_session_store()
+        state = store.load_state(session_id)
+        if state is None:
+            return None
+        with self._lock:
+            session = self._sessions.setdefault(session_id, ApiSession(session_id, state, store))
+            self._sessions.move_to_end(session_id)
+            self._evict()
+            return session
+
+    def delete(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is not None and session.pending:
+            session.pending["job"].cancel()
+        get_session_store().delete_session(session_id)
+
+    def _evict(self):
+        # Idle sessions are dropped first; their state is already in the store
+        for session_id in list(self._sessions):
+            if len(self._sessions) <= self.max_sessions:
+                break
+            if not self._sessions[session_id].busy:
+                del self._sessions[session_id]
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+sessions = SessionRegistry()
+app = FastAPI(title="Chef AI")
+
+
+class TurnRequest(BaseModel):
+    text: str
+    speak: bool = False
+
+
+class SpeechRequest(BaseModel):
+    text: str
+    voice: str = None
+    backend: str = None
+
+
+def get_session_or_404(session_id):
+    session = sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Unknown session")
+    return session
+
+
+def saturated():
+    return HTTPException(status_code=503, detail="All chefs are busy, please retry",
+                         headers={"Retry-After": str(RETRY_AFTER_S)})
+
+
+async def start_turn(session, request):
+    """Admit a turn or fail fast, before any response bytes are sent"""
+    if not request.text.strip():
+        raise HTTPException(status_code=422, detail="Empty message")
+    try:
+        return await asyncio.to_thread(session.start_turn, request.text, request.speak)
+    except SessionBusy:
+        raise HTTPException(status_code=409, detail="Still working on the previous message")
+    except JobQueueFull:
+        logger.warning("Crew worker pool saturated, rejected API turn")
+        raise saturated()
+
+
+async def turn_events(session, pending, total):
+    """Progress, streamed tokens and finally the new messages of one turn"""
+    try:
+        while pending is not None:
+            job = pending["job"]
+            yield {"type": "accepted", "kind": pending["kind"], "job_id": job.id}
+            waiter = asyncio.ensure_future(job.wait())
+            status, text = None, ""
+            while not waiter.done():
+                await asyncio.wait({waiter}, timeout=POLL_INTERVAL_S)
+                progress = (job.agent, job.tasks_done)
+                if progress != status and not job.done:
+                    status = progress
+                    yield {"type": "progress", "agent": job.agent, "task": job.tasks_done,
+                           "tasks_total": job.tasks_total, "elapsed": round(job.elapsed, 2)}
+                partial = job.stream.text if job.stream is not None else ""
+                if partial != text:
+                    # The draft is replaced by the final answer once the last agent starts writing
+                    if partial.startswith(text):
+                        yield {"type": "token", "text": partial[len(text):]}
+                    else:
+                        yield {"type": "token", "text": partial, "replace": True}
+                    text = partial
+            pending = await asyncio.to_thread(session.finish_turn, pending)
+    finally:
+        if pending is not None and not pending["job"].done:
+            # The client went away; free the worker and record the turn as stopped
+            pending["job"].cancel()
+            await asyncio.to_thread(session.finish_turn, pending)
+    for message in session.messages_since(total):
+        yield {"type": "message", "message": message_to_dict(message)}
+    yield {"type": "state", "state": session.state()}
+
+
+async def ndjson(events):
+    async for event in events:
+        yield json.dumps(event) + "\n"
+
+
+@app.get("/healthz")
+async def healthz():
+    return {"status": "ok", "sessions": len(sessions), **get_job_runner().stats()}
+
+
+@app.get("/readyz")
+async def readyz():
+    """Not ready while every crew slot is taken, so the load balancer sends new turns elsewhere"""
+    stats = get_job_runner().stats()
+    if stats["running"] + stats["queued"] >= stats["capacity"]:
+        raise saturated()
+    return {"status": "ready", **stats}
+
+
+@app.post("/sessions", status_code=201)
+async def create_session():
+    session = await asyncio.to_thread(sessions.create)
+    return session.state()
+
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str):
+    session = await asyncio.to_thread(get_session_or_404, session_id)
+    return session.state()
+
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str):
+    await asyncio.to_thread(sessions.delete, session_id)
+    return Response(status_code=204)
+
+
+@app.get("/sessions/{session_id}/messages")
+async def list_messages(session_id: str, limit: int = 30, before: int = 0):
+    """A page of messages, oldest first, ending before messages newer than the last `before` ones"""
+    session = await asyncio.to_thread(get_session_or_404, session_id)
+    messages = await asyncio.to_thread(session.store.read_messages, session_id, min(limit, 200), before)
+    return {"messages": [message_to_dict(m) for m in messages], "total": session.message_total}
+
+
+@app.post("/sessions/{session_id}/turns")
+async def post_turn(session_id: str, request: TurnRequest, stream: bool = False):
+    """Answer one user input; with stream=true the events are sent as NDJSON while the crew works"""
+    session = await asyncio.to_thread(get_session_or_404, session_id)
+    total = session.message_total
+    pending = await start_turn(session, request)
+    events = turn_events(session, pending, total)
+    if stream:
+        return StreamingResponse(ndjson(events), media_type="application/x-ndjson")
+    messages = [event["message"] async for event in events if event["type"] == "message"]
+    return {"messages": messages, "state": session.state()}
+
+
+@app.post("/sessions/{session_id}/steps/{command}")
+async def navigate(session_id: str, command: str):
+    """Go to the next step or repeat the current one from the stored plan"""
+    session = await asyncio.to_thread(get_session_or_404, session_id)
+    total = session.message_total
+    if not await asyncio.to_thread(session.navigate, command):
+        raise HTTPException(status_code=409, detail="No recipe plan to navigate, or unknown command")
+    return {"messages": [message_to_dict(m) for m in session.messages_since(total)], "state": session.state()}
+
+
+async def speech_chunks(backend, text, voice):
+    """Sentence audio from the shared background loop, where the TTS connections and prefetches live.
+
+    The outcome is reported to the TTS scheduler so a failing backend's circuit opens.
+    """
+    loop = get_background_loop()
+    scheduler = get_tts_scheduler()
+    chunks = backend.stream(text, voice)
+    start = time.perf_counter()
+    first = True
+    outcome = None
+    try:
+        while True:
+            try:
+                chunk = await asyncio.wrap_future(loop.submit(chunks.__anext__()))
+            except StopAsyncIteration:
+                outcome = True
+                break
+            except Exception:
+                outcome = False
+                raise
+            if first:
+                scheduler.observe(time.perf_counter() - start)
+                first = False
+            yield chunk
+    finally:
+        if outcome is None:
+            # The client went away; that says nothing about the backend
+            scheduler.health(backend.name).release()
+        else:
+            scheduler.report(backend, time.perf_counter() - start, outcome)
+        loop.submit(chunks.aclose())
+
+
+@app.post("/tts")
+async def speech(request: SpeechRequest):
+    """Speech for a text from the requested (or default) backend.
+
+    Cached audio from any backend in fallback order is returned whole. New
+    audio streams sentence by sentence when the backend's format allows it;
+    otherwise the TTS scheduler synthesizes it, hedging a slow backend with the
+    next one. A backend whose circuit is open is skipped either way. The
+    X-TTS-Backend header names the backend that produced the audio.
+    """
+    scheduler = get_tts_scheduler()
+    try:
+        primary = get_backend(request.backend)
+        cached, backend = await asyncio.to_thread(scheduler.cached, request.text, primary.name, request.voice)
+        if cached:
+            scheduler.observe(0.0)
+            return Response(cached, media_type=backend.mime, headers={"X-TTS-Backend": backend.name})
+        backend = scheduler.pick(primary.name)
+    except LookupError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+    if not backend.concatenable:
+        # Hand a probe pick() may have started back to the scheduler, which makes its own choice
+        scheduler.health(backend.name).release()
+        audio_bytes, backend = await asyncio.wrap_future(get_background_loop().submit(
+            scheduler.synthesize(request.text, primary.name, request.voice)))
+        if not audio_bytes:
+            raise HTTPException(status_code=502, detail="No text-to-speech backend returned audio")
+        return Response(audio_bytes, media_type=backend.mime, headers={"X-TTS-Backend": backend.name})
+
+    voice = scheduler.voice(backend, primary.name, request.voice)
+    key = audio_key(request.text, backend.name, voice)
+    cache = get_audio_cache()
+
+    async def body():
+        chunks = []
+        async for chunk in speech_chunks(backend, request.text, voice):
+            chunks.append(chunk)
+            yield chunk
+        if chunks:
+            await asyncio.to_thread(cache.put, key, backend.join(chunks))
+
+    return StreamingResponse(body(), media_type=backend.mime, headers={"X-TTS-Backend": backend.name})
+
+
+@app.get("/tts/health")
+async def speech_health():
+    """Per-backend circuit state and latency, hedging counters and step audio latency percentiles"""
+    return get_tts_scheduler().stats()
+
+
+@app.get("/substitutions/stats")
+async def substitution_stats():
+    """Questions the local substitution index answered and those that fell back to the crew"""
+    return get_substitution_index().stats()
+
+
+@app.api_route("/audio/{name}", methods=["GET", "HEAD"])
+async def published_audio(name: str, range_header: str = Header(None, alias="Range"),
+                          if_none_match: str = Header(None)):
+    """Published audio by content hash; the extension is decoration for media players"""
+    key = name.split(".", 1)[0]
+    data = await asyncio.to_thread(get_audio_store().get, key) if is_content_key(key) else None
+    if not data:
+        raise HTTPException(status_code=404, detail="Unknown audio")
+    etag = f'"{key}"'
+    headers = {"Cache-Control": CACHE_CONTROL, "ETag": etag, "Accept-Ranges": "bytes"}
+    if if_none_match and (if_none_match.strip() == "*" or etag in if_none_match):
+        return Response(status_code=304, headers=headers)
+    try:
+        bounds = byte_range(range_header, len(data))
+    except ValueError:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{len(data)}"})
+    if bounds is None:
+        return Response(data, media_type=sniff_mime(data), headers=headers)
+    start, end = bounds
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(data)}"
+    return Response(data[start:end + 1], status_code=206, media_type=sniff_mime(data), headers=headers)
+
+
+@app.websocket("/sessions/{session_id}/ws")
+async def session_socket(websocket: WebSocket, session_id: str):
+    """Send {"text": ...} to start a turn and receive the same events as the streaming endpoint"""
+    session = await asyncio.to_thread(sessions.get, session_id)
+    if session is None:
+        await websocket.close(code=4404)
+        return
+    await websocket.accept()
+    await websocket.send_json({"type": "state", "state": session.state()})
+    try:
+        while True:
+            try:
+                request = TurnRequest.model_validate(await websocket.receive_json())
+            except (ValidationError, ValueError) as e:
+                await websocket.send_json({"type": "error", "status": 422, "detail": str(e)})
+                continue
+            total = session.message_total
+            try:
+                pending = await start_turn(session, request)
+            except HTTPException as e:
+                await websocket.send_json({"type": "error", "status": e.status_code, "detail": e.detail,
+                                           "retry_after": RETRY_AFTER_S if e.status_code == 503 else None})
+                continue
+            async for event in turn_events(session, pending, total):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        logger.info(f"🔌 WebSocket for session {session_id} closed")
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve the cooking crew over HTTP and WebSocket")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    # Build the shared crews and router before the first request pays for them
+    get_shared_crews()
+    get_router()
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
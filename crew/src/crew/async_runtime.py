@@ -0,0 +1,76 @@
+"""One long-lived asyncio event loop per server process.
+
+Async work (speech synthesis, prefetching) is submitted from any thread and
+runs on a dedicated background thread, so Streamlit's script threads stay
+synchronous and never pay event loop setup per call. State bound to this
+loop, like the Edge TTS request limit, is shared across requests and sessions.
+"""
+import asyncio
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """An asyncio loop running forever on a daemon thread"""
+
+    def __init__(self, name="chef-ai-async"):
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the loop and return a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the loop and wait for its result from the calling thread"""
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            future.cancel()
+            raise
+
+    def iterate(self, agen, timeout=None):
+        """Consume an async generator from synchronous code, one item at a time"""
+        try:
+            while True:
+                try:
+                    yield self.run(agen.__anext__(), timeout)
+                except StopAsyncIteration:
+                    break
+        finally:
+            try:
+                self.run(agen.aclose(), timeout)
+            except Exception:
+                pass
+
+    def stop(self):
+        if self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
+
+
+_background_loop = None
+_lock = threading.Lock()
+
+
+def get_background_loop():
+    """The process-wide background loop, started on first use"""
+    global _background_loop
+    with _lock:
+        if _background_loop is None:
+            _background_loop = BackgroundLoop()
+            atexit.register(_background_loop.stop)
+            logger.info("✅ Background event loop started")
+        return _background_loop
@@ -0,0 +1,260 @@
+"""Content-addressed cache for synthesized speech.
+
+Audio is looked up by a hash of (normalized text, service, voice) and kept in
+two tiers: a bounded in-process LRU and a size-capped directory on disk that
+survives restarts. Both tiers evict least recently used entries first.
+
+Every clip is stored once, under the hash of its bytes; other keys are links
+to that hash, so a step cached by the TTS path and published for delivery
+under its content hash is one entry. Links live on disk as small .ref files
+and go away with the audio they name.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+from src.crew.messages import clean_for_speech
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_BYTES = 32 * 1024 * 1024
+DEFAULT_DISK_BYTES = 512 * 1024 * 1024
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "chef_ai_tts_cache")
+
+
+def content_key(data):
+    """Hash of the audio bytes themselves, the key a clip is stored under"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def audio_key(text, service, voice):
+    """Stable content hash for a piece of speech"""
+    normalized = " ".join(clean_for_speech(text).split())
+    return hashlib.sha256(f"{service}\0{voice}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Two-tier (memory + disk) LRU cache of audio bytes, safe to share across sessions"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_memory_bytes=DEFAULT_MEMORY_BYTES,
+                 max_disk_bytes=DEFAULT_DISK_BYTES):
+        self.cache_dir = cache_dir
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self._lock = threading.Lock()
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+        self._disk = OrderedDict()  # key -> size, oldest access first
+        self._disk_bytes = 0
+        self._aliases = {}  # key -> content key of the clip it names
+        self._linked = {}  # content key -> keys naming it
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0,
+                       "memory_evictions": 0, "disk_evictions": 0}
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            self._load_disk_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.audio")
+
+    def _ref_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.ref")
+
+    def _load_disk_index(self):
+        entries = []
+        refs = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith(".audio"):
+                st = os.stat(os.path.join(self.cache_dir, name))
+                entries.append((st.st_mtime, name[:-len(".audio")], st.st_size))
+            elif name.endswith(".ref"):
+                refs.append(name[:-len(".ref")])
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        for key in refs:
+            digest = self._read_ref(key)
+            if digest in self._disk:
+                self._link(key, digest)
+            else:
+                self._remove_file(self._ref_path(key))
+        self._evict_disk()
+
+    def _read_ref(self, key):
+        try:
+            with open(self._ref_path(key), encoding="ascii") as f:
+                return f.read().strip() or None
+        except (OSError, UnicodeDecodeError):
+            return None
+
+    def _write(self, path, data):
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            return True
+        except OSError as e:
+            logger.warning(f"Could not write audio cache entry: {str(e)}")
+            return False
+
+    def _remove_file(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _link(self, key, digest):
+        old = self._aliases.get(key)
+        if old == digest:
+            return
+        if old is not None:
+            self._linked[old].discard(key)
+        self._aliases[key] = digest
+        self._linked.setdefault(digest, set()).add(key)
+
+    def _unlink(self, key):
+        digest = self._aliases.pop(key, None)
+        if digest is not None:
+            self._linked.get(digest, set()).discard(key)
+            if self.cache_dir:
+                self._remove_file(self._ref_path(key))
+
+    def _drop_links(self, digest):
+        """Forget every key naming a clip that is no longer stored"""
+        for key in self._linked.pop(digest, ()):
+            self._aliases.pop(key, None)
+            if self.cache_dir:
+                self._remove_file(self._ref_path(key))
+
+    def _resolve(self, key):
+        """Content key of the clip a key names; a content key resolves to itself"""
+        digest = self._aliases.get(key)
+        if digest is None and self.cache_dir and key not in self._memory and key not in self._disk:
+            # Linked by another process sharing the directory
+            digest = self._read_ref(key)
+            if digest is not None:
+                self._link(key, digest)
+        return digest or key
+
+    def _remember(self, key, data):
+        if len(data) > self.max_memory_bytes:
+            return
+        if key in self._memory:
+            self._memory_bytes -= len(self._memory.pop(key))
+        self._memory[key] = data
+        self._memory_bytes += len(data)
+        while self._memory_bytes > self.max_memory_bytes:
+            digest, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+            self._stats["memory_evictions"] += 1
+            if not self.cache_dir:
+                self._drop_links(digest)
+
+    def _evict_disk(self):
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            digest, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._stats["disk_evictions"] += 1
+            self._remove_file(self._path(digest))
+            self._drop_links(digest)
+
+    def __contains__(self, key):
+        """Membership test that does not count as a lookup or refresh recency"""
+        with self._lock:
+            digest = self._resolve(key)
+            return digest in self._memory or digest in self._disk
+
+    def get(self, key):
+        with self._lock:
+            digest = self._resolve(key)
+            data = self._memory.get(digest)
+            if data is not None:
+                self._memory.move_to_end(digest)
+                self._stats["memory_hits"] += 1
+                return data
+
+            path = self._path(digest) if self.cache_dir else None
+            if digest not in self._disk and path and os.path.exists(path):
+                # Written by another process sharing the directory, e.g. the UI for the API server
+                self._disk[digest] = os.path.getsize(path)
+                self._disk_bytes += self._disk[digest]
+            if digest in self._disk:
+                try:
+                    with open(path, "rb") as f:
+                        data = f.read()
+                    os.utime(path)
+                except OSError:
+                    self._disk_bytes -= self._disk.pop(digest)
+                else:
+                    self._disk.move_to_end(digest)
+                    self._remember(digest, data)
+                    self._stats["disk_hits"] += 1
+                    return data
+
+            if digest != key:
+                self._unlink(key)
+            self._stats["misses"] += 1
+            return None
+
+    def put(self, key, data):
+        """Store a clip under the hash of its bytes, with key linked to it"""
+        if not data:
+            return
+        digest = content_key(data)
+        with self._lock:
+            self._remember(digest, data)
+            if self.cache_dir and digest not in self._disk and self._write(self._path(digest), data):
+                self._disk[digest] = len(data)
+                self._disk_bytes += len(data)
+            if key != digest and self._aliases.get(key) != digest:
+                # The clip is written before its link, so another process never follows a link to nothing
+                if self.cache_dir:
+                    self._write(self._ref_path(key), digest.encode("ascii"))
+                self._link(key, digest)
+            if self.cache_dir:
+                self._evict_disk()
+
+    def get_or_create(self, text, service, voice, synthesize):
+        """Return cached audio for the text, calling synthesize() only on a miss"""
+        key = audio_key(text, service, voice)
+        data = self.get(key)
+        if data is None:
+            data = synthesize()
+            if data:
+                self.put(key, data)
+        return data
+
+    def stats(self):
+        with self._lock:
+            hits = self._stats["memory_hits"] + self._stats["disk_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "links": len(self._aliases),
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_audio_cache():
+    """Process-wide audio cache shared by every Streamlit session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = AudioCache(
+                cache_dir=os.getenv("TTS_CACHE_DIR", DEFAULT_CACHE_DIR),
+                max_memory_bytes=int(os.getenv("TTS_CACHE_MEMORY_BYTES", DEFAULT_MEMORY_BYTES)),
+                max_disk_bytes=int(os.getenv("TTS_CACHE_DISK_BYTES", DEFAULT_DISK_BYTES)),
+            )
+        return _cache
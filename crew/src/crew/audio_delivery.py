@@ -0,0 +1,203 @@
+"""Content-addressed delivery of synthesized audio over HTTP.
+
+Instead of pushing every clip through Streamlit's media manager on each rerun,
+the UI publishes audio to the shared audio cache under a hash of its content
+and hands the browser a URL on the API server's /audio endpoint. Content-hash
+URLs never change meaning, so they are served with long-lived immutable cache
+headers and range support, and a tablet replays a repeated step from its own
+cache. Publishing also starts encoding a compact Opus/WebM copy once, when
+ffmpeg is installed, on the background loop. The clip itself is served until
+the copy is ready, and the copy from then on when it is smaller.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+from src.crew.async_runtime import get_background_loop
+from src.crew.audio_cache import content_key, get_audio_cache
+
+logger = logging.getLogger(__name__)
+
+OPUS = "opus"
+DEFAULT_OPUS_BITRATE = "24k"
+ENCODE_TIMEOUT_S = 30
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+_EXTENSIONS = {"audio/mpeg": "mp3", "audio/wav": "wav", "audio/webm": "webm", "audio/ogg": "ogg", "audio/mp4": "m4a"}
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+_KEY_RE = re.compile(r"[0-9a-f]{64}")
+
+
+def sniff_mime(data, default="application/octet-stream"):
+    """Audio MIME type from the bytes themselves, whatever a backend claims"""
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        return "audio/wav"
+    if data[:3] == b"ID3" or (len(data) > 1 and data[0] == 0xFF and data[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"
+    if data[:4] == b"OggS":
+        return "audio/ogg"
+    if data[:4] == b"\x1a\x45\xdf\xa3":
+        return "audio/webm"
+    if data[4:8] == b"ftyp":
+        return "audio/mp4"
+    return default
+
+
+def is_content_key(key):
+    """Whether a URL segment can be a published key; keys become cache file names"""
+    return bool(_KEY_RE.fullmatch(key))
+
+
+def variant_key(key, encoding):
+    """Key of an encoded copy; encoding is deterministic, so it is as stable as the source's hash"""
+    return hashlib.sha256(f"{key}:{encoding}".encode("ascii")).hexdigest()
+
+
+def byte_range(header, size):
+    """(start, end) inclusive for a Range header, None to send everything; ValueError if unsatisfiable"""
+    match = _RANGE_RE.match(header.strip()) if header else None
+    if not match or not any(match.groups()):
+        # Multiple ranges or another unit: ignoring the header is allowed
+        return None
+    start, end = match.groups()
+    if not start:
+        # "bytes=-500" is the last 500 bytes
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or end < start:
+        raise ValueError(f"range {header} outside {size} bytes")
+    return start, end
+
+
+class OpusEncoder:
+    """Low-bitrate speech encoding with ffmpeg's libopus, in a WebM container browsers can play"""
+
+    name = OPUS
+    mime = "audio/webm"
+
+    def __init__(self, binary=None, bitrate=DEFAULT_OPUS_BITRATE):
+        self.binary = binary or shutil.which("ffmpeg")
+        self.bitrate = bitrate
+
+    def available(self):
+        return bool(self.binary)
+
+    def encode(self, data):
+        result = subprocess.run(
+            [self.binary, "-hide_banner", "-loglevel", "error", "-i", "pipe:0", "-vn",
+             "-c:a", "libopus", "-b:a", self.bitrate, "-application", "voip", "-f", "webm", "pipe:1"],
+            input=data, capture_output=True, timeout=ENCODE_TIMEOUT_S, check=True,
+        )
+        return result.stdout
+
+
+class AudioStore:
+    """Audio published under content-hash keys, with a compact copy encoded once per clip"""
+
+    def __init__(self, cache=None, base_url="", encoder=None):
+        self.cache = cache or get_audio_cache()
+        self.base_url = base_url.rstrip("/")
+        self.encoder = encoder
+        self._lock = threading.Lock()
+        self._encoding = set()  # content keys with an encode in flight
+        self._stats = {"published": 0, "encoded": 0, "encode_failures": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def _count(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def publish(self, data, compact=True):
+        """Store audio and return the key of the copy to serve: the compact one once it is ready and smaller.
+
+        Never waits for the encoder; a clip published before its compact copy
+        is ready is served as is. Pass compact=False to skip encoding, e.g. for
+        the first streamed sentence.
+        """
+        key = content_key(data)
+        if key not in self.cache:
+            self.cache.put(key, data)
+        self._count(published=1)
+        if not compact or self.encoder is None or not self.encoder.available():
+            return key
+        encoded_key = variant_key(key, self.encoder.name)
+        encoded = self.cache.get(encoded_key) if encoded_key in self.cache else None
+        if encoded is None:
+            self.encode_later(key, data)
+            return key
+        return encoded_key if len(encoded) < len(data) else key
+
+    def encode_later(self, key, data):
+        """Encode a clip's compact copy on the background loop unless that is already under way"""
+        with self._lock:
+            if key in self._encoding:
+                return
+            self._encoding.add(key)
+        get_background_loop().submit(self._encode_in_background(key, data))
+
+    async def _encode_in_background(self, key, data):
+        try:
+            # ffmpeg runs in a worker thread so the loop keeps serving synthesis
+            await asyncio.to_thread(self._encode, key, data)
+        finally:
+            with self._lock:
+                self._encoding.discard(key)
+
+    def _encode(self, key, data):
+        try:
+            encoded = self.encoder.encode(data)
+        except (OSError, subprocess.SubprocessError) as e:
+            logger.warning(f"{self.encoder.name} encoding failed: {str(e)}")
+            self._count(encode_failures=1)
+            return
+        if encoded:
+            self.cache.put(variant_key(key, self.encoder.name), encoded)
+            self._count(encoded=1, bytes_in=len(data), bytes_out=len(encoded))
+
+    def publish_url(self, data, compact=True):
+        """(url, mime) of the copy to serve for a clip"""
+        key = self.publish(data, compact)
+        served = data if key == content_key(data) else self.cache.get(key) or b""
+        mime = sniff_mime(served)
+        return f"{self.base_url}/audio/{key}.{_EXTENSIONS.get(mime, 'bin')}", mime
+
+    def get(self, key):
+        return self.cache.get(key)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["encoding"] = len(self._encoding)
+        stats["encoder"] = self.encoder.name if self.encoder and self.encoder.available() else None
+        stats["base_url"] = self.base_url or None
+        if stats["bytes_in"]:
+            stats["compression_ratio"] = round(stats["bytes_out"] / stats["bytes_in"], 3)
+        return stats
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_audio_store():
+    """Process-wide audio store on the shared audio cache.
+
+    AUDIO_BASE_URL is where browsers reach the API server's /audio endpoint;
+    without it the UI keeps sending audio bytes through Streamlit.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            encoder = None
+            if os.getenv("AUDIO_ENCODING", OPUS).lower() == OPUS:
+                encoder = OpusEncoder(bitrate=os.getenv("AUDIO_OPUS_BITRATE", DEFAULT_OPUS_BITRATE))
+            _store = AudioStore(base_url=os.getenv("AUDIO_BASE_URL", ""), encoder=encoder)
+        return _store
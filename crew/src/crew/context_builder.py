@@ -0,0 +1,178 @@
+"""Token-budgeted conversation context for crew prompts.
+
+The context has a cached prefix (plan outline, rolling summary, recent notes)
+and a per-turn suffix (the last exchanges). Each part has a share of a fixed
+token budget. Notes that no longer fit verbatim are condensed into the rolling
+summary once, when they drop out. The oldest summary lines are merged when the
+summary outgrows its share. Prompt size therefore stays bounded however long
+the recipe gets.
+"""
+import os
+import re
+from collections import deque
+
+from src.crew.messages import SYSTEM
+
+DEFAULT_BUDGET_TOKENS = 1200
+OUTLINE_SHARE = 0.3
+SUMMARY_SHARE = 0.15
+NOTES_SHARE = 0.3
+SUMMARY_LINE_CHARS = 120
+RECENT_EXCHANGES = 3
+
+_SENTENCE_END_RE = re.compile(r'(?<=[.!?])\s')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def estimate_tokens(text):
+    """Cheap, tokenizer-free estimate (~4 characters per token)"""
+    return (len(text) + 3) // 4
+
+
+def truncate(text, max_chars):
+    return text if len(text) <= max_chars else text[:max_chars - 1].rstrip() + "…"
+
+
+def condense(text, max_chars=SUMMARY_LINE_CHARS):
+    """First sentence of a note, cut to max_chars"""
+    text = _WHITESPACE_RE.sub(' ', text).strip()
+    return truncate(_SENTENCE_END_RE.split(text, maxsplit=1)[0], max_chars)
+
+
+class ContextBuilder:
+    """Rolling, budgeted context for one chat session"""
+
+    def __init__(self, budget_tokens=DEFAULT_BUDGET_TOKENS):
+        self.budget_tokens = budget_tokens
+        self._notes = deque()  # (text, tokens), oldest first
+        self._notes_tokens = 0
+        self._summary = deque()  # (text, tokens), oldest first
+        self._summary_tokens = 0
+        self._seen = 0
+        self._prefix = None
+        self._prefix_key = None
+        self.last_tokens = 0
+
+    @property
+    def notes_budget(self):
+        return int(self.budget_tokens * NOTES_SHARE)
+
+    @property
+    def summary_budget(self):
+        return int(self.budget_tokens * SUMMARY_SHARE)
+
+    def reset(self):
+        self.__init__(self.budget_tokens)
+
+    def sync(self, recipe_notes, total=None):
+        """Take in notes added since the last call.
+
+        recipe_notes may hold only the newest notes, with total counting every
+        note ever added; a smaller total than before means the chat was cleared.
+        """
+        total = len(recipe_notes) if total is None else total
+        if total < self._seen:
+            self.reset()
+        new = min(total - self._seen, len(recipe_notes))
+        for note in recipe_notes[len(recipe_notes) - new:]:
+            self._add_note(str(note))
+        self._seen = total
+
+    def _add_note(self, note):
+        if estimate_tokens(note) > self.notes_budget:
+            note = truncate(note, self.notes_budget * 4)
+        tokens = estimate_tokens(note)
+        self._notes.append((note, tokens))
+        self._notes_tokens += tokens
+        self._prefix = None
+        # Keep at least the newest note verbatim, condensing older ones into the summary
+        while self._notes_tokens > self.notes_budget and len(self._notes) > 1:
+            old, old_tokens = self._notes.popleft()
+            self._notes_tokens -= old_tokens
+            self._add_summary_line(condense(old))
+
+    def _add_summary_line(self, line):
+        self._summary.append((line, estimate_tokens(line)))
+        self._summary_tokens += self._summary[-1][1]
+        while self._summary_tokens > self.summary_budget and len(self._summary) > 1:
+            (first, first_tokens), (second, second_tokens) = self._summary.popleft(), self._summary.popleft()
+            half = SUMMARY_LINE_CHARS // 2
+            merged = f"{truncate(first, half)}; {truncate(second, half)}"
+            merged_tokens = estimate_tokens(merged)
+            self._summary.appendleft((merged, merged_tokens))
+            self._summary_tokens += merged_tokens - first_tokens - second_tokens
+            if merged_tokens >= first_tokens + second_tokens:
+                # Merging no longer saves anything; forget the oldest line instead
+                self._summary_tokens -= merged_tokens
+                self._summary.popleft()
+
+    def prefix(self, session=None):
+        """Outline, summary and verbatim notes; rebuilt only when one of them changed"""
+        key = (session.topic, session.index, session.total, session.scale) if session else None
+        if self._prefix is not None and key == self._prefix_key:
+            return self._prefix
+
+        parts = []
+        if session:
+            outline_budget = int(self.budget_tokens * OUTLINE_SHARE)
+            outline = session.outline()
+            window = 8
+            while estimate_tokens(outline) > outline_budget and window >= 1:
+                outline = session.outline(window=window)
+                window //= 2
+            parts.append(outline)
+        if self._summary:
+            summary = "\n".join(f"- {line}" for line, _ in self._summary)
+            parts.append(f"Earlier steps (summary):\n{summary}")
+        if self._notes:
+            notes = "\n".join(f"Note {i + 1}: {note}" for i, (note, _) in enumerate(self._notes))
+            parts.append(f"Previous recipe steps and notes:\n{notes}")
+
+        self._prefix = "\n\n".join(parts)
+        self._prefix_key = key
+        return self._prefix
+
+    def build(self, chat_history, recipe_notes, session=None, notes_total=None):
+        """Context text for the next prompt, within the token budget"""
+        self.sync(recipe_notes, notes_total)
+        prefix = self.prefix(session)
+        remaining = max(self.budget_tokens - estimate_tokens(prefix), 0)
+
+        # Newest exchanges first, each answer cut to an equal share of what is left
+        exchanges = [m for m in chat_history[-RECENT_EXCHANGES * 2:] if m.kind != SYSTEM][-RECENT_EXCHANGES:]
+        lines = []
+        for message in reversed(exchanges):
+            share = remaining // max(len(exchanges) - len(lines), 1)
+            if share < 16:
+                break
+            question = message.question[:share * 4]
+            answer_chars = max(share * 4 - len(question) - 16, 0)
+            answer = message.speech_text
+            if len(answer) > answer_chars:
+                answer = answer[:answer_chars].rstrip() + "..."
+            line = f"User: {question}\nChef: {answer}"
+            tokens = estimate_tokens(line)
+            if tokens > remaining:
+                break
+            lines.append(line)
+            remaining -= tokens
+
+        parts = [prefix] if prefix else []
+        if lines:
+            parts.append("Recent conversation:\n" + "\n".join(reversed(lines)))
+        context = "\n\n".join(parts)
+        self.last_tokens = estimate_tokens(context)
+        return context
+
+    def stats(self):
+        return {
+            "budget_tokens": self.budget_tokens,
+            "last_tokens": self.last_tokens,
+            "verbatim_notes": len(self._notes),
+            "summary_lines": len(self._summary),
+            "notes_seen": self._seen,
+        }
+
+
+def new_context_builder():
+    return ContextBuilder(budget_tokens=int(os.getenv("CONTEXT_TOKEN_BUDGET", DEFAULT_BUDGET_TOKENS)))
@@ -1,17 +1,79 @@
 from crewai import Agent, Crew, Process, Task, LLM
 from crewai.project import CrewBase, agent, crew, task
+from crewai.utilities.converter import Converter, ConverterError
 from dotenv import load_dotenv
-from src.crew.tools.serper import SerperDevTool
+from src.crew.jobs import JobCancelled, run_crew
+from src.crew.messages import CookingStep, parse_cooking_step
+from src.crew.tools.serper import search_tool
+from src.crew.tools.substitutions import substitution_tool
+import json
+import logging
 import os
+import threading
+from typing import Any, Tuple
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 os.getenv("GEMINI_API_KEY")
 
-# Initialize Gemini model
-llm = LLM(model="gemini/gemini-2.0-flash")
+# Stream tokens to the UI as they are generated (see streaming.py)
+STREAMING = os.getenv("CREW_STREAMING", "false").lower() in ("1", "true", "yes")
+
+# Initialize Gemini model; the LLM client and search tool are shared by every crew in the process
+llm = LLM(model="gemini/gemini-2.0-flash", stream=STREAMING)
+
+# Repair prompt for the single retry of a final_output answer that doesn't match the schema
+STEP_SCHEMA_ERROR = ("Your answer must be a single JSON object that matches this schema, with no other text: "
+                     + json.dumps(CookingStep.model_json_schema()))
+
+
+class NoRepairConverter(Converter):
+    """Skips crewai's extra LLM conversion calls; the final_output guardrail does the one repair retry"""
+
+    def to_pydantic(self, current_attempt=1):
+        return ConverterError("final_output did not match the CookingStep schema")
+
+
+# crewai re-runs a task whose agent raised, and a cancelled job raises JobCancelled from
+# its step callback; with retries that costs up to two more LLM calls after the user stopped
+AGENT_RETRY_LIMIT = 0
+
 
-search_tool = SerperDevTool()
+# Last final_output the guardrail rejected on this worker thread, kept for run_cooking_crew
+_rejected = threading.local()
+
+
+def require_cooking_step(output) -> Tuple[bool, Any]:
+    """final_output guardrail: accept a valid CookingStep, normalized to compact JSON"""
+    step = output.pydantic if isinstance(output.pydantic, CookingStep) else parse_cooking_step(output.raw)
+    if step is None:
+        _rejected.raw = output.raw or ""
+        return False, STEP_SCHEMA_ERROR
+    _rejected.raw = None
+    return True, step.model_dump_json()
+
+
+def run_cooking_crew(job, crew, inputs):
+    """run_crew that answers with the raw final_output when it fails the guardrail retry too.
+
+    crewai raises once the retry is used up, with the validation error and the
+    schema in the message; the user gets the agent's own text instead.
+    """
+    _rejected.raw = None
+    try:
+        return run_crew(job, crew, inputs)
+    except JobCancelled:
+        raise
+    except Exception:
+        raw, _rejected.raw = getattr(_rejected, "raw", None), None
+        if raw is None or job.cancelled:
+            raise
+        logger.warning("final_output failed its guardrail retry, answering with the raw text")
+        if not raw.strip():
+            raise RuntimeError("The chef's answer came back empty") from None
+        return raw
 
 @CrewBase
 class CookCrew():
@@ -25,8 +87,9 @@ class CookCrew():
         return Agent(
             config=self.agents_config['cooking_expert'],
             llm=llm,
-            tools=[search_tool],
+            tools=[substitution_tool, search_tool],
             memory=True,
+            max_retry_limit=AGENT_RETRY_LIMIT,
         )
     @agent
     def notes_maker_agent(self) -> Agent:
@@ -35,6 +98,7 @@ class CookCrew():
             llm=llm,
             tools=[search_tool],
             memory=True,
+            max_retry_limit=AGENT_RETRY_LIMIT,
         )
     @agent
     def final_output_agent(self) -> Agent:
@@ -43,6 +107,7 @@ class CookCrew():
             llm=llm,
             tools=[search_tool],
             memory=True,
+            max_retry_limit=AGENT_RETRY_LIMIT,
         )
 
     @task
@@ -61,7 +126,11 @@ class CookCrew():
     def final_output(self) -> Task:
         return Task(
             config=self.tasks_config['final_output'],
-            agent=self.final_output_agent()
+            agent=self.final_output_agent(),
+            output_pydantic=CookingStep,
+            converter_cls=NoRepairConverter,
+            guardrail=require_cooking_step,
+            max_retries=1,
         )
 
     @crew
@@ -71,4 +140,53 @@ class CookCrew():
             tasks=self.tasks,
             process=Process.sequential,
             verbose=True
-        )
\ No newline at end of file
+        )
+
+    # Not decorated with @task/@crew so it stays out of the sequential cooking crew
+    def plan_recipe(self) -> Task:
+        return Task(
+            config=self.tasks_config['plan_recipe'],
+            agent=self.recipe_agent()
+        )
+
+    def planning_crew(self) -> Crew:
+        """Single-agent crew that generates the whole step plan for a recipe once"""
+        return Crew(
+            agents=[self.recipe_agent()],
+            tasks=[self.plan_recipe()],
+            process=Process.sequential,
+            verbose=True
+        )
+
+
+class SharedCrews:
+    """Process-wide crew templates; every kickoff runs on its own copy.
+
+    Config files, the LLM client, tools and agent definitions are built once.
+    Copies share the LLM and tools but have their own agents and tasks, so
+    concurrent kickoffs from different sessions don't share mutable state.
+    """
+
+    def __init__(self):
+        self.cook_crew = CookCrew()
+        self._cooking = self.cook_crew.cooking_crew()
+        self._planning = self.cook_crew.planning_crew()
+
+    def cooking_crew(self) -> Crew:
+        return self._cooking.copy()
+
+    def planning_crew(self) -> Crew:
+        return self._planning.copy()
+
+
+_shared_crews = None
+_shared_crews_lock = threading.Lock()
+
+
+def get_shared_crews() -> SharedCrews:
+    """The process-wide crew templates, built on first use"""
+    global _shared_crews
+    with _shared_crews_lock:
+        if _shared_crews is None:
+            _shared_crews = SharedCrews()
+        return _shared_crews
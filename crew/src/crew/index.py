@@ -1,8 +1,143 @@
-from cook_crew import CookCrew
+"""Terminal entry point for the cooking crew.
 
-def main():
+Interactive chat:
+
+    python -m src.crew.index [--trace]
+
+Batch mode reads JSONL queries ({"id": ..., "query": ...}, or bare JSON
+strings) from a file or stdin and appends one JSONL result per query:
+
+    python -m src.crew.index --batch queries.jsonl --output results.jsonl --concurrency 8
+
+Results are written as they complete. Rerunning with the same output file
+skips queries that already succeeded, so a crashed run resumes where it
+stopped.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from src.crew.cook_crew import get_shared_crews, run_cooking_crew
+from src.crew.jobs import CrewJob
+from src.crew.tracing import Trace
+
+DEFAULT_CONCURRENCY = 4
+
+
+def read_queries(lines):
+    """(id, query) pairs from JSONL lines; ids default to the line number"""
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            print(f"⚠️ Skipping line {number}: not valid JSON", file=sys.stderr)
+            continue
+        if isinstance(record, str):
+            record = {"query": record}
+        query = str(record.get("query") or "").strip() if isinstance(record, dict) else ""
+        if not query:
+            print(f"⚠️ Skipping line {number}: no query", file=sys.stderr)
+            continue
+        yield str(record.get("id", number)), query
+
+
+def completed_ids(output_path):
+    """Ids already answered in a previous run; drops a line cut off by a crash"""
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            f.truncate(end)
+    done = set()
+    for line in data[:end].splitlines():
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if record.get("status") == "ok":
+            done.add(str(record["id"]))
+    return done
+
+
+async def answer(crews, crew_name, query_id, query):
+    crew = crews.planning_crew() if crew_name == "planning" else crews.cooking_crew()
+    started = time.perf_counter()
+    record = {"id": query_id, "query": query}
+    try:
+        # Same path as the UI and API, so a guardrail rejection answers with the raw text here too
+        result = await asyncio.get_running_loop().run_in_executor(
+            None, run_cooking_crew, CrewJob(f"batch {query_id}"), crew, {"user_query": query})
+        usage = getattr(crew, "usage_metrics", None)
+        record.update(status="ok", result=result,
+                      tokens=usage.model_dump() if hasattr(usage, "model_dump") else None)
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+    record["latency_s"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+async def run_batch(queries, output_path, concurrency, crew_name):
+    """Kick off queries with at most `concurrency` in flight, appending results as they finish"""
+    loop = asyncio.get_running_loop()
+    # Kickoffs run in the default executor; size it to the concurrency limit
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch-kickoff"))
+    crews = get_shared_crews()
+    done = completed_ids(output_path)
+    slots = asyncio.Semaphore(concurrency)
+    counts = {"ok": 0, "error": 0, "skipped": 0}
+    started = time.perf_counter()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        def write(task):
+            slots.release()
+            record = task.result()
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            counts[record["status"]] += 1
+            finished = counts["ok"] + counts["error"]
+            if finished % 100 == 0:
+                rate = finished / (time.perf_counter() - started)
+                print(f"⏱️ {finished} answered ({counts['error']} errors), {rate:.2f} queries/s", file=sys.stderr)
+
+        pending = set()
+        for query_id, query in queries:
+            if query_id in done:
+                counts["skipped"] += 1
+                continue
+            # Backpressure: read the next query only once a slot is free
+            await slots.acquire()
+            task = asyncio.ensure_future(answer(crews, crew_name, query_id, query))
+            task.add_done_callback(write)
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.wait(pending)
+
+    elapsed = time.perf_counter() - started
+    print(f"✅ Batch finished in {elapsed:.1f}s: {counts['ok']} ok, {counts['error']} errors, "
+          f"{counts['skipped']} already done", file=sys.stderr)
+    return counts
+
+
+def batch(args):
+    if args.batch == "-":
+        return asyncio.run(run_batch(read_queries(sys.stdin), args.output, args.concurrency, args.crew))
+    with open(args.batch, encoding="utf-8") as f:
+        return asyncio.run(run_batch(read_queries(f), args.output, args.concurrency, args.crew))
+
+
+def chat(args):
     print("👩‍🍳 Welcome to the Cooking Assistant! Ask anything related to cooking or substitutions.\nType 'exit' to quit.\n")
-    cook_crew = CookCrew()
+    crews = get_shared_crews()
 
     while True:
         query = input("📝 Your Question: ").strip()
@@ -10,14 +145,40 @@ def main():
             print("👋 Goodbye! Happy cooking!")
             break
 
-        # Get the crew instance (no input parameter needed here)
-        crew = cook_crew.cooking_crew()
-        
-        # Pass the query as inputs to kickoff method
-        result = crew.kickoff(inputs={"user_query": query})
-        
+        # Get a fresh crew copy (no input parameter needed here)
+        crew = crews.cooking_crew()
+
+        # Pass the query as inputs; the job records agent and LLM spans into the trace
+        job = CrewJob("cli")
+        job.trace = Trace(query)
+        result = run_cooking_crew(job, crew, {"user_query": query})
+        job.trace.finish()
+
         print(f"\n🤖 Result:\n{result}")
+        if args.trace:
+            print(f"\n{job.trace.format_waterfall()}")
         print("\n--- Ask another question or type 'exit' ---\n")
 
+
+def main():
+    parser = argparse.ArgumentParser(description="Chat with the cooking crew in the terminal")
+    parser.add_argument("--trace", action="store_true", help="print a latency waterfall after each answer")
+    parser.add_argument("--batch", metavar="QUERIES", help="answer queries from a JSONL file ('-' for stdin)")
+    parser.add_argument("--output", help="JSONL file results are appended to; required with --batch")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="kickoffs in flight at once")
+    parser.add_argument("--crew", choices=("cooking", "planning"), default="cooking",
+                        help="crew to run in batch mode")
+    args = parser.parse_args()
+
+    if args.batch:
+        if not args.output:
+            parser.error("--output is required with --batch")
+        if args.concurrency < 1:
+            parser.error("--concurrency must be at least 1")
+        counts = batch(args)
+        sys.exit(1 if counts["error"] else 0)
+    chat(args)
+
+
 if __name__ == "__main__":
     main()
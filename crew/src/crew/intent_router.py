@@ -0,0 +1,236 @@
+"""Local intent routing for user inputs before any LLM call.
+
+Every input is classified once into one of:
+
+- ``navigation``   - "next", "done", "repeat this step", ... (served from the step plan)
+- ``topic``        - a request for a (new) dish, e.g. "how do I make pasta carbonara?"
+- ``substitution`` - "what can I use instead of eggs?"
+- ``conversion``   - "what is 200 g in cups?", "make it for 6 people"
+- ``question``     - anything else, which still goes to the crew
+
+Dish names are found with a token-level Aho-Corasick automaton built once from
+``config/dishes.txt``, so a query is scanned in a single pass no matter how big
+the gazetteer is. All regexes are compiled at import time.
+"""
+import os
+import re
+from dataclasses import dataclass
+
+from src.crew.recipe_session import NEXT_COMMANDS, REPEAT_COMMANDS
+
+NAVIGATION = "navigation"
+TOPIC = "topic"
+SUBSTITUTION = "substitution"
+CONVERSION = "conversion"
+QUESTION = "question"
+
+DISHES_FILE = os.path.join(os.path.dirname(__file__), "config", "dishes.txt")
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+_NAV_FILLER = {
+    "ok", "okay", "please", "now", "i'm", "im", "i", "am", "all", "let's", "lets", "go", "chef", "the",
+    "yes", "yep", "alright", "with", "this", "step", "it", "that", "what's", "whats", "one", "say",
+}
+_NAV_NEXT = {"next", "done", "ready", "finished", "continue", "proceed"}
+_NAV_REPEAT = {"repeat", "again", "pardon"}
+
+_SUBSTITUTION_RE = re.compile(
+    r"\b(?:substitut\w*|instead of|replace\w*|replacement|swap\w*|alternative\w* (?:to|for)|"
+    r"in place of|out of|don't have|do not have|dont have|without)\b"
+)
+_CONVERSION_RE = re.compile(
+    r"\b(?:convert\w*|conversion|how many|how much|in (?:grams?|cups?|ounces?|oz|ml|millilit\w*|lit\w*|"
+    r"tablespoons?|teaspoons?|tbsp|tsp|pounds?|lbs?|kg|kilo\w*|fahrenheit|celsius)|"
+    r"servings?|people|persons?|double|triple|halve|half the recipe|scale)\b"
+)
+_RECIPE_CUE_RE = re.compile(r"\b(?:recipe|cook|cooking|make|making|prepare|bake|baking|grill|roast|fry)\b")
+# Phrasings that ask for a dish's recipe rather than about a step: "how do I make ...", "recipe for ..."
+_REQUEST_CUE_RE = re.compile(
+    r"\b(?:recipes?|how (?:do|can|should|would) (?:i|you|we) (?:make|cook|prepare|bake)|how to (?:make|cook|prepare|bake)|"
+    r"(?:let's|lets|want to|like to|wanna|help me|teach me to|show me how to) (?:make|cook|prepare|bake))\b"
+    r"|^(?:please )?(?:make|cook|prepare|bake)\b"
+)
+_QUESTION_RE = re.compile(r"^(?:how|what|what's|whats|when|why|which|where|should|can|could|do|does|is|are|will|would)\b")
+# Fallback for dishes missing from the gazetteer, e.g. "a recipe for grandma's stew"
+_FALLBACK_TOPIC_RE = re.compile(
+    r"\b(?:how to (?:make|cook|prepare|bake)|(?:recipe|cook|make|prepare|bake)\s+(?:for\s+)?)"
+    r"\s*(?:(?:a|an|the|some|my|me|us)\s+)?([a-z][a-z' ]{1,40}?)(?:\s+recipe)?\s*(?:[?.!,]|$|\bfor\b|\bwith\b|\btonight\b|\btoday\b)"
+    r"|\b([a-z][a-z']+(?:\s+[a-z][a-z']+)?)\s+recipe\b"
+)
+_STOP_WORDS = frozenset({
+    "the", "a", "an", "some", "good", "best", "easy", "quick", "simple", "nice", "great", "tasty",
+    "delicious", "healthy", "homemade", "classic", "traditional", "authentic", "perfect", "my",
+    "me", "us", "your", "really", "very", "new", "different", "another", "something",
+    "dinner", "lunch", "breakfast", "meal", "dish", "food", "it", "this", "that", "i", "to",
+    "want", "would", "like", "please", "can", "you", "give", "show", "tell", "how", "do",
+})
+
+
+def _normalize_token(token):
+    """Cheap plural folding so "pancakes" and "pancake" hit the same gazetteer entry"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text):
+    return [_normalize_token(t) for t in _TOKEN_RE.findall(text.lower())]
+
+
+class DishGazetteer:
+    """Token-level Aho-Corasick automaton over dish names"""
+
+    def __init__(self, names):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [None]  # (length, canonical name) of the longest match ending at the node
+
+        for name in names:
+            tokens = tokenize(name)
+            if not tokens:
+                continue
+            node = 0
+            for token in tokens:
+                nxt = self._goto[node].get(token)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][token] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(None)
+                node = nxt
+            self._out[node] = (len(tokens), name.strip().lower())
+        self._build_fail_links()
+
+    def _build_fail_links(self):
+        queue = list(self._goto[0].values())
+        head = 0
+        while head < len(queue):
+            node = queue[head]
+            head += 1
+            for token, child in self._goto[node].items():
+                queue.append(child)
+                if node:
+                    f = self._fail[node]
+                    while f and token not in self._goto[f]:
+                        f = self._fail[f]
+                    self._fail[child] = self._goto[f].get(token, 0)
+                if self._out[child] is None:
+                    self._out[child] = self._out[self._fail[child]]
+
+    @classmethod
+    def from_file(cls, path=DISHES_FILE):
+        with open(path, encoding="utf-8") as f:
+            return cls(line for line in f if line.strip() and not line.startswith("#"))
+
+    def __len__(self):
+        return sum(1 for out in self._out if out)
+
+    def find(self, tokens):
+        """Return the longest dish name in a token list, or None"""
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        best = None
+        for token in tokens:
+            while node and token not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(token, 0)
+            hit = out[node]
+            if hit and (best is None or hit[0] > best[0]):
+                best = hit
+        return best[1] if best else None
+
+
+def _in_topic(dish, topic):
+    """Whether a dish is (part of) the active topic, e.g. "pasta" while cooking pasta carbonara"""
+    return bool(topic) and set(tokenize(dish)) <= set(tokenize(topic))
+
+
+@dataclass(slots=True)
+class Intent:
+    """Result of routing one user input"""
+    kind: str
+    text: str
+    topic: str = None
+    command: str = None
+
+
+class IntentRouter:
+    """Classifies user inputs so only open questions reach crew.kickoff"""
+
+    def __init__(self, gazetteer=None):
+        self.gazetteer = gazetteer or DishGazetteer.from_file()
+
+    def _navigation_command(self, normalized, tokens):
+        if normalized in REPEAT_COMMANDS:
+            return "repeat"
+        if normalized in NEXT_COMMANDS:
+            return "next"
+        # Short utterances made only of a command word plus filler ("ok, I'm done", "repeat that please")
+        if not tokens or len(tokens) > 6:
+            return None
+        words = set(tokens)
+        if not words - _NAV_FILLER - _NAV_NEXT - _NAV_REPEAT:
+            if words & _NAV_REPEAT:
+                return "repeat"
+            if words & _NAV_NEXT:
+                return "next"
+        return None
+
+    def detect_topic(self, text, tokens=None):
+        """Dish the user is asking about: gazetteer first, then a generic recipe phrase"""
+        tokens = tokens if tokens is not None else tokenize(text)
+        dish = self.gazetteer.find(tokens)
+        if dish:
+            return dish
+        match = _FALLBACK_TOPIC_RE.search(text.lower())
+        if match:
+            words = [w for w in (match.group(1) or match.group(2)).split() if w not in _STOP_WORDS]
+            if words:
+                return " ".join(words[:3])
+        return None
+
+    def route(self, text, current_topic=None):
+        normalized = text.strip().lower().rstrip("!.?")
+        words = _TOKEN_RE.findall(normalized)
+
+        command = self._navigation_command(normalized, words)
+        if command:
+            return Intent(NAVIGATION, text, current_topic, command)
+
+        tokens = [_normalize_token(w) for w in words]
+        dish = self.gazetteer.find(tokens)
+        if dish and _in_topic(dish, current_topic):
+            # "how long do I cook the pasta?" is about the recipe in progress, not a new one
+            dish = None
+        request = _REQUEST_CUE_RE.search(normalized)
+        # "how do I make chicken curry for 4 people" asks for a plan before anything it mentions
+        if dish and request:
+            return Intent(TOPIC, text, dish)
+        if _SUBSTITUTION_RE.search(normalized):
+            return Intent(SUBSTITUTION, text, dish or current_topic)
+        if _CONVERSION_RE.search(normalized):
+            return Intent(CONVERSION, text, current_topic)
+
+        # While a recipe is active, a question that only mentions cooking stays with it
+        cue = request or (_RECIPE_CUE_RE.search(normalized) and not (current_topic and _QUESTION_RE.match(normalized)))
+        # A bare dish name ("lasagna please") is a request too, a question that mentions one is not
+        if dish and (cue or len(tokens) <= len(dish.split()) + 2):
+            return Intent(TOPIC, text, dish)
+        if not dish and cue:
+            topic = self.detect_topic(normalized, tokens)
+            if topic and not _in_topic(topic, current_topic):
+                return Intent(TOPIC, text, topic)
+        return Intent(QUESTION, text, current_topic)
+
+
+
+_router = None
+
+
+def get_router():
+    """Process-wide router; the gazetteer is built on first use"""
+    global _router
+    if _router is None:
+        _router = IntentRouter()
+    return _router
@@ -0,0 +1,222 @@
+"""Background execution of crew kickoffs.
+
+Kickoffs run on a bounded, process-wide worker pool instead of the Streamlit
+script thread. Each submission returns a ``CrewJob`` that the UI polls for
+its status and the agent currently working, and that can be cancelled.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from src.crew.tracing import activate, install_llm_listener
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+DEFAULT_WORKERS = 4
+DEFAULT_MAX_QUEUED = 32
+
+
+class JobCancelled(Exception):
+    """Raised inside a running kickoff once its job has been cancelled"""
+
+
+class JobQueueFull(Exception):
+    """Raised when the worker pool is saturated and the job was not accepted"""
+
+
+class CrewJob:
+    """State of one kickoff, shared between a worker thread and the UI"""
+
+    def __init__(self, label=""):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.status = QUEUED
+        self.agent = None
+        self.tasks_done = 0
+        self.tasks_total = 0
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.stream = None  # TokenStream when the LLM streams tokens
+        self.trace = None  # tracing.Trace of the user turn
+        self._agent_span = None
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def elapsed(self):
+        return (self.finished or time.time()) - (self.started or self.created)
+
+    def cancel(self):
+        """Request cancellation; a running kickoff stops at its next agent step"""
+        self._cancel.set()
+        if self._future is not None:
+            self._future.cancel()
+        if not self.done:
+            self.status = CANCELLED
+            self.finished = time.time()
+
+    async def wait(self):
+        """Wait for the job to finish from an asyncio event loop"""
+        try:
+            await asyncio.wrap_future(self._future)
+        except asyncio.CancelledError:
+            # Cancelled before a worker picked it up; the job itself is already marked
+            if not self._future.cancelled():
+                raise
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+
+    def on_step(self, _step_output):
+        self.check_cancelled()
+
+    def on_task(self, task_output):
+        self.tasks_done += 1
+        self.check_cancelled()
+
+    def set_agent(self, role):
+        self.agent = (role or "").strip() or None
+        if self.trace is not None:
+            if self._agent_span is not None:
+                self.trace.end_span(self._agent_span)
+            self._agent_span = self.trace.start_span(self.agent, "agent") if self.agent else None
+
+
+def result_text(output):
+    """Text of a kickoff result; a structured output as its JSON"""
+    pydantic = getattr(output, "pydantic", None)
+    return pydantic.model_dump_json() if pydantic is not None else str(output)
+
+
+def run_crew(job, crew, inputs):
+    """Kick off a crew while reporting the running agent and honouring cancellation"""
+    roles = [getattr(task.agent, "role", None) for task in crew.tasks]
+    job.tasks_total = len(roles)
+
+    def on_task(task_output):
+        job.on_task(task_output)
+        if job.tasks_done < len(roles):
+            job.set_agent(roles[job.tasks_done])
+
+    crew.step_callback = job.on_step
+    crew.task_callback = on_task
+    if job.trace is not None:
+        install_llm_listener()
+    with activate(job.trace):
+        job.set_agent(roles[0] if roles else None)
+        try:
+            if job.stream is None:
+                return result_text(crew.kickoff(inputs=inputs))
+
+            from src.crew.streaming import bind_stream
+            with bind_stream(job):
+                return result_text(crew.kickoff(inputs=inputs))
+        finally:
+            job.set_agent(None)
+
+
+class JobRunner:
+    """Bounded thread pool for kickoffs with backpressure once the queue is full"""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_queued=DEFAULT_MAX_QUEUED):
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew-worker")
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._active = {}
+
+    def submit(self, fn, *args, label="", stream=None, trace=None):
+        """Run fn(job, *args) on a worker; raises JobQueueFull when saturated"""
+        if not self._slots.acquire(blocking=False):
+            raise JobQueueFull(f"All {self.capacity} crew slots are busy")
+        job = CrewJob(label)
+        job.stream = stream
+        job.trace = trace
+        queue_span = trace.start_span("queue wait", "crew") if trace is not None else None
+        with self._lock:
+            self._active[job.id] = job
+
+        def run():
+            if queue_span is not None:
+                trace.end_span(queue_span)
+            if job.cancelled:
+                return
+            job.status = RUNNING
+            job.started = time.time()
+            try:
+                result = fn(job, *args)
+                if job.cancelled:
+                    raise JobCancelled(job.id)
+                job.result = result
+                job.status = DONE
+            except JobCancelled:
+                job.status = CANCELLED
+                logger.info(f"⏹️ Crew job {label or job.id} cancelled")
+            except Exception as e:
+                job.error = str(e)
+                job.status = FAILED
+                logger.error(f"Crew job {label or job.id} failed: {str(e)}")
+            finally:
+                job.finished = time.time()
+
+        def release(_future):
+            with self._lock:
+                self._active.pop(job.id, None)
+            self._slots.release()
+
+        job._future = self._executor.submit(run)
+        job._future.add_done_callback(release)
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._active.get(job_id)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._active.values())
+        return {
+            "workers": self.max_workers,
+            "capacity": self.capacity,
+            "running": sum(1 for j in jobs if j.status == RUNNING),
+            "queued": sum(1 for j in jobs if j.status == QUEUED),
+        }
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Process-wide worker pool shared by every session"""
+    global _runner
+    with _runner_lock:
+        if _runner is None:
+            _runner = JobRunner(
+                max_workers=int(os.getenv("CREW_WORKERS", DEFAULT_WORKERS)),
+                max_queued=int(os.getenv("CREW_MAX_QUEUED", DEFAULT_MAX_QUEUED)),
+            )
+        return _runner
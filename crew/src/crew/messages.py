@@ -0,0 +1,255 @@
+"""Chat message records and crew response parsing.
+
+Crew responses are parsed exactly once, when they arrive, into a compact
+``ChatMessage`` that also carries its finished chat bubble HTML and creation
+time. The chat renderer only reads these records, so Streamlit reruns never
+re-parse or re-format old answers.
+
+The cooking crew's final_output task returns a ``CookingStep``, validated by
+crewai against the schema and normalized to compact JSON by its guardrail, so
+a single decode turns a result into a message.
+"""
+import json
+import re
+import time
+from dataclasses import dataclass, field
+
+from pydantic import BaseModel, Field, ValidationError
+
+RECIPE_STEP = "recipe_step"
+TEXT = "text"
+SYSTEM = "system"
+
+_JSON_FENCE_RE = re.compile(r'```(?:json)?\s*({.*?})\s*```', re.DOTALL)
+_STEP_NUMBER_RE = re.compile(r'Step (\d+)')
+_BOLD_RE = re.compile(r'\*\*(.*?)\*\*')
+_ITALIC_RE = re.compile(r'(?<!<strong>)\*([^*]+)\*(?!</strong>)')
+_MARKDOWN_RE = re.compile(r'[*#`]')
+_NEWLINES_RE = re.compile(r'\n+')
+# LLMs often put raw newlines inside JSON strings, so don't reject control characters
+_decoder = json.JSONDecoder(strict=False)
+
+
+@dataclass(slots=True)
+class ChatMessage:
+    """One chat exchange, parsed and rendered once at ingest time"""
+    question: str
+    kind: str
+    step_number: int = None
+    step_text: str = ""
+    notes: str = None
+    html: str = ""
+    speech_text: str = ""
+    created: float = field(default_factory=time.time)
+    bubble: str = ""
+
+    def __post_init__(self):
+        if not self.bubble:
+            self.bubble = render_bubble(self)
+
+
+def render_bubble(message):
+    """Complete chat HTML for one exchange, with the time it was received"""
+    if message.kind == SYSTEM:
+        return f'<div class="system-message">{message.html}</div>'
+    sent_at = time.strftime('%H:%M', time.localtime(message.created))
+    user = f"""
+    <div class="user-message">
+        <div>{message.question}</div>
+        <div class="message-time">{sent_at}</div>
+    </div>
+    """
+    if message.kind == RECIPE_STEP:
+        return user + message.html
+    return user + f"""
+    <div class="bot-message">
+        {message.html}
+        <div class="message-time">{sent_at}</div>
+    </div>
+    """
+
+
+class CookingStep(BaseModel):
+    """Structured answer of the cooking crew's final_output task"""
+    step_number: int = Field(ge=0, description="Number of the current recipe step, or 0 if the answer is not a step")
+    total_steps: int = Field(ge=0, description="Total number of steps in the recipe, or 0 if unknown")
+    instruction: str = Field(min_length=1, description="The single cooking action for this step, or the full answer "
+                                                       "to a question that is not a step")
+    details: str = Field(default="", description="Timing, technique notes and tips for the step")
+    next_up: str = Field(default="", description="Brief preview of the next step")
+    notes: str = Field(min_length=1, description="Complete documentation of this step for the cooking history")
+
+    @property
+    def cook_recipe(self):
+        """The step as cook_recipe markdown, the shape format_recipe_step renders"""
+        lines = [f"### Current Step: Step {self.step_number}", f"**{self.instruction}**"]
+        if self.details:
+            lines.append(f"*{self.details}*")
+        lines.append('*Let me know when you\'re done with this step by saying "done", "next", or "ready"*')
+        total = f" of {self.total_steps}" if self.total_steps else ""
+        lines.append(f"**Progress:** Step {self.step_number}{total} | Next up: {self.next_up or 'Finish and serve'}")
+        return "\n\n".join(lines)
+
+
+def parse_cooking_step(response_text):
+    """Decode a final_output result into a CookingStep, or None if it doesn't match the schema.
+
+    Tolerates a code fence or prose around the object and raw newlines inside strings.
+    """
+    start, end = response_text.find('{'), response_text.rfind('}')
+    if start == -1 or end < start:
+        return None
+    try:
+        return CookingStep.model_validate(_decoder.decode(response_text[start:end + 1]))
+    except (json.JSONDecodeError, ValidationError):
+        return None
+
+
+def parse_json_response(response_text):
+    """Parse JSON response and extract recipe and notes.
+
+    Handles a bare JSON object, a fenced ```json block, and an object embedded
+    in surrounding prose, in that order. Returns None if no object is found.
+    """
+    if not response_text:
+        return None
+    text = response_text.strip()
+
+    if text.startswith('{'):
+        try:
+            return _decoder.decode(text)
+        except json.JSONDecodeError:
+            pass
+
+    match = _JSON_FENCE_RE.search(text)
+    if match:
+        try:
+            return _decoder.decode(match.group(1))
+        except json.JSONDecodeError:
+            pass
+
+    start = text.find('{')
+    if start != -1:
+        try:
+            parsed, _ = _decoder.raw_decode(text, start)
+            if isinstance(parsed, dict):
+                return parsed
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def clean_for_speech(text):
+    """Strip markdown and newlines so the text reads naturally in TTS"""
+    clean_text = _MARKDOWN_RE.sub('', text)  # Remove markdown
+    clean_text = _NEWLINES_RE.sub(' ', clean_text)  # Replace newlines with spaces
+    return clean_text.strip()
+
+
+def format_recipe_step(recipe_text):
+    """Format recipe step for display with proper styling"""
+    if not recipe_text:
+        return ""
+
+    # Clean up the recipe text
+    recipe_text = recipe_text.replace('\\n', '\n').replace('\n\n', '\n').strip()
+
+    # Parse different parts of the recipe step
+    html_parts = []
+
+    for line in recipe_text.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+
+        # Check for step header (### Current Step: Step X)
+        if line.startswith('### Current Step:') or line.startswith('## Current Step:'):
+            step_title = line.replace('###', '').replace('##', '').strip()
+            html_parts.append(f'<h3>{step_title}</h3>')
+
+        # Check for main instruction (usually in **bold**)
+        elif line.startswith('**') and line.endswith('**'):
+            instruction = line.replace('**', '').strip()
+            html_parts.append(f'<div class="step-instruction">{instruction}</div>')
+
+        # Check for details/tips (usually in *italics* or contains parentheses/details)
+        elif line.startswith('*') and line.endswith('*'):
+            details = line.replace('*', '').strip()
+            if details.lower().startswith('let me know when'):
+                html_parts.append(f'<div class="step-prompt">{details}</div>')
+            else:
+                html_parts.append(f'<div class="step-details">{details}</div>')
+
+        # Check for progress info (usually starts with **Progress:**)
+        elif line.startswith('**Progress:**'):
+            progress = line.replace('**Progress:**', '').replace('**', '').strip()
+            html_parts.append(f'<div class="progress-info"><strong>Progress:</strong> {progress}</div>')
+
+        # Handle mixed formatting lines
+        else:
+            # Convert **text** to bold, then *text* to italic (but not if it's already in strong tags)
+            formatted_line = _BOLD_RE.sub(r'<strong>\1</strong>', line)
+            formatted_line = _ITALIC_RE.sub(r'<em>\1</em>', formatted_line)
+
+            # Determine the type based on content
+            lowered = formatted_line.lower()
+            if 'let me know when' in lowered or 'say "done"' in lowered:
+                html_parts.append(f'<div class="step-prompt">{formatted_line}</div>')
+            elif 'progress:' in lowered:
+                html_parts.append(f'<div class="progress-info">{formatted_line}</div>')
+            elif formatted_line.startswith('<strong>') or 'Step' in formatted_line:
+                html_parts.append(f'<div class="step-instruction">{formatted_line}</div>')
+            else:
+                html_parts.append(f'<div class="step-details">{formatted_line}</div>')
+
+    return f'<div class="recipe-step">{"".join(html_parts)}</div>'
+
+
+def format_text_response(answer):
+    """Render a non-recipe answer"""
+    return f'<div><pre style="white-space: pre-wrap; font-family: inherit;">{answer}</pre></div>'
+
+
+def recipe_message(question, recipe_text, notes=None):
+    """Build a recipe step record from the cook_recipe markdown"""
+    step_match = _STEP_NUMBER_RE.search(recipe_text)
+    return ChatMessage(
+        question=question,
+        kind=RECIPE_STEP,
+        step_number=int(step_match.group(1)) if step_match else None,
+        step_text=recipe_text,
+        notes=notes,
+        html=format_recipe_step(recipe_text),
+        speech_text=clean_for_speech(recipe_text),
+    )
+
+
+def text_message(question, answer):
+    """Build a plain answer record"""
+    return ChatMessage(
+        question=question,
+        kind=TEXT,
+        step_text=answer,
+        html=format_text_response(answer),
+        speech_text=clean_for_speech(answer),
+    )
+
+
+def system_message(text):
+    return ChatMessage(question="SYSTEM", kind=SYSTEM, step_text=text, html=text)
+
+
+def message_to_dict(message):
+    """Fields of a message for storage or JSON clients; the bubble HTML is rebuilt from them"""
+    return {name: getattr(message, name) for name in ChatMessage.__dataclass_fields__ if name != "bubble"}
+
+
+def build_message(question, response_text):
+    """Parse a crew result once into a ChatMessage"""
+    step = parse_cooking_step(response_text) if response_text else None
+    if step is None:
+        return text_message(question, response_text or "")
+    if step.step_number:
+        return recipe_message(question, step.cook_recipe, step.notes)
+    answer = f"{step.instruction}\n\n{step.details}" if step.details else step.instruction
+    return text_message(question, answer)
@@ -0,0 +1,113 @@
+"""Speculative speech prefetch for the step the user will hear next.
+
+While the user is cooking the current step, the audio for the following step
+(and the current one, for "repeat") is synthesized on the background loop and
+stored in the shared audio cache. A later next/repeat click then plays from
+the cache without waiting for synthesis. Prefetches go through the TTS
+scheduler without hedging: they have time to spare, but should still skip a
+backend whose circuit is open. When audio is delivered by URL, the compact
+encoding is produced here too, off the playback path.
+"""
+import asyncio
+import concurrent.futures
+import logging
+import threading
+
+from src.crew.async_runtime import get_background_loop
+from src.crew.audio_cache import audio_key
+from src.crew.audio_delivery import get_audio_store
+from src.crew.tts import TTS_TIMEOUT_S
+from src.crew.tts_scheduler import get_tts_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class SpeechPrefetcher:
+    """Per-session prefetch bookkeeping on top of the process-wide audio cache"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # key -> concurrent.futures.Future
+        self._unclaimed = set()  # keys prefetched but not played yet
+        self.stats = {"prefetched": 0, "hits": 0, "misses": 0, "wasted": 0, "cancelled": 0}
+
+    def prefetch(self, texts, service, voice):
+        """Synthesize texts in the background unless they are already cached.
+
+        Anything prefetched earlier that is not among the new texts can no
+        longer be played next, so it is counted as wasted.
+        """
+        keys = {}
+        for text in texts:
+            if text:
+                keys[audio_key(text, service, voice)] = text
+        # Audio a fallback backend made counts too; it is what playback will find
+        scheduler = get_tts_scheduler()
+        cached = {key for key, text in keys.items() if scheduler.cached(text, service, voice)[0]}
+
+        with self._lock:
+            for key in list(self._unclaimed - keys.keys()):
+                self._discard(key)
+            for key, text in keys.items():
+                if key in self._unclaimed or key in cached:
+                    continue
+                self._pending[key] = get_background_loop().submit(self._synthesize(key, text, service, voice))
+                self._unclaimed.add(key)
+                self.stats["prefetched"] += 1
+
+    async def _synthesize(self, key, text, service, voice):
+        try:
+            # The scheduler caches the audio under the backend that produced it
+            audio_bytes, _ = await get_tts_scheduler().synthesize(text, service, voice, hedge=False)
+            store = get_audio_store()
+            if audio_bytes and store.base_url:
+                await asyncio.to_thread(store.publish, audio_bytes)
+            return audio_bytes
+        except Exception as e:
+            logger.warning(f"Speech prefetch failed: {str(e)}")
+            return None
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def claim(self, text, service, voice, timeout=TTS_TIMEOUT_S):
+        """Record a playback and wait for an in-flight prefetch of the same audio.
+
+        Returns True if the audio was prefetched; it is then in the cache.
+        """
+        key = audio_key(text, service, voice)
+        with self._lock:
+            prefetched = key in self._unclaimed
+            self._unclaimed.discard(key)
+            future = self._pending.get(key)
+            self.stats["hits" if prefetched else "misses"] += 1
+        if future is not None:
+            try:
+                future.result(timeout)
+            except (concurrent.futures.TimeoutError, concurrent.futures.CancelledError):
+                pass
+        return prefetched
+
+    def _discard(self, key):
+        self._unclaimed.discard(key)
+        future = self._pending.pop(key, None)
+        if future is not None and future.cancel():
+            self.stats["cancelled"] += 1
+        self.stats["wasted"] += 1
+
+    def cancel(self):
+        """Drop every outstanding prefetch, e.g. when the user switches recipe"""
+        with self._lock:
+            for key in list(self._unclaimed):
+                self._discard(key)
+
+    def summary(self):
+        with self._lock:
+            prefetched = self.stats["prefetched"]
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "pending": len(self._pending),
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "wasted_ratio": round(self.stats["wasted"] / prefetched, 3) if prefetched else 0.0,
+            }
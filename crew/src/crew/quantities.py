@@ -0,0 +1,564 @@
+"""Local quantity scaling and unit conversion for recipe steps.
+
+Quantities (whole numbers, decimals, fractions such as "1 1/2" or "¾", and
+ranges such as "2-3") are found with one precompiled regex together with
+their unit. Scaling a plan rewrites every step in a single substitution
+pass over the joined step texts. Times, temperatures and sizes are left
+alone. Conversions between metric and US units are exact. Volume-to-weight
+conversions use a per-ingredient density table. "Make it for 6 people" and
+"what is 200 g in cups?" are therefore answered without a crew kickoff and
+always give the same numbers.
+"""
+import re
+from dataclasses import dataclass
+from fractions import Fraction
+
+from src.crew.intent_router import DishGazetteer, tokenize
+
+VOLUME = "volume"
+MASS = "mass"
+TEMPERATURE = "temperature"
+DEFAULT_SERVINGS = 4
+
+# canonical unit: (kind, size in ml or g, spellings)
+_UNITS = {
+    "tsp": (VOLUME, 4.92892, ("tsp", "tsps", "teaspoon", "teaspoons")),
+    "tbsp": (VOLUME, 14.7868, ("tbsp", "tbsps", "tbs", "tbl", "tablespoon", "tablespoons")),
+    "cup": (VOLUME, 236.588, ("cup", "cups")),
+    "fl oz": (VOLUME, 29.5735, ("fl oz", "fl. oz", "fluid ounce", "fluid ounces")),
+    "pint": (VOLUME, 473.176, ("pint", "pints", "pt")),
+    "quart": (VOLUME, 946.353, ("quart", "quarts", "qt")),
+    "gallon": (VOLUME, 3785.41, ("gallon", "gallons", "gal")),
+    "stick": (VOLUME, 118.294, ("stick", "sticks")),
+    "ml": (VOLUME, 1.0, ("ml", "mls", "milliliter", "milliliters", "millilitre", "millilitres")),
+    "cl": (VOLUME, 10.0, ("cl", "centiliter", "centiliters", "centilitre", "centilitres")),
+    "dl": (VOLUME, 100.0, ("dl", "deciliter", "deciliters", "decilitre", "decilitres")),
+    "l": (VOLUME, 1000.0, ("l", "liter", "liters", "litre", "litres", "ltr")),
+    "mg": (MASS, 0.001, ("mg", "milligram", "milligrams")),
+    "g": (MASS, 1.0, ("g", "gr", "gram", "grams", "gramme", "grammes")),
+    "kg": (MASS, 1000.0, ("kg", "kgs", "kilo", "kilos", "kilogram", "kilograms")),
+    "oz": (MASS, 28.3495, ("oz", "ounce", "ounces")),
+    "lb": (MASS, 453.592, ("lb", "lbs", "pound", "pounds")),
+    "°F": (TEMPERATURE, None, ("°f", "° f", "degrees f", "degrees fahrenheit", "deg f", "fahrenheit", "f")),
+    "°C": (TEMPERATURE, None, ("°c", "° c", "degrees c", "degrees celsius", "deg c", "celsius", "centigrade", "c")),
+}
+_UNIT_ALIASES = {alias: unit for unit, (_, _, aliases) in _UNITS.items() for alias in aliases}
+_PLURAL_UNITS = {"cup", "pint", "quart", "gallon", "stick"}
+_US_VOLUME = ("cup", "tbsp", "tsp")  # largest first
+_FRACTION_UNITS = {"tsp", "tbsp", "cup", "fl oz", "pint", "quart", "gallon", "stick", "oz", "lb", None}
+
+# Grams per US cup; the longest name found next to a quantity wins
+_DENSITIES = (
+    (("flour", "all-purpose flour", "all purpose flour", "plain flour", "self-rising flour", "self raising flour"), 125),
+    (("bread flour", "strong flour"), 127),
+    (("cake flour", "pastry flour"), 114),
+    (("whole wheat flour", "wholemeal flour", "spelt flour", "rye flour"), 120),
+    (("almond flour", "almond meal", "ground almonds"), 96),
+    (("coconut flour",), 112),
+    (("rice flour",), 158),
+    (("cornstarch", "corn starch", "cornflour", "potato starch", "arrowroot", "tapioca starch"), 128),
+    (("cornmeal", "polenta", "semolina"), 160),
+    (("sugar", "white sugar", "granulated sugar", "caster sugar", "superfine sugar"), 200),
+    (("brown sugar", "light brown sugar", "dark brown sugar", "coconut sugar"), 213),
+    (("powdered sugar", "icing sugar", "confectioners sugar", "confectioners' sugar"), 120),
+    (("honey", "golden syrup", "corn syrup"), 340),
+    (("maple syrup", "agave", "agave syrup"), 315),
+    (("molasses", "treacle"), 328),
+    (("butter", "margarine", "ghee"), 227),
+    (("oil", "olive oil", "vegetable oil", "canola oil", "coconut oil", "sesame oil", "sunflower oil"), 218),
+    (("water", "stock", "broth", "chicken stock", "beef stock", "vegetable stock", "wine", "vinegar", "juice",
+      "lemon juice", "lime juice", "coffee", "beer"), 237),
+    (("milk", "whole milk", "buttermilk", "soy milk", "oat milk", "almond milk"), 242),
+    (("cream", "heavy cream", "whipping cream", "double cream", "half-and-half", "coconut milk"), 238),
+    (("sour cream", "creme fraiche", "crème fraîche"), 230),
+    (("yogurt", "greek yogurt", "plain yogurt"), 245),
+    (("cream cheese", "mascarpone", "ricotta"), 232),
+    (("parmesan", "grated parmesan", "pecorino"), 100),
+    (("cheddar", "shredded cheese", "grated cheese", "mozzarella", "gruyere"), 113),
+    (("cocoa", "cocoa powder"), 85),
+    (("chocolate chips", "chocolate chip", "chopped chocolate"), 170),
+    (("rolled oats", "oats", "oatmeal"), 90),
+    (("rice", "white rice", "long-grain rice", "basmati rice", "jasmine rice", "arborio rice"), 185),
+    (("quinoa", "lentils", "couscous"), 180),
+    (("salt", "table salt", "fine sea salt"), 292),
+    (("kosher salt",), 144),
+    (("baking powder",), 192),
+    (("baking soda", "bicarbonate of soda"), 221),
+    (("yeast", "active dry yeast", "instant yeast"), 150),
+    (("ground cinnamon", "cinnamon", "ground cumin", "cumin", "paprika", "chili powder", "ground ginger"), 125),
+    (("breadcrumbs", "bread crumbs"), 108),
+    (("panko",), 50),
+    (("nuts", "chopped nuts", "walnuts", "pecans", "almonds", "chopped walnuts", "chopped pecans"), 120),
+    (("peanut butter", "almond butter", "tahini"), 258),
+    (("raisins", "dried cranberries", "chopped dates"), 150),
+    (("jam", "jelly", "preserves"), 320),
+    (("tomato paste",), 262),
+    (("ketchup", "tomato sauce", "passata"), 250),
+    (("mayonnaise", "mayo"), 220),
+    (("soy sauce", "fish sauce"), 255),
+    (("shredded coconut", "desiccated coconut"), 85),
+    (("frozen peas", "peas", "corn kernels"), 145),
+    (("grated carrot", "shredded carrot"), 110),
+    (("chopped onion", "diced onion"), 160),
+)
+
+_FRACTION_CHARS = {"½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75, "⅛": 0.125, "⅜": 0.375, "⅝": 0.625,
+                   "⅞": 0.875}
+_NICE_FRACTIONS = (Fraction(0), Fraction(1, 8), Fraction(1, 4), Fraction(1, 3), Fraction(1, 2), Fraction(2, 3),
+                   Fraction(3, 4), Fraction(7, 8), Fraction(1))
+_COUNT_FRACTIONS = (Fraction(0), Fraction(1, 4), Fraction(1, 2), Fraction(3, 4), Fraction(1))
+
+_FRAC = "[" + "".join(_FRACTION_CHARS) + "]"
+_NUMBER = rf"(?:\d+(?:\.\d+)?\s*{_FRAC}|\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?|{_FRAC})"
+_UNIT_ALT = "|".join(re.escape(a).replace(r"\ ", r"\s*") for a in sorted(_UNIT_ALIASES, key=len, reverse=True))
+_QUANTITY_RE = re.compile(
+    rf"(?<![\w/.°])(?P<low>{_NUMBER})(?:\s*(?:-|–|to)\s*(?P<high>{_NUMBER}))?"
+    rf"(?:\s*(?P<unit>{_UNIT_ALT})(?![a-z]))?(?![\w/])",
+    re.IGNORECASE,
+)
+_CONTAINERS = ("can", "cans", "tin", "tins", "jar", "jars", "package", "packages", "pkg", "packet", "packets",
+               "bag", "bags", "box", "boxes", "bottle", "bottles", "carton", "cartons", "container", "containers",
+               "pouch", "pouches", "block", "blocks")
+# "14 oz can", "14-ounce jar": a size printed on a package, not an amount to scale
+_PACKAGE_SIZE_RE = re.compile(rf"\s*-?\s*(?:{_UNIT_ALT})?\s*(?:{'|'.join(_CONTAINERS)})\b", re.IGNORECASE)
+_NEXT_WORD_RE = re.compile(r"\s*-?\s*([a-z%]+)", re.IGNORECASE)
+_PREV_WORD_RE = re.compile(r"([a-z#]+)\s*$", re.IGNORECASE)
+# "Step 3 of 8", or a package size such as "1 (14 oz) can" or "1 can (14 oz)"
+_LABEL_RE = re.compile(
+    rf"\bsteps?\s+\d+\s+of\s*$|\d\s*\(\s*$|\b(?:{'|'.join(_CONTAINERS)})\s*\(\s*$", re.IGNORECASE
+)
+# An amount's ingredient ends at the next amount, comma or "and"
+_INGREDIENT_END_RE = re.compile(r"[,;.(]|\band\b|\bor\b|\d")
+# Counts followed (or preceded) by these words are times, sizes or labels, not amounts
+_FIXED_AFTER = frozenset({
+    "minute", "minutes", "min", "mins", "hour", "hours", "hr", "hrs", "second", "seconds", "sec", "secs",
+    "day", "days", "week", "weeks", "night", "nights", "inch", "inches", "in", "cm", "mm", "x", "times",
+    "degree", "degrees", "step", "steps", "percent", "%", "am", "pm", "st", "nd", "rd", "th", "more",
+})
+_FIXED_BEFORE = frozenset({"step", "steps", "mark", "#", "gas", "number", "no", "level", "setting", "minute",
+                           "minutes", "hour", "hours", "at", "x"})
+# "Preheat the oven to 350", "heat the oil to 180", "oven temperature 200": a unitless temperature
+_HEAT_RE = re.compile(
+    r"\b(?:oven|preheat\w*|heat\w*|grill|broil\w*|temperature|temp|thermometer)\b[^.;\d\x1e]{0,20}?\b(?:to|at)\s*$"
+    r"|\b(?:oven|temperature|temp)\s*(?:of\s+)?$",
+    re.IGNORECASE,
+)
+MAX_UNITLESS_COUNT = 100  # bare numbers from here up are temperatures or model numbers, never counts
+_SEPARATOR = "\x1e"
+
+_SCALE_WORDS = {"double": 2.0, "twice": 2.0, "triple": 3.0, "quadruple": 4.0, "halve": 0.5, "half": 0.5}
+_RECIPE_OBJECT = (r"(?:it|this|that|(?:the\s+|this\s+|my\s+)?(?:whole\s+)?(?:recipe|batch|dish)|everything"
+                  r"|(?:the\s+)?(?:amounts|quantities|ingredients))")
+_PEOPLE = r"(?:people|persons?|servings?|portions?|guests?)"
+# Only explicit requests scale the plan: "make it for 6 people", "scale the recipe to 8 servings",
+# "double the recipe", "cut it in half", "I'm cooking for 2 people". Never a bare "half"/"double" or
+# "for 10 minutes".
+_SCALE_RE = re.compile(
+    rf"\b(?:make|scale|adjust|resize|change|adapt|convert|increase|reduce|redo|bump)\w*\s+{_RECIPE_OBJECT}"
+    rf"\s+(?:up\s+|down\s+)?(?:for|to|into)\s+(?P<object_servings>\d+)\s*{_PEOPLE}?\s*"
+    r"(?:instead|please|now)?\s*(?:[.?!,]|$)"
+    rf"|\b(?:for|feeds?|serves?|serving|to\s+serve|to\s+feed)\s+(?P<servings>\d+)\s*{_PEOPLE}\b"
+    rf"|\b(?P<word>double|triple|quadruple|halve)\s+{_RECIPE_OBJECT}(?![a-z])"
+    r"|\b(?:make|cook|do)\s+(?:a\s+)?(?P<batch>double|triple|half)\s+(?:batch|recipe|portion|amount)"
+    r"|\b(?:make|cook)\s+(?P<much>twice|double|triple)\s+as\s+much\b"
+    rf"|\bcut\s+{_RECIPE_OBJECT}\s+in\s+(?P<cut>half)\b"
+    rf"|\b(?:scale|multiply)\w*\s+(?:{_RECIPE_OBJECT}\s+)?(?:up\s+|down\s+)?by\s+(?P<factor>\d+(?:\.\d+)?)\b",
+    re.IGNORECASE,
+)
+# Questions about amounts per person are for the crew, not a request to rescale
+_PER_PERSON_RE = re.compile(r"\b(?:per|each|a)\s+(?:person|serving|portion|guest)\b|\bhow\s+(?:much|many)\b",
+                            re.IGNORECASE)
+_SERVINGS_RE = re.compile(
+    r"\b(?:serves|feeds|servings?:?|yield:?)\s+(\d+)|\b(\d+)\s+(?:servings|portions|people)\b", re.IGNORECASE
+)
+_TARGET_RE = re.compile(
+    rf"\b(?:in|to|into|as)\s+(?:a\s+|the\s+)?(?P<target>metric|imperial|us|american|{_UNIT_ALT})(?![a-z])"
+    rf"|\bhow\s+many\s+(?P<many>{_UNIT_ALT})(?![a-z])",
+    re.IGNORECASE,
+)
+_METRIC = "metric"
+_IMPERIAL = "imperial"
+_SYSTEMS = {"metric": _METRIC, "imperial": _IMPERIAL, "us": _IMPERIAL, "american": _IMPERIAL}
+
+
+@dataclass(slots=True)
+class Quantity:
+    """An amount found in text, with its position so it can be rewritten"""
+    start: int
+    end: int
+    low: float
+    high: float = None
+    unit: str = None
+
+    @property
+    def kind(self):
+        return _UNITS[self.unit][0] if self.unit else None
+
+
+@dataclass(slots=True)
+class QuantityAnswer:
+    """A locally computed reply; scaled is True when the recipe plan was rewritten"""
+    text: str
+    scaled: bool = False
+
+
+class DensityTable:
+    """Grams per cup by ingredient name, matched like dish names in the router"""
+
+    def __init__(self, rows=_DENSITIES):
+        self._grams_per_cup = {}
+        for names, grams in rows:
+            for name in names:
+                self._grams_per_cup[" ".join(tokenize(name))] = grams
+        self._gazetteer = DishGazetteer(self._grams_per_cup)
+
+    def find(self, text):
+        """(ingredient, grams per ml) for the longest ingredient named in text, or (None, None)"""
+        name = self._gazetteer.find(tokenize(text))
+        if name is None:
+            return None, None
+        return name, self._grams_per_cup[name] / _UNITS["cup"][1]
+
+
+_densities = None
+
+
+def get_density_table():
+    global _densities
+    if _densities is None:
+        _densities = DensityTable()
+    return _densities
+
+
+def parse_number(text):
+    text = text.strip()
+    if text[-1] in _FRACTION_CHARS:
+        whole = text[:-1].strip()
+        return (float(whole) if whole else 0.0) + _FRACTION_CHARS[text[-1]]
+    if "/" in text:
+        whole, _, frac = text.rpartition(" ")
+        numerator, denominator = frac.split("/")
+        if not float(denominator):
+            return float(numerator)
+        return (float(whole) if whole else 0.0) + float(numerator) / float(denominator)
+    return float(text)
+
+
+def unit_of(text):
+    return _UNIT_ALIASES.get(re.sub(r"\s+", " ", text.lower().strip()))
+
+
+def find_quantities(text, with_unit=False):
+    """Every amount in text, in order"""
+    quantities = []
+    for match in _QUANTITY_RE.finditer(text):
+        unit = unit_of(match.group("unit")) if match.group("unit") else None
+        if with_unit and unit is None:
+            continue
+        high = parse_number(match.group("high")) if match.group("high") else None
+        quantities.append(Quantity(match.start(), match.end(), parse_number(match.group("low")), high, unit))
+    return quantities
+
+
+def _nearest_fraction(value, fractions):
+    whole = int(value)
+    part = min(fractions, key=lambda f: abs(float(f) - (value - whole)))
+    whole += int(part)
+    part -= int(part)
+    if not whole and not part:
+        part = fractions[1]
+    if not part:
+        return str(whole)
+    return f"{whole} {part.numerator}/{part.denominator}" if whole else f"{part.numerator}/{part.denominator}"
+
+
+def format_number(value, unit=None):
+    """Round an amount the way a cook would write it"""
+    if unit in _FRACTION_UNITS:
+        if value >= 10:
+            return str(round(value))
+        return _nearest_fraction(value, _COUNT_FRACTIONS if unit is None else _NICE_FRACTIONS)
+    if unit in ("kg", "l"):
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    if value < 10:
+        rounded = round(value * 2) / 2
+        return f"{rounded:g}" if rounded else f"{value:.2g}"
+    if value < 100:
+        return str(round(value))
+    return str(round(value / 5) * 5)
+
+
+def format_unit(unit, value):
+    if unit in _PLURAL_UNITS and value > 1:
+        return unit + "s"
+    return unit
+
+
+def format_amount(low, high, unit):
+    amount = format_number(low, unit)
+    if high is not None:
+        amount += f"-{format_number(high, unit)}"
+    return f"{amount} {format_unit(unit, high or low)}" if unit else amount
+
+
+def tidy_unit(value, unit):
+    """Move an amount to the unit a recipe would use for it: 4 tbsp -> 1/4 cup, 1500 g -> 1.5 kg"""
+    if unit in _US_VOLUME:
+        ml = value * _UNITS[unit][1]
+        for candidate, threshold in (("cup", _UNITS["cup"][1] / 4 - 0.5), ("tbsp", _UNITS["tbsp"][1] - 0.05)):
+            if ml >= threshold:
+                return ml / _UNITS[candidate][1], candidate
+        return ml / _UNITS["tsp"][1], "tsp"
+    for small, big in (("g", "kg"), ("ml", "l")):
+        if unit == small and value >= 1000:
+            return value / 1000, big
+        if unit == big and value < 1:
+            return value * 1000, small
+    if unit == "oz" and value >= 16:
+        return value / 16, "lb"
+    if unit == "lb" and value < 1:
+        return value * 16, "oz"
+    return value, unit
+
+
+def _is_fixed(text, match):
+    """True for amounts that are times, sizes, temperatures or labels"""
+    if _LABEL_RE.search(text, max(match.start() - 24, 0), match.start()):
+        return True
+    package = _PACKAGE_SIZE_RE.match(text, match.end())
+    if match.group("unit"):
+        return _UNITS[unit_of(match.group("unit"))][0] == TEMPERATURE or bool(package)
+    if package and package.group(0).strip(" -").lower() not in _CONTAINERS:
+        # "14-oz can" is a size; "2 cans" is a count
+        return True
+    if parse_number(match.group("low")) >= MAX_UNITLESS_COUNT:
+        return True
+    if _HEAT_RE.search(text, max(match.start() - 40, 0), match.start()):
+        return True
+    after = _NEXT_WORD_RE.match(text, match.end())
+    if after and after.group(1).lower() in _FIXED_AFTER:
+        return True
+    before = _PREV_WORD_RE.search(text, max(match.start() - 16, 0), match.start())
+    return bool(before and before.group(1).lower() in _FIXED_BEFORE)
+
+
+def scale_texts(texts, factor):
+    """Scale every amount in a list of texts in one regex pass over the joined texts"""
+    joined = _SEPARATOR.join(texts)
+
+    def rescale(match):
+        if _is_fixed(joined, match):
+            return match.group(0)
+        unit = unit_of(match.group("unit")) if match.group("unit") else None
+        low = parse_number(match.group("low")) * factor
+        high = parse_number(match.group("high")) * factor if match.group("high") else None
+        if unit:
+            tidied, new_unit = tidy_unit(low, unit)
+            if high is not None:
+                high *= tidied / low if low else 1
+            low, unit = tidied, new_unit
+        return format_amount(low, high, unit)
+
+    return _QUANTITY_RE.sub(rescale, joined).split(_SEPARATOR)
+
+
+def scale_session(session, factor):
+    """Rewrite every step of a RecipeSession in place.
+
+    Amounts are always scaled from the plan as generated, so rounding does not
+    pile up when the user rescales several times.
+    """
+    if session.original is None:
+        session.original = [[step.instruction, step.details] for step in session.steps]
+    session.scale *= factor
+    texts = [text for step in session.original for text in step]
+    scaled = scale_texts(texts, session.scale) if session.scale != 1 else texts
+    for i, step in enumerate(session.steps):
+        step.instruction, step.details = scaled[2 * i], scaled[2 * i + 1]
+
+
+def detect_servings(texts):
+    """Servings a recipe says it makes, from step texts and notes"""
+    for text in texts:
+        match = _SERVINGS_RE.search(text or "")
+        if match:
+            return int(match.group(1) or match.group(2))
+    return None
+
+
+def parse_scaling(question):
+    """("servings", n) or ("factor", x) for an explicit scaling request, else None"""
+    match = _SCALE_RE.search(question)
+    if not match:
+        return None
+    if match.group("servings") and _PER_PERSON_RE.search(question):
+        # "how much pasta per person for 2 people?"
+        return None
+    servings = match.group("object_servings") or match.group("servings")
+    if servings:
+        return ("servings", int(servings)) if int(servings) > 0 else None
+    word = match.group("word") or match.group("batch") or match.group("much") or match.group("cut")
+    if word:
+        return "factor", _SCALE_WORDS[word.lower()]
+    factor = float(match.group("factor"))
+    return ("factor", factor) if factor > 0 else None
+
+
+def convert_temperature(value, unit):
+    if unit == "°F":
+        return (value - 32) * 5 / 9, "°C"
+    return value * 9 / 5 + 32, "°F"
+
+
+def target_unit(kind, target, grams_per_ml):
+    """Concrete unit for a target unit or measuring system, given what is being converted"""
+    system = _SYSTEMS.get(target)
+    if system is None:
+        return unit_of(target)
+    if system == _METRIC:
+        return "g" if kind == MASS or grams_per_ml else "ml"
+    return "oz" if kind == MASS else "cup"
+
+
+def convert(value, unit, target, grams_per_ml=None):
+    """Convert an amount to a unit, or None if they measure different things and no density is known"""
+    kind, size, _ = _UNITS[unit]
+    target_kind, target_size, _ = _UNITS[target]
+    if kind == TEMPERATURE or target_kind == TEMPERATURE:
+        return None
+    base = value * size
+    if kind != target_kind:
+        if not grams_per_ml:
+            return None
+        base = base * grams_per_ml if kind == VOLUME else base / grams_per_ml
+    return base / target_size
+
+
+def temperature_target(target):
+    """°C or °F for a conversion target that asks for a temperature scale, else None"""
+    if target in ("°C", "°F"):
+        return target
+    system = _SYSTEMS.get(target)
+    if system is None:
+        return None
+    return "°C" if system == _METRIC else "°F"
+
+
+def _convert_phrase(quantity, target, ingredient_text):
+    """'2 cups' -> '250 g' for one quantity, or None"""
+    if quantity.kind == TEMPERATURE:
+        if temperature_target(target) in (None, quantity.unit):
+            return None
+        value, unit = convert_temperature(quantity.low, quantity.unit)
+        return f"{round(value / 5) * 5:g}{unit}"
+    ingredient, grams_per_ml = get_density_table().find(ingredient_text)
+    unit = target_unit(quantity.kind, target, grams_per_ml)
+    if unit is None or unit == quantity.unit:
+        return None
+    low = convert(quantity.low, quantity.unit, unit, grams_per_ml)
+    if low is None:
+        return None
+    high = convert(quantity.high, quantity.unit, unit, grams_per_ml) if quantity.high is not None else None
+    if target in _SYSTEMS:
+        tidied, tidy = tidy_unit(low, unit)
+        high = high * tidied / low if high is not None and low else high
+        low, unit = tidied, tidy
+    return format_amount(low, high, unit)
+
+
+def answer_conversion(question, context_texts=()):
+    """Answer 'what is 200 g in cups?' or 'how much flour is that in grams?', or None"""
+    target_match = _TARGET_RE.search(question)
+    target = None
+    if target_match:
+        target = (target_match.group("target") or target_match.group("many")).lower()
+        target = target if target in _SYSTEMS else unit_of(target)
+
+    quantities = [q for q in find_quantities(question, with_unit=True)
+                  if not target_match or q.start < target_match.start() or q.start >= target_match.end()]
+    if not quantities and target in ("°C", "°F"):
+        # "350 in celsius": a bare number is in the other scale
+        bare = find_quantities(question)
+        if bare:
+            quantities = [Quantity(bare[0].start, bare[0].end, bare[0].low, None, "°F" if target == "°C" else "°C")]
+    if quantities:
+        quantity = quantities[0]
+        if quantity.kind == TEMPERATURE:
+            # "how much longer at 180c?" mentions a temperature but asks something else
+            if temperature_target(target) in (None, quantity.unit):
+                return None
+            value, unit = convert_temperature(quantity.low, quantity.unit)
+            return f"{format_number(quantity.low)}{quantity.unit} is about {round(value / 5) * 5:g}{unit}."
+        if target is None:
+            return None
+        ingredient, grams_per_ml = get_density_table().find(question[quantity.end:])
+        converted = _convert_phrase(quantity, target, question[quantity.end:])
+        if converted is None:
+            if grams_per_ml is None and target not in _SYSTEMS and _UNITS[target][0] != quantity.kind:
+                # Weight-volume without a known ingredient: answer for water and say so
+                ingredient, grams_per_ml = "water", 1.0
+                low = convert(quantity.low, quantity.unit, target, grams_per_ml)
+                value, unit = tidy_unit(low, target) if target in _US_VOLUME else (low, target)
+                return (f"{question[quantity.start:quantity.end]} is about {format_amount(value, None, unit)} "
+                        f"of water. Weight to volume depends on the ingredient - tell me which one for a closer answer.")
+            return None
+        of = f" of {ingredient}" if ingredient else ""
+        return f"{question[quantity.start:quantity.end]}{of} is about {converted}."
+
+    # No amount in the question: convert the amounts in the current step
+    if target is None:
+        return None
+    named, _ = get_density_table().find(question)
+    lines = []
+    for text in context_texts:
+        for quantity in find_quantities(text or "", with_unit=True):
+            following = _INGREDIENT_END_RE.split(text[quantity.end:quantity.end + 40], maxsplit=1)[0]
+            ingredient, _ = get_density_table().find(following)
+            if named and ingredient != named:
+                continue
+            converted = _convert_phrase(quantity, target, following)
+            if converted:
+                label = f" {ingredient}" if ingredient else ""
+                lines.append(f"- {text[quantity.start:quantity.end]}{label} → {converted}")
+    if not lines:
+        return None
+    return "In this step:\n" + "\n".join(dict.fromkeys(lines))
+
+
+def answer_quantity_question(question, session=None, notes=()):
+    """Answer a conversion or scaling question locally, or return None so the crew answers it.
+
+    A question with a conversion target ("in ml", "how many cups") is only ever
+    a conversion. Otherwise an explicit scaling request rewrites every step of
+    the session's plan in place.
+    """
+    context = []
+    if session and not session.finished:
+        context = [session.current.instruction, session.current.details]
+    if _TARGET_RE.search(question):
+        text = answer_conversion(question, context)
+        return QuantityAnswer(text) if text else None
+
+    scaling = parse_scaling(question)
+    if scaling and session and not session.finished:
+        step_texts = [text for step in session.steps for text in (step.instruction, step.details)]
+        servings = session.servings or detect_servings([*notes, *step_texts])
+        assumed = servings is None
+        servings = servings or DEFAULT_SERVINGS
+        kind, value = scaling
+        target = value if kind == "servings" else servings * value
+        factor = target / servings
+        if factor == 1:
+            return QuantityAnswer(f"The recipe already makes {format_number(servings)} servings.")
+        scale_session(session, factor)
+        session.servings = target
+        assumption = f" (assuming it served {servings})" if assumed else ""
+        return QuantityAnswer(
+            f"Scaled the recipe from {format_number(servings)} to {format_number(target)} servings{assumption}. "
+            f"Every amount is now x{factor:g}.",
+            scaled=True,
+        )
+    if scaling:
+        return None
+    text = answer_conversion(question, context)
+    return QuantityAnswer(text) if text else None
@@ -0,0 +1,150 @@
+"""Local step plan for an interactive cooking session.
+
+The planning crew generates every step of a recipe once; after that the
+navigation commands ("next", "done", "ready", "repeat") only move a pointer
+over the stored plan, so they never need another crew kickoff.
+"""
+from dataclasses import asdict, dataclass, field
+
+NEXT_COMMANDS = {"next", "done", "ready", "next step", "done with this step"}
+REPEAT_COMMANDS = {"repeat", "repeat this step", "repeat step", "again"}
+
+
+@dataclass
+class RecipeStep:
+    """A single numbered step of a recipe plan"""
+    number: int
+    instruction: str
+    details: str = ""
+
+
+@dataclass
+class RecipeSession:
+    """Structured recipe plan plus a pointer to the step the user is on"""
+    dish: str
+    steps: list = field(default_factory=list)
+    topic: str = ""
+    index: int = 0
+    finished: bool = False
+    servings: int = None
+    scale: float = 1.0
+    original: list = None  # [instruction, details] per step as planned, kept once the plan is scaled
+
+    @classmethod
+    def from_plan(cls, plan, topic=""):
+        """Build a session from the planning crew's parsed JSON output.
+
+        Returns None when the plan has no usable steps so the caller can fall
+        back to the regular crew.
+        """
+        if not isinstance(plan, dict):
+            return None
+
+        steps = []
+        for raw in plan.get("steps") or []:
+            if isinstance(raw, str):
+                instruction, details = raw, ""
+            elif isinstance(raw, dict):
+                instruction = raw.get("instruction") or raw.get("action") or ""
+                details = raw.get("details") or raw.get("tips") or ""
+            else:
+                continue
+            instruction = str(instruction).strip()
+            if instruction:
+                steps.append(RecipeStep(len(steps) + 1, instruction, str(details).strip()))
+
+        if not steps:
+            return None
+        dish = str(plan.get("dish") or topic or "recipe").strip()
+        return cls(dish=dish, steps=steps, topic=topic)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a session saved with to_dict()"""
+        return cls(dish=data["dish"], steps=[RecipeStep(**step) for step in data["steps"]],
+                   topic=data.get("topic", ""), index=data.get("index", 0), finished=data.get("finished", False),
+                   servings=data.get("servings"), scale=data.get("scale", 1.0), original=data.get("original"))
+
+    def to_dict(self):
+        return asdict(self)
+
+    @property
+    def total(self):
+        return len(self.steps)
+
+    @property
+    def current(self):
+        return self.steps[self.index]
+
+    @property
+    def upcoming(self):
+        if self.index + 1 < self.total:
+            return self.steps[self.index + 1]
+        return None
+
+    def navigate(self, command):
+        """Apply a navigation command and return the step to show.
+
+        Returns None if the command is not a navigation command, in which case
+        it has to be answered by the crew.
+        """
+        command = command.strip().lower().rstrip("!.")
+        if command in REPEAT_COMMANDS:
+            return self.current
+        if command in NEXT_COMMANDS:
+            if self.index + 1 < self.total:
+                self.index += 1
+            else:
+                self.finished = True
+            return self.current
+        return None
+
+    def render_step(self, step=None):
+        """Render a step in the same markdown shape as the cook_recipe task output"""
+        step = step or self.current
+        if self.finished:
+            return (
+                f"### Current Step: Finished\n"
+                f"**🎉 That was the last step - your {self.dish} is ready!**\n\n"
+                f"*Ask me anything about serving, storing or variations.*"
+            )
+
+        lines = [f"### Current Step: Step {step.number}", f"**{step.instruction}**"]
+        if step.details:
+            lines.append(f"*{step.details}*")
+        lines.append('*Let me know when you\'re done with this step by saying "done", "next", or "ready"*')
+
+        nxt = self.steps[step.number] if step.number < self.total else None
+        preview = nxt.instruction if nxt else "Finish and serve"
+        lines.append(f"**Progress:** Step {step.number} of {self.total} | Next up: {preview}")
+        return "\n\n".join(lines)
+
+    def note_for(self, step=None):
+        """History note for a step, in the same shape as the notes_making task output"""
+        step = step or self.current
+        note = f"Step {step.number}: {step.instruction}"
+        if step.details:
+            note += f" {step.details}"
+        return note
+
+    def as_response(self):
+        """Current step as the JSON-shaped dict the chat renderer expects"""
+        return {"cook_recipe": self.render_step(), "notes_making": self.note_for()}
+
+    def outline(self, window=None):
+        """Compact plan outline used as context for free-form questions.
+
+        With a window, only steps within that distance of the current one are listed.
+        """
+        lines = [f"Recipe plan for {self.dish} (user is on step {self.current.number} of {self.total}):"]
+        steps = self.steps
+        if window is not None:
+            first = max(self.index - window, 0)
+            steps = steps[first:self.index + window + 1]
+            if first:
+                lines.append(f"... {first} earlier steps")
+        lines.extend(f"{s.number}. {s.instruction}" for s in steps)
+        hidden = self.total - (steps[-1].number if steps else 0)
+        if window is not None and hidden > 0:
+            lines.append(f"... {hidden} more steps")
+        return "\n".join(lines)
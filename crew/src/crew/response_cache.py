@@ -0,0 +1,294 @@
+"""Cache of crew answers to context-free opening questions.
+
+Many conversations start with the same question. The parsed answer to a first
+turn is stored under the normalized question (exact tier) and under an
+embedding of it (semantic tier). A later first turn that matches either tier is
+answered without a kickoff. The semantic tier is a brute-force NumPy cosine
+search over all cached embeddings, restricted to entries about the same dish.
+Before the search, words the cache has never seen are snapped to the closest
+cached word, so "carbonera" finds the answer stored for "carbonara".
+Entries persist in SQLite, expire after a TTL and are evicted least recently
+used first.
+"""
+import difflib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "chef_ai_response_cache.sqlite3")
+DEFAULT_TTL_S = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+# Calibrated on paraphrase and typo pairs of first-turn questions: rewordings and snapped typos
+# score 0.95-1.0, while one extra word ("what to serve with chicken tikka masala",
+# "can I freeze slow cooker beef stew") still scores up to 0.91 and asks something else
+DEFAULT_SIMILARITY = 0.94
+EMBEDDING_DIM = 512
+EMBEDDING_VERSION = 2  # stored as the database user_version; bump when embed_words changes
+TYPO_CUTOFF = 0.85  # difflib ratio: a slipped letter in a longer word, never "beef" -> "beet"
+
+EXACT = "exact"
+SEMANTIC = "semantic"
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset("""
+a an and are as at bake baking be by can could cook cooking do does for from give how i in is it
+make making me my of on or please prepare recipe should the to want what whats when with you your
+""".split())
+
+
+def normalize_question(text):
+    """Exact-tier key: lowercase words without punctuation or extra whitespace"""
+    return " ".join(_WORD_RE.findall(str(text).lower()))
+
+
+def _feature_index(feature, dim):
+    # crc32 is stable across processes, unlike hash(), so stored embeddings stay valid
+    h = zlib.crc32(feature.encode("utf-8"))
+    return h % dim, 1.0 if h & 0x80000000 else -1.0
+
+
+def content_words(text):
+    """Words that carry the question, with plurals folded so "eggs" and "egg" match"""
+    return [w[:-1] if len(w) > 3 and w.endswith("s") and not w.endswith("ss") else w
+            for w in _WORD_RE.findall(str(text).lower()) if w not in _STOP_WORDS]
+
+
+def dish_words(topic):
+    """A dish name as the set of content words the semantic tier compares topics by"""
+    return frozenset(content_words(topic or ""))
+
+
+def embed_question(text, dim=EMBEDDING_DIM):
+    """Embedding of a question's content words"""
+    return embed_words(content_words(text), dim)
+
+
+def embed_words(words, dim=EMBEDDING_DIM):
+    """Unit-length hashed bag of content words, word pairs and character trigrams.
+
+    Cheap and local, so an embedding costs microseconds rather than an API call.
+    """
+    vector = np.zeros(dim, dtype=np.float32)
+    features = [(w, 1.0) for w in words]
+    features += [(f"{a} {b}", 0.5) for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        features += [(padded[i:i + 3], 0.25) for i in range(len(padded) - 2)]
+    for feature, weight in features:
+        index, sign = _feature_index(feature, dim)
+        vector[index] += sign * weight
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class ResponseCache:
+    """Exact + semantic cache of parsed first-turn answers, shared across sessions"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl_s=DEFAULT_TTL_S, max_entries=DEFAULT_MAX_ENTRIES,
+                 similarity=DEFAULT_SIMILARITY, dim=EMBEDDING_DIM):
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        self.similarity = similarity
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._stats = {"exact_hits": 0, "semantic_hits": 0, "misses": 0, "evictions": 0}
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " normalized TEXT PRIMARY KEY, question TEXT NOT NULL, topic TEXT, embedding BLOB NOT NULL,"
+            " payload TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        if self._conn.execute("PRAGMA user_version").fetchone()[0] < EMBEDDING_VERSION:
+            self._reembed()
+
+        # In-memory index: row i of the matrix belongs to self._keys[i]
+        self._keys = []
+        self._rows = {}
+        self._created = []
+        self._accessed = []
+        self._topics = []  # dish_words of each entry's topic, so "Pancakes" and "pancake" are one topic
+        self._vocabulary = Counter()  # content words of the cached questions, for typo snapping
+        self._matrix = np.zeros((0, dim), dtype=np.float32)
+        self._load()
+
+    def _reembed(self):
+        """Recompute stored embeddings written by an older embed_words"""
+        rows = self._conn.execute("SELECT normalized, question FROM responses").fetchall()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            for normalized, question in rows:
+                self._conn.execute("UPDATE responses SET embedding = ? WHERE normalized = ?",
+                                   (embed_question(question, self.dim).tobytes(), normalized))
+            self._conn.execute(f"PRAGMA user_version = {EMBEDDING_VERSION}")
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        logger.info(f"🔁 Response cache re-embedded {len(rows)} entries")
+
+    def _load(self):
+        cutoff = time.time() - self.ttl_s
+        self._conn.execute("DELETE FROM responses WHERE created < ?", (cutoff,))
+        rows = self._conn.execute(
+            "SELECT normalized, topic, embedding, created, accessed FROM responses"
+            " ORDER BY accessed DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        embeddings = []
+        for normalized, topic, blob, created, accessed in rows:
+            embedding = np.frombuffer(blob, dtype=np.float32)
+            if embedding.shape[0] != self.dim:
+                continue
+            self._rows[normalized] = len(self._keys)
+            self._keys.append(normalized)
+            self._topics.append(dish_words(topic))
+            self._created.append(created)
+            self._accessed.append(accessed)
+            self._vocabulary.update(content_words(normalized))
+            embeddings.append(embedding)
+        if embeddings:
+            self._matrix = np.vstack(embeddings)
+        logger.info(f"✅ Response cache loaded {len(self._keys)} entries")
+
+    def __len__(self):
+        return len(self._keys)
+
+    def _snap(self, words):
+        """Replace words the cache has never seen by their closest cached spelling, if one is close"""
+        snapped = []
+        for word in words:
+            if word not in self._vocabulary:
+                close = difflib.get_close_matches(word, self._vocabulary, n=1, cutoff=TYPO_CUTOFF)
+                if close:
+                    word = close[0]
+            snapped.append(word)
+        return snapped
+
+    def lookup(self, question, topic=None):
+        """Cached payload for a question as (payload, tier), or None on a miss"""
+        normalized = normalize_question(question)
+        if not normalized:
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._rows.get(normalized)
+            tier = EXACT
+            if row is None and self._keys:
+                words = self._snap(content_words(question))
+                sims = self._matrix @ embed_words(words, self.dim)
+                # The router names a dish as typed ("carbonera"), or finds a shorter one in a typo
+                # ("bananna bread" -> "bread"), so an entry whose dish the snapped question names counts too
+                wanted, named = frozenset(self._snap(dish_words(topic))), frozenset(words)
+                same_topic = np.fromiter((t == wanted or bool(t) and t <= named for t in self._topics),
+                                         dtype=bool, count=len(self._topics))
+                sims[~same_topic] = -1.0
+                best = int(np.argmax(sims))
+                if sims[best] >= self.similarity:
+                    row, tier = best, SEMANTIC
+            if row is not None and now - self._created[row] > self.ttl_s:
+                self._remove(row)
+                row = None
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+
+            key = self._keys[row]
+            stored = self._conn.execute("SELECT payload FROM responses WHERE normalized = ?", (key,)).fetchone()
+            if stored is None:
+                self._remove(row)
+                self._stats["misses"] += 1
+                return None
+            self._accessed[row] = now
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE normalized = ?", (now, key))
+            self._stats[f"{tier}_hits"] += 1
+        logger.info(f"⚡ Response cache {tier} hit: {question[:50]}")
+        return json.loads(stored[0]), tier
+
+    def put(self, question, payload, topic=None):
+        normalized = normalize_question(question)
+        if not normalized:
+            return
+        embedding = embed_question(question, self.dim)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (normalized, question, topic, embedding, payload, created, accessed)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (normalized, question, topic, embedding.tobytes(), json.dumps(payload), now, now),
+            )
+            row = self._rows.get(normalized)
+            if row is None:
+                self._rows[normalized] = len(self._keys)
+                self._keys.append(normalized)
+                self._topics.append(dish_words(topic))
+                self._created.append(now)
+                self._accessed.append(now)
+                self._vocabulary.update(content_words(normalized))
+                self._matrix = np.vstack([self._matrix, embedding[None, :]])
+            else:
+                self._topics[row] = dish_words(topic)
+                self._created[row] = now
+                self._accessed[row] = now
+                self._matrix[row] = embedding
+            while len(self._keys) > self.max_entries:
+                self._remove(int(np.argmin(self._accessed)))
+                self._stats["evictions"] += 1
+
+    def _remove(self, row):
+        """Drop a row by moving the last row into its place"""
+        key = self._keys[row]
+        last = len(self._keys) - 1
+        if row != last:
+            for column in (self._keys, self._topics, self._created, self._accessed):
+                column[row] = column[last]
+            self._matrix[row] = self._matrix[last]
+            self._rows[self._keys[row]] = row
+        for column in (self._keys, self._topics, self._created, self._accessed):
+            column.pop()
+        self._matrix = self._matrix[:last]
+        del self._rows[key]
+        for word in content_words(key):
+            self._vocabulary[word] -= 1
+            if self._vocabulary[word] <= 0:
+                del self._vocabulary[word]
+        self._conn.execute("DELETE FROM responses WHERE normalized = ?", (key,))
+
+    def stats(self):
+        with self._lock:
+            hits = self._stats["exact_hits"] + self._stats["semantic_hits"]
+            lookups = hits + self._stats["misses"]
+            return {
+                **self._stats,
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._keys),
+                "similarity_threshold": self.similarity,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """Process-wide response cache shared by every session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(
+                db_path=os.getenv("RESPONSE_CACHE_PATH", DEFAULT_DB_PATH),
+                ttl_s=float(os.getenv("RESPONSE_CACHE_TTL_S", DEFAULT_TTL_S)),
+                max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                similarity=float(os.getenv("RESPONSE_CACHE_SIMILARITY", DEFAULT_SIMILARITY)),
+            )
+        return _cache
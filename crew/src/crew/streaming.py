@@ -0,0 +1,271 @@
+"""Token streaming from the LLM into the chat.
+
+With ``CREW_STREAMING`` enabled the crew's LLM streams tokens, which crewai
+publishes as ``LLMStreamChunkEvent``s. Chunks are routed to the ``TokenStream``
+of the job whose worker thread produced them. The stream shows the
+cook_recipe agent's draft as it is written and pulls the ``instruction``
+field out of the final_output agent's partial JSON, so the step appears
+long before the last agent finishes. The first sentence handed to TTS early is
+cut from the step rendered the way playback speaks it, so its audio is reused.
+Time to first token and first complete sentence are recorded per request.
+"""
+import logging
+import re
+import threading
+import time
+from collections import deque
+
+from src.crew.messages import CookingStep, clean_for_speech
+from src.crew.tts import split_sentences
+
+logger = logging.getLogger(__name__)
+
+COOK_RECIPE_TASK = 0
+FINAL_OUTPUT_TASK = 2
+
+_FINAL_ANSWER_RE = re.compile(r'Final Answer:\s*', re.IGNORECASE)
+_STEP_NUMBER_RE = re.compile(r'"step_number"\s*:\s*(\d+)')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+class JsonStringFieldExtractor:
+    """Incrementally decodes one string field from a JSON object that is still being generated"""
+
+    def __init__(self, field):
+        self._key = f'"{field}"'
+        self._buffer = ""
+        self._pos = 0
+        self._state = "key"  # key -> colon -> value -> done
+        self._chars = []
+
+    @property
+    def value(self):
+        return "".join(self._chars)
+
+    @property
+    def started(self):
+        return self._state in ("value", "done")
+
+    @property
+    def complete(self):
+        return self._state == "done"
+
+    def feed(self, chunk):
+        """Consume more raw text; returns the newly decoded characters of the field"""
+        if self._state == "done":
+            return ""
+        self._buffer += chunk
+        before = len(self._chars)
+
+        if self._state == "key":
+            idx = self._buffer.find(self._key, self._pos)
+            if idx == -1:
+                # Keep a tail in case the key is split across chunks
+                self._pos = max(self._pos, len(self._buffer) - len(self._key))
+                return ""
+            self._pos = idx + len(self._key)
+            self._state = "colon"
+
+        if self._state == "colon":
+            while self._pos < len(self._buffer) and self._buffer[self._pos] in ' \t\r\n:':
+                self._pos += 1
+            if self._pos >= len(self._buffer):
+                return ""
+            if self._buffer[self._pos] != '"':
+                # Not a string value; keep looking for the key further on
+                self._state = "key"
+                return self.feed("")
+            self._pos += 1
+            self._state = "value"
+
+        buffer, pos = self._buffer, self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+            if char == '"':
+                self._state = "done"
+                pos += 1
+                break
+            if char == '\\':
+                if pos + 1 >= len(buffer):
+                    break
+                code = buffer[pos + 1]
+                if code == 'u':
+                    if pos + 6 > len(buffer):
+                        break
+                    try:
+                        self._chars.append(chr(int(buffer[pos + 2:pos + 6], 16)))
+                    except ValueError:
+                        pass
+                    pos += 6
+                else:
+                    self._chars.append(_ESCAPES.get(code, code))
+                    pos += 2
+                continue
+            self._chars.append(char)
+            pos += 1
+        self._pos = pos
+        return "".join(self._chars[before:])
+
+
+class TokenStream:
+    """Partial output of one kickoff, fed from the LLM stream of its worker thread"""
+
+    def __init__(self, field="instruction", on_first_sentence=None):
+        self._lock = threading.Lock()
+        self._draft = []
+        self._extractor = JsonStringFieldExtractor(field)
+        self._output = ""  # final_output text until its step_number is known
+        self._step_number = None
+        self.on_first_sentence = on_first_sentence
+        self.started = time.perf_counter()
+        self.first_token_s = None
+        self.first_sentence_s = None
+        self.first_sentence = None
+        self.tokens = 0
+
+    def feed(self, chunk, task_index):
+        if not chunk:
+            return
+        with self._lock:
+            self.tokens += 1
+            if self.first_token_s is None:
+                self.first_token_s = time.perf_counter() - self.started
+            if task_index == COOK_RECIPE_TASK:
+                self._draft.append(chunk)
+            elif task_index == FINAL_OUTPUT_TASK:
+                self._extractor.feed(chunk)
+                if self._step_number is None:
+                    self._output += chunk
+                    match = _STEP_NUMBER_RE.search(self._output)
+                    if match:
+                        self._step_number = int(match.group(1))
+                        self._output = ""
+            else:
+                return
+            if self.first_sentence is None:
+                self._check_first_sentence()
+
+    def _spoken_prefix(self):
+        """Start of the text playback will speak, as far as it is known"""
+        if self._step_number is None:
+            return ""
+        instruction = self._extractor.value
+        if not self._step_number:
+            # Not a step: build_message speaks the instruction, then the details
+            return clean_for_speech(instruction)
+        recipe = CookingStep.model_construct(step_number=self._step_number, total_steps=0, instruction=instruction,
+                                             details="", next_up="", notes="").cook_recipe
+        # Nothing after the instruction is known yet
+        return clean_for_speech(recipe[:recipe.index(instruction) + len(instruction)])
+
+    def _check_first_sentence(self):
+        # Split exactly like the TTS pipeline will, so the first sentence's audio can be reused;
+        # it is final once a second sentence has started
+        sentences = split_sentences(self._spoken_prefix())
+        if len(sentences) < 2:
+            return
+        self.first_sentence = sentences[0]
+        self.first_sentence_s = time.perf_counter() - self.started
+        if self.on_first_sentence:
+            try:
+                self.on_first_sentence(self.first_sentence)
+            except Exception as e:
+                logger.warning(f"First-sentence callback failed: {str(e)}")
+
+    def _text(self):
+        if self._extractor.started:
+            return self._extractor.value
+        draft = "".join(self._draft)
+        parts = _FINAL_ANSWER_RE.split(draft, maxsplit=1)
+        return parts[1] if len(parts) > 1 else ""
+
+    @property
+    def text(self):
+        """Best current view of the step text, empty until there is something to show"""
+        with self._lock:
+            return self._text()
+
+    def timings(self):
+        return {"first_token_s": self.first_token_s, "first_sentence_s": self.first_sentence_s,
+                "tokens": self.tokens}
+
+
+class StreamMetrics:
+    """Rolling per-request time to first token and time to first sentence"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=window)
+
+    def record(self, stream, total_s):
+        timings = {**stream.timings(), "total_s": total_s}
+        with self._lock:
+            self._records.append(timings)
+        ttft = timings["first_token_s"]
+        ttfs = timings["first_sentence_s"]
+        logger.info(f"⚡ Streamed turn: first token {ttft if ttft is None else round(ttft, 2)}s, "
+                    f"first sentence {ttfs if ttfs is None else round(ttfs, 2)}s, total {total_s:.2f}s")
+
+    def summary(self):
+        with self._lock:
+            records = list(self._records)
+        summary = {"requests": len(records)}
+        for name in ("first_token_s", "first_sentence_s", "total_s"):
+            values = sorted(r[name] for r in records if r[name] is not None)
+            if values:
+                summary[f"{name}_p50"] = round(values[len(values) // 2], 3)
+                summary[f"{name}_p95"] = round(values[min(len(values) - 1, int(len(values) * 0.95))], 3)
+        return summary
+
+
+stream_metrics = StreamMetrics()
+
+_local = threading.local()
+_active_jobs = set()
+_active_lock = threading.Lock()
+_listener_installed = False
+
+
+def _on_stream_chunk(_source, event):
+    job = getattr(_local, "job", None)
+    if job is None:
+        # Handlers dispatched off the worker thread: only unambiguous with a single streaming job
+        with _active_lock:
+            job = next(iter(_active_jobs)) if len(_active_jobs) == 1 else None
+    if job is not None and job.stream is not None:
+        job.stream.feed(getattr(event, "chunk", ""), job.tasks_done)
+
+
+def _install_listener():
+    global _listener_installed
+    with _active_lock:
+        if _listener_installed:
+            return
+        try:
+            from crewai.utilities.events import crewai_event_bus
+            from crewai.utilities.events.llm_events import LLMStreamChunkEvent
+        except ImportError:
+            from crewai.events import crewai_event_bus, LLMStreamChunkEvent
+        crewai_event_bus.on(LLMStreamChunkEvent)(_on_stream_chunk)
+        _listener_installed = True
+
+
+class bind_stream:
+    """Route LLM stream chunks emitted on this thread to the job's TokenStream"""
+
+    def __init__(self, job):
+        self.job = job
+
+    def __enter__(self):
+        _install_listener()
+        _local.job = self.job
+        with _active_lock:
+            _active_jobs.add(self.job)
+        return self.job.stream
+
+    def __exit__(self, *exc):
+        _local.job = None
+        with _active_lock:
+            _active_jobs.discard(self.job)
+        stream_metrics.record(self.job.stream, time.perf_counter() - self.job.stream.started)
+        return False
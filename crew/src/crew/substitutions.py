@@ -0,0 +1,206 @@
+"""Local ingredient substitution index.
+
+Answers "what can I use instead of X?" without an LLM round trip. The index is
+built once, on first use, from ``config/substitutions.txt``. It maps every
+ingredient name and alias to ranked substitutes with ratios, grouped by usage
+context (baking, frying, sauce, raw, or any). Ingredient names are matched with
+the same token-level Aho-Corasick automaton the intent router uses for dishes,
+so a lookup is a single pass over the question. The file covers common
+ingredients only; questions it can't answer go to the crew and are counted, so
+stats() shows how much of the long tail still needs an LLM call.
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass
+
+from src.crew.intent_router import DishGazetteer, tokenize
+
+SUBSTITUTIONS_FILE = os.path.join(os.path.dirname(__file__), "config", "substitutions.txt")
+
+ANY = "any"
+BAKING = "baking"
+FRYING = "frying"
+SAUCE = "sauce"
+RAW = "raw"
+USAGES = (BAKING, FRYING, SAUCE, RAW)
+MAX_SUBSTITUTES = 4
+_USAGE_LABELS = {BAKING: "baking", FRYING: "frying", SAUCE: "sauces", RAW: "raw dishes"}
+
+# Words (after plural folding) that reveal how the ingredient is used
+_USAGE_WORDS = {
+    BAKING: frozenset({
+        "bake", "baking", "baked", "cake", "cupcake", "cookie", "muffin", "bread", "brownie", "pie", "pastry",
+        "biscuit", "scone", "pancake", "waffle", "loaf", "dough", "batter", "crust", "tart", "cheesecake",
+        "oven", "frosting", "icing", "meringue", "souffle",
+    }),
+    FRYING: frozenset({
+        "fry", "frying", "fried", "fries", "saute", "sauteing", "sear", "searing", "stir", "tempura", "crispy",
+        "crisp", "coating", "breading", "fritter", "pan", "skillet", "wok", "schnitzel", "cutlet", "nugget",
+    }),
+    SAUCE: frozenset({
+        "sauce", "gravy", "soup", "stew", "curry", "braise", "braising", "marinade", "glaze", "risotto",
+        "chili", "casserole", "simmer", "deglaze", "reduction", "broth", "carbonara", "alfredo", "bolognese",
+    }),
+    RAW: frozenset({
+        "raw", "salad", "dressing", "vinaigrette", "dip", "topping", "whipped", "whip", "garnish", "smoothie",
+        "pesto", "uncooked", "cold", "sandwich", "spread",
+    }),
+}
+# Where the ingredient being replaced starts: "instead of X", "substitute for X", "without X", ...
+_TARGET_CUE_RE = re.compile(
+    r"\b(?:substitut\w*|instead of|replace\w*|replacement|swap\w*|alternative\w*|in place of|out of|"
+    r"don't have|do not have|dont have|without|ran out|run out|no more)\b"
+)
+_FOR_RE = re.compile(r"\bfor\b")
+_WITH_RE = re.compile(r"\b(?:with|by)\b")
+
+
+def detect_usage(text, topic=None):
+    """Usage context named in a question, falling back to the dish being cooked"""
+    for source in (text, topic):
+        if not source:
+            continue
+        words = set(tokenize(source))
+        for usage in USAGES:
+            if words & _USAGE_WORDS[usage]:
+                return usage
+    return None
+
+
+@dataclass(slots=True)
+class Substitute:
+    """One ranked replacement for an ingredient"""
+    name: str
+    ratio: str
+    note: str = ""
+    usage: str = ANY
+
+    def format(self, show_usage=False):
+        line = f"{self.name} ({self.ratio})" if self.ratio else self.name
+        if show_usage and self.usage != ANY:
+            line = f"{line}, for {_USAGE_LABELS[self.usage]}"
+        return f"{line}. {self.note}" if self.note else line
+
+
+class SubstitutionIndex:
+    """Ingredient aliases mapped to ranked substitutes per usage context"""
+
+    def __init__(self, entries):
+        # entries: canonical name -> (aliases, [Substitute, ...] best first)
+        self._entries = {}
+        self._canonical = {}
+        for name, (aliases, subs) in entries.items():
+            by_usage = {None: tuple(subs)}
+            for sub in subs:
+                by_usage.setdefault(sub.usage, ())
+                by_usage[sub.usage] += (sub,)
+            self._entries[name] = by_usage
+            for alias in (name, *aliases):
+                self._canonical.setdefault(" ".join(tokenize(alias)), name)
+        self._gazetteer = DishGazetteer(self._canonical)
+        self._lock = threading.Lock()
+        self._counters = {"answered": 0, "llm_fallbacks": 0}
+
+    @classmethod
+    def from_file(cls, path=SUBSTITUTIONS_FILE):
+        entries = {}
+        current = None
+        with open(path, encoding="utf-8") as f:
+            for number, line in enumerate(f, 1):
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                if line.startswith("="):
+                    name, *aliases = [part.strip().lower() for part in line[1:].split("|")]
+                    current = entries.setdefault(name, (set(), []))
+                    current[0].update(a for a in aliases if a)
+                    continue
+                usage, sep, rest = line.partition(":")
+                usage = usage.strip().lower()
+                if current is None or not sep or usage not in (ANY, *USAGES):
+                    raise ValueError(f"{path}:{number}: expected '= name | alias' or 'usage: substitute | ratio | note'")
+                parts = [part.strip() for part in rest.split("|")] + ["", ""]
+                current[1].append(Substitute(parts[0], parts[1], parts[2], usage))
+        return cls(entries)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def find_ingredient(self, text):
+        """Canonical name of the ingredient a question wants replaced, or None"""
+        lowered = text.lower()
+        cue = _TARGET_CUE_RE.search(lowered)
+        candidates = []
+        if cue:
+            target = lowered[cue.end():]
+            # "replace butter with oil": the ingredient comes before "with"
+            target = _WITH_RE.split(target, maxsplit=1)[0] or target
+            # "substitute honey for sugar", "a replacement for eggs": it comes after "for"
+            after_for = _FOR_RE.split(target, maxsplit=1)
+            if len(after_for) == 2:
+                candidates.append(after_for[1])
+            candidates.append(target)
+        candidates.append(lowered)
+        for candidate in candidates:
+            match = self._gazetteer.find(tokenize(candidate))
+            if match:
+                return self._canonical[match]
+        return None
+
+    def substitutes(self, ingredient, usage=None, limit=MAX_SUBSTITUTES):
+        """Ranked substitutes for a canonical ingredient.
+
+        With a usage, substitutes for that context come first, then general ones.
+        Without one (or with no advice for it), every substitute is returned in file order.
+        """
+        by_usage = self._entries.get(ingredient)
+        if not by_usage:
+            return []
+        ranked = by_usage.get(usage, ()) + by_usage.get(ANY, ()) if usage else ()
+        return list(ranked or by_usage[None])[:limit]
+
+    def lookup(self, text, usage=None):
+        """(ingredient, usage, substitutes) for a question; ingredient is None when nothing matched"""
+        ingredient = self.find_ingredient(text)
+        if ingredient is None:
+            return None, usage, []
+        return ingredient, usage, self.substitutes(ingredient, usage)
+
+    def answer(self, question, topic=None):
+        """Plain-text answer to a substitution question, or None if the ingredient is unknown"""
+        usage = detect_usage(question, topic)
+        ingredient, usage, subs = self.lookup(question, usage)
+        with self._lock:
+            self._counters["answered" if subs else "llm_fallbacks"] += 1
+        if not subs:
+            return None
+        context = f" in {_USAGE_LABELS[usage]}" if any(sub.usage == usage for sub in subs) else ""
+        lines = [f"Instead of {ingredient}{context}, you can use:"]
+        lines.extend(f"{i}. {sub.format(show_usage=sub.usage != usage)}" for i, sub in enumerate(subs, 1))
+        return "\n".join(lines)
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+        questions = counters["answered"] + counters["llm_fallbacks"]
+        return {
+            "ingredients": len(self._entries),
+            "names": len(self._canonical),
+            "substitutes": sum(len(entry[None]) for entry in self._entries.values()),
+            **counters,
+            "coverage": round(counters["answered"] / questions, 3) if questions else 0.0,
+        }
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_substitution_index():
+    """Process-wide substitution index, loaded on first use"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SubstitutionIndex.from_file(os.getenv("SUBSTITUTIONS_FILE", SUBSTITUTIONS_FILE))
+        return _index
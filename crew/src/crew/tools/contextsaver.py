@@ -0,0 +1,183 @@
+"""Persistent chat sessions.
+
+Messages, recipe notes and the current recipe state of every session are
+stored in SQLite (WAL mode). Messages and notes are append-only, and the UI
+keeps only the most recent ones in memory. Older history is read back a page
+at a time when the user scrolls to it. The session id lives in the page URL,
+so a browser refresh or server restart resumes the conversation and plan
+without asking the LLM again.
+"""
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+
+from src.crew.messages import ChatMessage, message_to_dict
+from src.crew.recipe_session import RecipeSession
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "chef_ai_sessions.sqlite3")
+DEFAULT_RETENTION_DAYS = 30
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sessions (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    topic TEXT,
+    current_step TEXT,
+    recipe_session TEXT
+);
+CREATE TABLE IF NOT EXISTS messages (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS notes (
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    note TEXT NOT NULL,
+    PRIMARY KEY (session_id, seq)
+);
+"""
+
+
+class SessionStore:
+    """SQLite-backed store of chat sessions, shared by every Streamlit session in the process"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, retention_days=DEFAULT_RETENTION_DAYS):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._prune(retention_days)
+
+    def _prune(self, retention_days):
+        cutoff = time.time() - retention_days * 24 * 60 * 60
+        with self._lock:
+            stale = [row[0] for row in self._conn.execute("SELECT id FROM sessions WHERE updated < ?", (cutoff,))]
+        for session_id in stale:
+            self.delete_session(session_id)
+        if stale:
+            logger.info(f"🧹 Removed {len(stale)} expired chat sessions")
+
+    def create_session(self):
+        session_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("INSERT INTO sessions (id, created, updated) VALUES (?, ?, ?)", (session_id, now, now))
+        return session_id
+
+    def exists(self, session_id):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM sessions WHERE id = ?", (session_id,)).fetchone() is not None
+
+    def delete_session(self, session_id):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table, column in (("messages", "session_id"), ("notes", "session_id"), ("sessions", "id")):
+                    self._conn.execute(f"DELETE FROM {table} WHERE {column} = ?", (session_id,))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _append(self, table, column, session_id, value):
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._conn.execute(
+                    f"SELECT COALESCE(MAX(seq), -1) + 1 FROM {table} WHERE session_id = ?", (session_id,)
+                ).fetchone()[0]
+                self._conn.execute(f"INSERT INTO {table} (session_id, seq, {column}) VALUES (?, ?, ?)",
+                                   (session_id, seq, value))
+                self._conn.execute("UPDATE sessions SET updated = ? WHERE id = ?", (time.time(), session_id))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return seq
+
+    def append_message(self, session_id, message):
+        """Store a ChatMessage; returns its sequence number"""
+        return self._append("messages", "payload", session_id, json.dumps(message_to_dict(message)))
+
+    def append_note(self, session_id, note):
+        return self._append("notes", "note", session_id, str(note))
+
+    def save_state(self, session_id, topic, current_step, recipe_session):
+        recipe = json.dumps(recipe_session.to_dict()) if recipe_session else None
+        with self._lock:
+            self._conn.execute(
+                "UPDATE sessions SET topic = ?, current_step = ?, recipe_session = ?, updated = ? WHERE id = ?",
+                (topic, current_step, recipe, time.time(), session_id),
+            )
+
+    def load_state(self, session_id):
+        """Topic, current step, recipe plan and history sizes of a session, or None if unknown"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT topic, current_step, recipe_session FROM sessions WHERE id = ?", (session_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            messages = self._conn.execute("SELECT COUNT(*) FROM messages WHERE session_id = ?",
+                                          (session_id,)).fetchone()[0]
+            notes = self._conn.execute("SELECT COUNT(*) FROM notes WHERE session_id = ?",
+                                       (session_id,)).fetchone()[0]
+        topic, current_step, recipe = row
+        return {
+            "topic": topic,
+            "current_step": current_step,
+            "recipe_session": RecipeSession.from_dict(json.loads(recipe)) if recipe else None,
+            "message_count": messages,
+            "note_count": notes,
+        }
+
+    def read_messages(self, session_id, limit, skip_newest=0):
+        """A page of messages in chronological order, ending skip_newest messages before the latest"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM messages WHERE session_id = ? ORDER BY seq DESC LIMIT ? OFFSET ?",
+                (session_id, limit, skip_newest),
+            ).fetchall()
+        return [ChatMessage(**json.loads(payload)) for (payload,) in reversed(rows)]
+
+    def read_notes(self, session_id, limit):
+        """The newest notes in chronological order"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT note FROM notes WHERE session_id = ? ORDER BY seq DESC LIMIT ?", (session_id, limit)
+            ).fetchall()
+        return [note for (note,) in reversed(rows)]
+
+    def stats(self):
+        with self._lock:
+            counts = {table: self._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                      for table in ("sessions", "messages", "notes")}
+        return {"db_path": self.db_path, **counts}
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_session_store():
+    """Process-wide session store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SessionStore(
+                db_path=os.getenv("SESSION_DB_PATH", DEFAULT_DB_PATH),
+                retention_days=float(os.getenv("SESSION_RETENTION_DAYS", DEFAULT_RETENTION_DAYS)),
+            )
+        return _store
@@ -0,0 +1,179 @@
+"""Shared cache of web search results.
+
+Searches are keyed by a normalized form of the query (case, whitespace,
+punctuation, stop words and word order removed) plus the search settings, and
+stored in a SQLite database that every session and worker process on the
+machine shares. Entries expire after a TTL, and the least recently used ones
+are evicted once the database grows past its size limit. Writes keep a running
+size estimate, so the table is only scanned when the estimate crosses the limit
+or every EVICT_EVERY writes, which also picks up other processes' writes.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL_S = 24 * 60 * 60
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+DEFAULT_DB_PATH = os.path.join(tempfile.gettempdir(), "chef_ai_search_cache.sqlite3")
+EVICT_EVERY = 64  # writes between full expiry and size passes
+LOW_WATER = 0.9  # a size pass frees down to this fraction of the limit, so the next one is a while off
+
+STOP_WORDS = frozenset("""
+a an and are as at be by can could do does for from how i in is it make making me my of on
+or please recipe recipes should show tell that the to way what whats with you your
+""".split())
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize_query(query):
+    """Canonical form of a search query, so trivially different phrasings share an entry"""
+    words = _WORD_RE.findall(str(query).lower())
+    kept = [w for w in words if w not in STOP_WORDS] or words
+    return " ".join(sorted(set(kept)))
+
+
+def search_key(query, **params):
+    """Cache key for a query under the given search settings"""
+    settings = json.dumps(params, sort_keys=True, default=str)
+    return hashlib.sha256(f"{normalize_query(query)}\0{settings}".encode("utf-8")).hexdigest()
+
+
+class SearchCache:
+    """SQLite-backed TTL + LRU cache of search results, safe to share across threads and processes"""
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, ttl_s=DEFAULT_TTL_S, max_bytes=DEFAULT_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl_s = ttl_s
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "errors": 0}
+        self._conn = sqlite3.connect(db_path, timeout=10, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_results ("
+            " key TEXT PRIMARY KEY, query TEXT NOT NULL, result TEXT NOT NULL,"
+            " size INTEGER NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS search_results_accessed ON search_results (accessed)")
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_results").fetchone()[0]
+        self._writes = 0
+
+    def get(self, key):
+        """Cached result for key, or None if missing or expired"""
+        now = time.time()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    "SELECT result, created FROM search_results WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and now - row[1] > self.ttl_s:
+                    self._conn.execute("DELETE FROM search_results WHERE key = ?", (key,))
+                    self._stats["expired"] += 1
+                    row = None
+                if row is None:
+                    self._stats["misses"] += 1
+                    return None
+                self._conn.execute("UPDATE search_results SET accessed = ? WHERE key = ?", (now, key))
+                self._stats["hits"] += 1
+                return json.loads(row[0])
+            except (sqlite3.Error, ValueError) as e:
+                self._stats["errors"] += 1
+                logger.warning(f"Search cache read failed: {str(e)}")
+                return None
+
+    def put(self, key, query, result):
+        payload = json.dumps(result, default=str)
+        now = time.time()
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO search_results (key, query, result, size, created, accessed)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, str(query), payload, len(payload), now, now),
+                )
+                # A replaced row is counted twice until the next pass; overestimating only evicts sooner
+                self._bytes += len(payload)
+                self._writes += 1
+                if self._bytes > self.max_bytes or self._writes >= EVICT_EVERY:
+                    self._evict(now)
+            except sqlite3.Error as e:
+                self._stats["errors"] += 1
+                logger.warning(f"Search cache write failed: {str(e)}")
+
+    def _evict(self, now):
+        self._writes = 0
+        expired = self._conn.execute(
+            "DELETE FROM search_results WHERE created < ?", (now - self.ttl_s,)
+        ).rowcount
+        self._stats["evictions"] += max(expired, 0)
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM search_results").fetchone()[0]
+        self._bytes = total
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until the store is back under its low-water mark
+        target = int(self.max_bytes * LOW_WATER)
+        freed = 0
+        victims = []
+        for key, size in self._conn.execute("SELECT key, size FROM search_results ORDER BY accessed"):
+            if total - freed <= target:
+                break
+            victims.append((key,))
+            freed += size
+        self._conn.executemany("DELETE FROM search_results WHERE key = ?", victims)
+        self._stats["evictions"] += len(victims)
+        self._bytes = total - freed
+
+    def get_or_search(self, query, search, **params):
+        """Serve query from the cache, calling search(query) and storing the result on a miss"""
+        key = search_key(query, **params)
+        result = self.get(key)
+        if result is not None:
+            logger.info(f"🔎 Search cache hit: {query}")
+            return result
+        result = search(query)
+        if result:
+            self.put(key, query, result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats["hits"] + self._stats["misses"]
+            try:
+                entries, size = self._conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM search_results"
+                ).fetchone()
+            except sqlite3.Error:
+                entries, size = None, None
+            return {
+                **self._stats,
+                "hit_rate": round(self._stats["hits"] / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "bytes": size,
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """Process-wide search cache shared by every session"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache(
+                db_path=os.getenv("SEARCH_CACHE_PATH", DEFAULT_DB_PATH),
+                ttl_s=float(os.getenv("SEARCH_CACHE_TTL_S", DEFAULT_TTL_S)),
+                max_bytes=int(os.getenv("SEARCH_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+            )
+        return _cache
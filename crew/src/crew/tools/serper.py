@@ -1,7 +1,26 @@
 from crewai_tools import SerperDevTool
 from dotenv import load_dotenv
 
+from src.crew.tools.search_cache import get_search_cache
+from src.crew.tracing import span
+
 load_dotenv()
 
 
-search_tool = SerperDevTool()
\ No newline at end of file
+class CachedSerperDevTool(SerperDevTool):
+    """SerperDevTool that serves repeat searches from the shared search cache"""
+
+    def _run(self, **kwargs):
+        query = kwargs.get("search_query") or kwargs.get("query")
+        if not query:
+            return super()._run(**kwargs)
+        params = {
+            name: getattr(self, name, None)
+            for name in ("search_type", "n_results", "country", "location", "locale")
+        }
+        search = super()._run
+        with span("serper", "tool", query=str(query)[:80]):
+            return get_search_cache().get_or_search(query, lambda _query: search(**kwargs), **params)
+
+
+search_tool = CachedSerperDevTool()
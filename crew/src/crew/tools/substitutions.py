@@ -0,0 +1,38 @@
+from typing import Type
+
+from crewai.tools import BaseTool
+from pydantic import BaseModel, Field
+
+from src.crew.substitutions import get_substitution_index
+from src.crew.tracing import span
+
+
+class SubstitutionLookupInput(BaseModel):
+    """Input for SubstitutionLookupTool"""
+    ingredient: str = Field(..., description="Ingredient to replace, e.g. 'buttermilk'")
+    usage: str = Field("", description="Optional usage context: baking, frying, sauce or raw")
+
+
+class SubstitutionLookupTool(BaseTool):
+    """Answers ingredient substitution questions from the local substitution index"""
+
+    name: str = "Ingredient substitution lookup"
+    description: str = (
+        "Look up tested substitutes and ratios for an ingredient, optionally for a usage context "
+        "(baking, frying, sauce or raw). Instant and offline; use it before searching the web "
+        "for substitutions, and search only if it finds nothing."
+    )
+    args_schema: Type[BaseModel] = SubstitutionLookupInput
+
+    def _run(self, ingredient: str, usage: str = "") -> str:
+        index = get_substitution_index()
+        with span("substitutions", "tool", query=ingredient[:80]):
+            name, _, subs = index.lookup(f"instead of {ingredient}", usage.strip().lower() or None)
+        if not subs:
+            return f"No local substitutes known for {ingredient}."
+        lines = [f"Substitutes for {name}:"]
+        lines.extend(f"- {sub.format(show_usage=True)}" for sub in subs)
+        return "\n".join(lines)
+
+
+substitution_tool = SubstitutionLookupTool()
@@ -0,0 +1,214 @@
+"""Per-turn latency spans.
+
+Each user turn gets a ``Trace``. Code that does measurable work opens a
+``span()``, which is attached to the trace active on the current thread (a
+no-op when there is none). Crew worker threads activate the trace of the job
+they run, and crewai's LLM call events add one span per model call with token
+counts. A finished trace is logged as a single JSON line and can be rendered
+as a text waterfall.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TRACE_LOG_PATH = os.getenv("TRACE_LOG_PATH")
+
+_local = threading.local()
+_file_lock = threading.Lock()
+_listener_installed = False
+_listener_lock = threading.Lock()
+
+
+class Span:
+    __slots__ = ("name", "category", "start", "end", "attrs", "thread")
+
+    def __init__(self, name, category, start, attrs):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.end = None
+        self.attrs = attrs
+        self.thread = threading.current_thread().name
+
+
+class Trace:
+    """Timing spans of one user turn, recorded from any thread"""
+
+    def __init__(self, name):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.started = time.perf_counter()
+        self.wall_started = time.time()
+        self.finished = None
+        self._spans = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name, category, **attrs):
+        span = Span(name, category, time.perf_counter(), attrs)
+        with self._lock:
+            self._spans.append(span)
+        return span
+
+    def end_span(self, span, **attrs):
+        span.attrs.update(attrs)
+        span.end = time.perf_counter()
+
+    @contextmanager
+    def span(self, name, category, **attrs):
+        """Time a block; the yielded dict can be filled with extra attributes"""
+        span = self.start_span(name, category, **attrs)
+        try:
+            yield span.attrs
+        except BaseException as e:
+            span.attrs["error"] = type(e).__name__
+            raise
+        finally:
+            self.end_span(span)
+
+    def finish(self):
+        """Close the trace and write it as one JSON log line"""
+        if self.finished is None:
+            self.finished = time.perf_counter()
+            line = json.dumps(self.to_dict(), default=str)
+            logger.info(f"⏱️ trace {line}")
+            if TRACE_LOG_PATH:
+                with _file_lock, open(TRACE_LOG_PATH, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        return self
+
+    @property
+    def duration_ms(self):
+        return ((self.finished or time.perf_counter()) - self.started) * 1000
+
+    def spans(self):
+        with self._lock:
+            return sorted(self._spans, key=lambda s: s.start)
+
+    def to_dict(self):
+        now = time.perf_counter()
+        return {
+            "trace_id": self.id,
+            "name": self.name,
+            "timestamp": self.wall_started,
+            "duration_ms": round(self.duration_ms, 1),
+            "spans": [{
+                "name": s.name,
+                "category": s.category,
+                "offset_ms": round((s.start - self.started) * 1000, 1),
+                "duration_ms": round(((s.end or now) - s.start) * 1000, 1),
+                "thread": s.thread,
+                **s.attrs,
+            } for s in self.spans()],
+        }
+
+    def format_waterfall(self, width=40):
+        """Text waterfall: one bar per span, positioned on the turn's timeline"""
+        data = self.to_dict()
+        total = max(data["duration_ms"], 1.0)
+        label_width = max([len(s["name"]) for s in data["spans"]] + [10])
+        lines = [f"{data['name'][:60]}  ({total / 1000:.2f}s)"]
+        for s in data["spans"]:
+            start = min(int(s["offset_ms"] / total * width), width - 1)
+            length = max(1, int(s["duration_ms"] / total * width))
+            bar = " " * start + "█" * min(length, width - start)
+            extra = " ".join(f"{k}={s[k]}" for k in ("tokens_in", "tokens_out", "service") if k in s)
+            lines.append(f"{s['name']:<{label_width}} |{bar:<{width}}| {s['duration_ms']:>8.1f} ms {extra}")
+        return "\n".join(lines)
+
+
+def current_trace():
+    return getattr(_local, "trace", None)
+
+
+@contextmanager
+def activate(trace):
+    """Make trace the target of span() calls on this thread"""
+    previous = getattr(_local, "trace", None)
+    _local.trace = trace
+    try:
+        yield trace
+    finally:
+        _local.trace = previous
+
+
+@contextmanager
+def span(name, category, **attrs):
+    """Time a block under the active trace; does nothing without one"""
+    trace = current_trace()
+    if trace is None:
+        yield attrs
+        return
+    with trace.span(name, category, **attrs) as span_attrs:
+        yield span_attrs
+
+
+def count_tokens(model=None, messages=None, text=None):
+    """Token count via litellm's tokenizer lookup, falling back to ~4 characters per token"""
+    try:
+        from litellm import token_counter
+        if messages is not None:
+            return token_counter(model=model or "", messages=messages)
+        return token_counter(model=model or "", text=text or "")
+    except Exception:
+        if messages is not None:
+            text = " ".join(str(m.get("content", "")) for m in messages if isinstance(m, dict))
+        return len(text or "") // 4
+
+
+def _llm_stack():
+    stack = getattr(_local, "llm_spans", None)
+    if stack is None:
+        stack = _local.llm_spans = []
+    return stack
+
+
+def _on_llm_started(_source, event):
+    trace = current_trace()
+    if trace is None:
+        return
+    messages = getattr(event, "messages", None)
+    if isinstance(messages, str):
+        messages = [{"role": "user", "content": messages}]
+    model = getattr(event, "model", None)
+    _llm_stack().append(trace.start_span("llm", "llm", model=model,
+                                         tokens_in=count_tokens(model, messages=messages or [])))
+
+
+def _on_llm_finished(_source, event):
+    stack = _llm_stack()
+    trace = current_trace()
+    if not stack or trace is None:
+        return
+    llm_span = stack.pop()
+    response = getattr(event, "response", None)
+    if response is None:
+        trace.end_span(llm_span, error=str(getattr(event, "error", "failed"))[:200])
+    else:
+        trace.end_span(llm_span, tokens_out=count_tokens(llm_span.attrs.get("model"), text=str(response)))
+
+
+def install_llm_listener():
+    """Record one span per LLM call made by crewai on a thread with an active trace"""
+    global _listener_installed
+    with _listener_lock:
+        if _listener_installed:
+            return
+        try:
+            from crewai.utilities.events import crewai_event_bus
+            from crewai.utilities.events.llm_events import (
+                LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent,
+            )
+        except ImportError:
+            from crewai.events import (
+                crewai_event_bus, LLMCallCompletedEvent, LLMCallFailedEvent, LLMCallStartedEvent,
+            )
+        crewai_event_bus.on(LLMCallStartedEvent)(_on_llm_started)
+        crewai_event_bus.on(LLMCallCompletedEvent)(_on_llm_finished)
+        crewai_event_bus.on(LLMCallFailedEvent)(_on_llm_finished)
+        _listener_installed = True
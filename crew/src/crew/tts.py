@@ -0,0 +1,485 @@
+"""Streaming, sentence-chunked speech synthesis behind pluggable backends.
+
+The cleaned step text is split into sentences which are synthesized
+concurrently with bounded parallelism. Audio is yielded in order as soon as
+each sentence is ready, so playback can start after the first sentence instead
+of after the whole step, and nothing is truncated.
+
+Every synthesizer is a TTSBackend in a registry keyed by its display name:
+Edge TTS and FAL.ai over the network, and espeak-ng on this machine's CPU
+when it is installed. They share one streaming interface and one metrics recorder.
+All synthesis runs on the process-wide background loop from async_runtime,
+sharing one Edge TTS concurrency limit across sessions.
+"""
+import asyncio
+import importlib.util
+import io
+import logging
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import wave
+from collections import deque
+
+import urllib.request
+
+from src.crew.async_runtime import get_background_loop
+from src.crew.audio_cache import audio_key, get_audio_cache
+from src.crew.messages import clean_for_speech
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EDGE_VOICE = "en-US-AriaNeural"
+FAL_TTS_MODEL = "fal-ai/kokoro/american-english"
+DEFAULT_LOCAL_VOICE = "en-us"
+EDGE_TTS = "Edge TTS"
+FAL_TTS = "FAL.ai TTS"
+LOCAL_TTS = "Local TTS"
+MAX_PARALLEL_SENTENCES = 4
+MAX_CONCURRENT_EDGE_REQUESTS = 16
+TTS_TIMEOUT_S = 60
+EDGE_BITRATE = 48000  # edge_tts streams audio-24khz-48kbitrate-mono-mp3
+MAX_SENTENCE_CHARS = 400
+MIN_SENTENCE_CHARS = 24
+
+_SENTENCE_RE = re.compile(r'(?<=[.!?])\s+(?=[A-Z0-9"\'(])')
+_CLAUSE_RE = re.compile(r'(?<=[,;])\s+')
+
+
+def split_sentences(text, max_chars=MAX_SENTENCE_CHARS, min_chars=MIN_SENTENCE_CHARS):
+    """Split cleaned text into sentences.
+
+    Fragments shorter than min_chars are merged into the following sentence so
+    each synthesis request carries enough speech to be worth its round trip,
+    and overly long sentences are broken at clause boundaries.
+    """
+    sentences = []
+    pending = ""
+    for sentence in _SENTENCE_RE.split(text.strip()):
+        sentence = f"{pending} {sentence.strip()}".strip()
+        pending = ""
+        if len(sentence) < min_chars:
+            pending = sentence
+            continue
+        while len(sentence) > max_chars:
+            cut = max((m.start() for m in _CLAUSE_RE.finditer(sentence, 0, max_chars)), default=-1)
+            if cut <= 0:
+                cut = sentence.rfind(' ', 0, max_chars)
+            if cut <= 0:
+                cut = max_chars
+            sentences.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if sentence:
+            sentences.append(sentence)
+    if pending and sentences:
+        sentences[-1] = f"{sentences[-1]} {pending}"
+    elif pending:
+        sentences.append(pending)
+    return sentences
+
+
+def assemble_audio(chunks):
+    """Concatenate audio chunks into one preallocated buffer"""
+    total = sum(len(chunk) for chunk in chunks)
+    buffer = bytearray(total)
+    view = memoryview(buffer)
+    offset = 0
+    for chunk in chunks:
+        view[offset:offset + len(chunk)] = chunk
+        offset += len(chunk)
+    return bytes(buffer)
+
+
+def _installed(module):
+    """Whether an optional client library can be imported, without importing it"""
+    try:
+        return importlib.util.find_spec(module) is not None
+    except ValueError:
+        # Already imported without a spec
+        return module in sys.modules
+
+
+def wav_duration(audio_bytes):
+    """Seconds of audio in a WAV file, or None if it isn't one"""
+    try:
+        with wave.open(io.BytesIO(audio_bytes)) as wav:
+            return wav.getnframes() / wav.getframerate()
+    except (wave.Error, EOFError):
+        return None
+
+
+def join_wav(chunks):
+    """Merge WAV files with the same format into one; separate WAV files can't just be concatenated"""
+    frames = []
+    params = None
+    for chunk in chunks:
+        with wave.open(io.BytesIO(chunk)) as wav:
+            params = params or wav.getparams()
+            frames.append(wav.readframes(wav.getnframes()))
+    if params is None:
+        return b""
+    out = io.BytesIO()
+    with wave.open(out, "wb") as wav:
+        wav.setparams(params)
+        wav.writeframes(assemble_audio(frames))
+    return out.getvalue()
+
+
+_sentence_tasks = {}
+
+
+class TTSBackend:
+    """A speech synthesizer with a sentence-streaming interface.
+
+    Subclasses implement _synthesize_sentence; backends that can only
+    synthesize whole texts override stream instead.
+    """
+
+    name = None
+    mime = "audio/mpeg"
+    default_voice = None
+    local = False  # True when synthesis never leaves the machine
+    streams_sentences = True
+    concatenable = True  # chunks joined byte for byte still play, as MP3 frames do
+
+    def available(self):
+        return True
+
+    def voice_for(self, voice=None):
+        """Voice identifier used for synthesis and as part of the audio cache key"""
+        return voice or self.default_voice
+
+    def duration(self, audio_bytes):
+        """Seconds of audio in a chunk, or None if the format doesn't say"""
+        return wav_duration(audio_bytes)
+
+    def join(self, chunks):
+        return assemble_audio(chunks)
+
+    async def _synthesize_sentence(self, sentence, voice):
+        raise NotImplementedError
+
+    async def synthesize_sentence(self, sentence, voice=None):
+        """Synthesize one sentence, reusing a prefetched or cached copy"""
+        voice = self.voice_for(voice)
+        key = audio_key(sentence, f"{self.name} sentence", voice)
+        task = _sentence_tasks.get(key)
+        if task is not None:
+            return await asyncio.shield(task)
+        audio_bytes = get_audio_cache().get(key)
+        if audio_bytes:
+            return audio_bytes
+        return await self._synthesize_sentence(sentence, voice)
+
+    def prefetch_sentence(self, sentence, voice=None):
+        """Start synthesizing one sentence before the rest of its text exists"""
+        voice = self.voice_for(voice)
+
+        async def start():
+            key = audio_key(sentence, f"{self.name} sentence", voice)
+            cache = get_audio_cache()
+            if key in _sentence_tasks or key in cache:
+                return
+            task = asyncio.ensure_future(self._synthesize_sentence(sentence, voice))
+            _sentence_tasks[key] = task
+            try:
+                audio_bytes = await task
+                if audio_bytes:
+                    cache.put(key, audio_bytes)
+            finally:
+                _sentence_tasks.pop(key, None)
+
+        return get_background_loop().submit(start())
+
+    async def stream(self, text, voice=None, max_parallel=MAX_PARALLEL_SENTENCES):
+        """Yield the audio of each sentence, in order, as soon as it is ready"""
+        sentences = split_sentences(clean_for_speech(text))
+        if not sentences:
+            return
+        semaphore = asyncio.Semaphore(max_parallel)
+
+        async def synthesize(sentence):
+            async with semaphore:
+                return await self.synthesize_sentence(sentence, voice)
+
+        timer = speech_metrics.timer(self.name, len(text))
+        tasks = [asyncio.ensure_future(synthesize(sentence)) for sentence in sentences]
+        try:
+            for task in tasks:
+                chunk = await task
+                timer.chunk(self.duration(chunk))
+                yield chunk
+            timer.done()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def synthesize(self, text, voice=None):
+        """Synthesize a whole text as one audio file"""
+        chunks = [chunk async for chunk in self.stream(text, voice)]
+        return self.join(chunks) if chunks else None
+
+    def iterate(self, text, voice=None, max_parallel=MAX_PARALLEL_SENTENCES):
+        """Synchronous iterator over stream() for the Streamlit script thread"""
+        return get_background_loop().iterate(self.stream(text, voice, max_parallel), TTS_TIMEOUT_S)
+
+    def stats(self):
+        return {"available": self.available(), "local": self.local, "mime": self.mime,
+                "voice": self.voice_for()}
+
+
+class EdgeBackend(TTSBackend):
+    """Microsoft Edge neural voices, one websocket request per sentence"""
+
+    name = EDGE_TTS
+    default_voice = DEFAULT_EDGE_VOICE
+
+    def __init__(self):
+        self._limiters = {}
+
+    def available(self):
+        return _installed("edge_tts")
+
+    def _limiter(self):
+        """Process-wide request limit bound to the running loop; edge_tts opens a websocket per request"""
+        loop = asyncio.get_running_loop()
+        if loop not in self._limiters:
+            self._limiters[loop] = asyncio.Semaphore(MAX_CONCURRENT_EDGE_REQUESTS)
+        return self._limiters[loop]
+
+    def duration(self, audio_bytes):
+        return len(audio_bytes) * 8 / EDGE_BITRATE
+
+    async def _synthesize_sentence(self, sentence, voice):
+        import edge_tts
+
+        async with self._limiter():
+            communicate = edge_tts.Communicate(sentence, voice)
+            chunks = []
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    chunks.append(chunk["data"])
+        return assemble_audio(chunks)
+
+
+class FalBackend(TTSBackend):
+    """fal.ai Kokoro; synthesizes the whole text in one hosted job"""
+
+    name = FAL_TTS
+    mime = "audio/wav"
+    default_voice = FAL_TTS_MODEL
+    streams_sentences = False
+    concatenable = False
+
+    def available(self):
+        return bool(os.getenv("FAL_KEY")) and _installed("fal_client")
+
+    def synthesize_blocking(self, text):
+        """Synthesize a whole text with fal.ai and download the resulting audio"""
+        import fal_client
+
+        clean_text = clean_for_speech(text)
+        if not clean_text:
+            return None
+
+        def on_queue_update(update):
+            if isinstance(update, fal_client.InProgress):
+                for log in update.logs:
+                    logger.info(log["message"])
+
+        result = fal_client.subscribe(
+            FAL_TTS_MODEL,
+            arguments={"text": clean_text},
+            with_logs=True,
+            on_queue_update=on_queue_update,
+        )
+
+        audio_url = (result or {}).get('audio_url') or ((result or {}).get('audio') or {}).get('url')
+        if not audio_url:
+            return None
+
+        # Download now: the hosted URL expires, the cached bytes don't
+        with urllib.request.urlopen(audio_url, timeout=30) as response:
+            return response.read()
+
+    async def stream(self, text, voice=None, max_parallel=MAX_PARALLEL_SENTENCES):
+        timer = speech_metrics.timer(self.name, len(text))
+        audio_bytes = await asyncio.to_thread(self.synthesize_blocking, text)
+        if audio_bytes:
+            timer.chunk(self.duration(audio_bytes))
+            timer.done()
+            yield audio_bytes
+
+    async def synthesize(self, text, voice=None):
+        chunks = [chunk async for chunk in self.stream(text, voice)]
+        return chunks[0] if chunks else None
+
+
+class LocalBackend(TTSBackend):
+    """Offline synthesis on this machine's CPU with espeak-ng (or espeak); only available when one is installed"""
+
+    name = LOCAL_TTS
+    mime = "audio/wav"
+    default_voice = DEFAULT_LOCAL_VOICE
+    local = True
+    concatenable = False
+
+    def __init__(self, binary=None):
+        self.binary = binary or shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self):
+        return bool(self.binary)
+
+    @property
+    def engine(self):
+        return os.path.basename(self.binary) if self.binary else None
+
+    def voice_for(self, voice=None):
+        # The engine is part of the cache key so espeak and espeak-ng audio never mix
+        voice = (voice or self.default_voice).split(":")[-1]
+        return f"{self.engine}:{voice}"
+
+    async def _synthesize_sentence(self, sentence, voice):
+        return await asyncio.to_thread(self.render, sentence, voice.split(":")[-1])
+
+    def render(self, sentence, voice=DEFAULT_LOCAL_VOICE):
+        """WAV bytes for one sentence"""
+        # -w writes a complete WAV header, which --stdout can't when the length is unknown
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "speech.wav")
+            subprocess.run([self.binary, "-v", voice, "-w", path, sentence],
+                           check=True, capture_output=True, timeout=TTS_TIMEOUT_S)
+            with open(path, "rb") as f:
+                return f.read()
+
+    def join(self, chunks):
+        return join_wav(chunks)
+
+    def stats(self):
+        return {**super().stats(), "engine": self.engine}
+
+
+_backends = {}
+
+
+def register_backend(backend):
+    """Add a backend to the registry under its name; later registrations replace earlier ones"""
+    _backends[backend.name] = backend
+    return backend
+
+
+def get_backend(name=None):
+    """Backend by name; defaults to TTS_BACKEND, then the first available backend"""
+    name = name or os.getenv("TTS_BACKEND", EDGE_TTS)
+    backend = _backends.get(name)
+    if backend is not None and backend.available():
+        return backend
+    for backend in _backends.values():
+        if backend.available():
+            return backend
+    raise LookupError("No text-to-speech backend is available")
+
+
+def backend_names(available_only=True):
+    return [name for name, backend in _backends.items() if backend.available() or not available_only]
+
+
+def fallback_order(primary):
+    """Available backends to try, the chosen one first and the local engine last"""
+    names = backend_names()
+    names.sort(key=lambda name: (name != primary, _backends[name].local))
+    return [_backends[name] for name in names]
+
+
+def backends_summary():
+    return {name: backend.stats() for name, backend in _backends.items()}
+
+
+async def synthesize_speech(text, service, voice=None):
+    """Synthesize a whole text with the named backend from inside the background loop"""
+    return await get_backend(service).synthesize(text, voice)
+
+
+register_backend(EdgeBackend())
+register_backend(FalBackend())
+register_backend(LocalBackend())
+
+
+class SpeechMetrics:
+    """Rolling time-to-first-audio, total synthesis time and real-time factor per backend"""
+
+    def __init__(self, window=200):
+        self._lock = threading.Lock()
+        self._records = deque(maxlen=window)
+
+    def timer(self, service, text_chars=0):
+        return _SpeechTimer(self, service, text_chars)
+
+    def record(self, service, first_audio_s, total_s, sentences, text_chars, audio_s=None):
+        # Real-time factor: seconds spent synthesizing per second of speech; below 1 keeps up with playback
+        rtf = total_s / audio_s if audio_s else None
+        with self._lock:
+            self._records.append({
+                "service": service, "first_audio_s": first_audio_s, "total_s": total_s,
+                "sentences": sentences, "chars": text_chars, "audio_s": audio_s, "rtf": rtf,
+            })
+        rtf_text = f", RTF {rtf:.2f}" if rtf is not None else ""
+        logger.info(f"🔊 {service}: first audio {first_audio_s:.2f}s, total {total_s:.2f}s, "
+                    f"{sentences} sentence(s){rtf_text}")
+
+    def summary(self):
+        with self._lock:
+            records = list(self._records)
+        summary = {}
+        for service in {r["service"] for r in records}:
+            firsts = sorted(r["first_audio_s"] for r in records if r["service"] == service)
+            totals = [r["total_s"] for r in records if r["service"] == service]
+            rtfs = sorted(r["rtf"] for r in records if r["service"] == service and r["rtf"] is not None)
+            summary[service] = {
+                "requests": len(firsts),
+                "first_audio_p50_s": round(firsts[len(firsts) // 2], 3),
+                "first_audio_p95_s": round(firsts[min(len(firsts) - 1, int(len(firsts) * 0.95))], 3),
+                "total_avg_s": round(sum(totals) / len(totals), 3),
+            }
+            if rtfs:
+                summary[service]["rtf_p50"] = round(rtfs[len(rtfs) // 2], 3)
+                summary[service]["rtf_p95"] = round(rtfs[min(len(rtfs) - 1, int(len(rtfs) * 0.95))], 3)
+        return summary
+
+
+class _SpeechTimer:
+    """Measures one synthesis; call first_audio() when the first chunk arrives"""
+
+    def __init__(self, metrics, service, text_chars):
+        self.metrics = metrics
+        self.service = service
+        self.text_chars = text_chars
+        self.sentences = 0
+        self.audio_s = 0.0
+        self.start = time.perf_counter()
+        self.first_audio_s = None
+
+    def first_audio(self):
+        if self.first_audio_s is None:
+            self.first_audio_s = time.perf_counter() - self.start
+
+    def chunk(self, audio_s=None):
+        self.first_audio()
+        self.sentences += 1
+        if audio_s is None:
+            self.audio_s = None
+        elif self.audio_s is not None:
+            self.audio_s += audio_s
+
+    def done(self):
+        total = time.perf_counter() - self.start
+        self.metrics.record(self.service, self.first_audio_s if self.first_audio_s is not None else total,
+                            total, self.sentences, self.text_chars, self.audio_s or None)
+
+
+speech_metrics = SpeechMetrics()
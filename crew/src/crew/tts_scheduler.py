@@ -0,0 +1,318 @@
+"""Hedged, health-aware scheduling of speech synthesis across TTS backends.
+
+Every backend keeps a rolling window of request latencies and outcomes. A
+backend that keeps failing has its circuit opened: it is skipped until a
+backoff expires, then a single probe request decides whether it closes again
+or stays open for twice as long. A request starts on the chosen backend if its
+circuit allows it; when that hasn't answered within the backend's own p95
+latency, a hedged request goes to the next backend in fallback order and
+whichever audio arrives first wins. A failure moves on to the next backend
+immediately, and one that stalls past its attempt timeout is abandoned for
+the next instead of using up the whole request budget. A losing hedge is not
+cancelled: it runs on to its own timeout so the health window learns how it
+really went.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+from src.crew.audio_cache import audio_key, get_audio_cache
+from src.crew.tts import TTS_TIMEOUT_S, fallback_order, get_backend
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+HEALTH_WINDOW = 50
+FAILURE_THRESHOLD = 3  # consecutive failures that open the circuit
+ERROR_RATE_THRESHOLD = 0.5
+MIN_ERROR_SAMPLES = 10
+BREAKER_BACKOFF_S = 5.0
+MAX_BREAKER_BACKOFF_S = 300.0
+DEFAULT_HEDGE_DELAY_S = 3.0  # until a backend has enough samples for a p95
+MIN_HEDGE_SAMPLES = 8
+MIN_HEDGE_DELAY_S = 0.25
+ATTEMPT_TIMEOUT_S = 20.0  # one backend; TTS_TIMEOUT_S bounds the whole request
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+class BackendHealth:
+    """Rolling latency/error window and circuit breaker for one backend"""
+
+    def __init__(self, name, window=HEALTH_WINDOW, clock=time.monotonic):
+        self.name = name
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._samples = deque(maxlen=window)  # (latency_s, ok)
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.backoff_s = BREAKER_BACKOFF_S
+        self.retry_at = 0.0
+        self.trips = 0
+
+    def allow(self):
+        """Whether a request may go to this backend now; an expired backoff lets one probe through"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and self._clock() >= self.retry_at:
+                self.state = HALF_OPEN
+                logger.info(f"🩺 Probing {self.name} after {self.backoff_s:.0f}s open")
+                return True
+            return False
+
+    def record(self, latency_s, ok):
+        with self._lock:
+            self._samples.append((latency_s, ok))
+            if ok:
+                self.consecutive_failures = 0
+                if self.state != CLOSED:
+                    logger.info(f"✅ {self.name} circuit closed")
+                    self.state = CLOSED
+                    self.backoff_s = BREAKER_BACKOFF_S
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN:
+                self._open(min(self.backoff_s * 2, MAX_BREAKER_BACKOFF_S))
+            elif self.state == CLOSED and self._failing():
+                self._open(BREAKER_BACKOFF_S)
+
+    def release(self):
+        """Forget a request that was cancelled before it finished, e.g. a losing hedge"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                # The probe proved nothing; let the next request probe again
+                self.state = OPEN
+                self.retry_at = self._clock()
+
+    def _failing(self):
+        if self.consecutive_failures >= FAILURE_THRESHOLD:
+            return True
+        if len(self._samples) < MIN_ERROR_SAMPLES:
+            return False
+        return sum(not ok for _, ok in self._samples) / len(self._samples) >= ERROR_RATE_THRESHOLD
+
+    def _open(self, backoff_s):
+        self.state = OPEN
+        self.backoff_s = backoff_s
+        self.retry_at = self._clock() + backoff_s
+        self.trips += 1
+        logger.warning(f"⛔ {self.name} circuit open for {backoff_s:.0f}s "
+                       f"after {self.consecutive_failures} consecutive failure(s)")
+
+    def hedge_delay(self):
+        """Seconds to wait for this backend before hedging: the p95 of its recent successes"""
+        with self._lock:
+            latencies = [latency for latency, ok in self._samples if ok]
+        if len(latencies) < MIN_HEDGE_SAMPLES:
+            return DEFAULT_HEDGE_DELAY_S
+        return max(MIN_HEDGE_DELAY_S, _percentile(latencies, 0.95))
+
+    def stats(self):
+        with self._lock:
+            samples = list(self._samples)
+            state, trips, retry_at = self.state, self.trips, self.retry_at
+        latencies = [latency for latency, ok in samples if ok]
+        stats = {
+            "state": state,
+            "requests": len(samples),
+            "error_rate": round(sum(not ok for _, ok in samples) / len(samples), 3) if samples else 0.0,
+            "trips": trips,
+        }
+        if latencies:
+            stats["p50_s"] = round(_percentile(latencies, 0.5), 3)
+            stats["p95_s"] = round(_percentile(latencies, 0.95), 3)
+        if state == OPEN:
+            stats["retry_in_s"] = round(max(0.0, retry_at - self._clock()), 1)
+        return stats
+
+
+class TTSScheduler:
+    """Routes synthesis across backends with circuit breakers and hedged requests"""
+
+    def __init__(self, hedging=True, timeout_s=TTS_TIMEOUT_S, attempt_timeout_s=ATTEMPT_TIMEOUT_S, window=200):
+        self.hedging = hedging
+        self.timeout_s = timeout_s
+        self.attempt_timeout_s = min(attempt_timeout_s, timeout_s)
+        self._lock = threading.Lock()
+        self._health = {}
+        self._latencies = deque(maxlen=window)  # seconds until a step's audio was ready
+        self.counters = {"requests": 0, "failed": 0, "hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+    def health(self, name):
+        with self._lock:
+            if name not in self._health:
+                self._health[name] = BackendHealth(name)
+            return self._health[name]
+
+    def pick(self, primary=None, exclude=()):
+        """Backend a single, unhedged request should use: the first in fallback order whose circuit allows it"""
+        primary = get_backend(primary).name
+        candidates = [b for b in fallback_order(primary) if b.name not in exclude]
+        for backend in candidates:
+            if self.health(backend.name).allow():
+                return backend
+        if not candidates:
+            raise LookupError("No text-to-speech backend is available")
+        # Every circuit is open: trying beats staying silent
+        return candidates[-1]
+
+    def voice(self, backend, primary, voice):
+        """The caller's voice only applies to the backend it was chosen for"""
+        return backend.voice_for(voice if backend.name == primary else None)
+
+    def cached(self, text, primary=None, voice=None):
+        """(audio, backend) for a text already synthesized by any backend in fallback order, else (None, None)"""
+        primary = get_backend(primary).name
+        cache = get_audio_cache()
+        for backend in fallback_order(primary):
+            audio_bytes = cache.get(audio_key(text, backend.name, self.voice(backend, primary, voice)))
+            if audio_bytes:
+                return audio_bytes, backend
+        return None, None
+
+    def report(self, backend, latency_s, ok):
+        """Record the outcome of a request made outside synthesize(), such as a streamed step"""
+        self.health(backend.name).record(latency_s, ok)
+
+    def observe(self, latency_s, ok=True):
+        """Record how long a step waited for its audio"""
+        with self._lock:
+            self.counters["requests"] += 1
+            if ok:
+                self._latencies.append(latency_s)
+            else:
+                self.counters["failed"] += 1
+
+    def _count(self, counter):
+        with self._lock:
+            self.counters[counter] += 1
+
+    async def synthesize(self, text, primary=None, voice=None, hedge=None, exclude=()):
+        """Whole-text audio and the backend that produced it, or (None, None) if every backend failed.
+
+        Runs on the background loop. Audio any backend in fallback order already
+        made is reused; the winning audio is stored in the audio cache under its
+        own backend's key.
+        """
+        primary = get_backend(primary).name
+        audio_bytes, backend = await asyncio.to_thread(self.cached, text, primary, voice)
+        if audio_bytes and backend.name not in exclude:
+            self.observe(0.0)
+            return audio_bytes, backend
+        hedge = self.hedging if hedge is None else hedge
+        candidates = [b for b in fallback_order(primary) if b.name not in exclude]
+        queue = list(candidates)
+        pending = {}  # task -> backend
+        start = time.perf_counter()
+        deadline = start + self.timeout_s
+        hedge_at = None
+
+        def launch(force=False):
+            """Start the next backend whose circuit allows it and schedule the hedge after it"""
+            nonlocal hedge_at
+            while queue:
+                backend = queue.pop(0)
+                if not force and not self.health(backend.name).allow():
+                    continue
+                task = asyncio.ensure_future(self._attempt(backend, text, self.voice(backend, primary, voice)))
+                pending[task] = backend
+                hedge_at = time.perf_counter() + self.health(backend.name).hedge_delay() if hedge else None
+                return True
+            return False
+
+        if not launch() and candidates:
+            # Every circuit is open: trying the last resort beats staying silent
+            queue.append(candidates[-1])
+            launch(force=True)
+        first = next(iter(pending), None)
+        won = False
+        try:
+            while pending:
+                now = time.perf_counter()
+                if now >= deadline:
+                    logger.warning(f"TTS timed out after {self.timeout_s:.0f}s")
+                    break
+                wake_at = min(deadline, hedge_at) if hedge_at is not None and queue else deadline
+                done, _ = await asyncio.wait(list(pending), timeout=max(0.0, wake_at - now),
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if hedge_at is not None and queue and time.perf_counter() >= hedge_at and launch():
+                        self._count("hedged")
+                        logger.info(f"⏱️ Hedging TTS after {time.perf_counter() - start:.2f}s: "
+                                    f"{', '.join(b.name for b in pending.values())}")
+                    continue
+                for task in done:
+                    backend = pending.pop(task)
+                    audio_bytes = task.result()
+                    if not audio_bytes:
+                        continue
+                    won = True
+                    if task is not first:
+                        self._count("hedge_wins" if first in pending else "failovers")
+                    get_audio_cache().put(audio_key(text, backend.name, self.voice(backend, primary, voice)),
+                                          audio_bytes)
+                    self.observe(time.perf_counter() - start)
+                    return audio_bytes, backend
+                if not pending:
+                    # Don't wait for a hedge delay once every running backend has given up
+                    launch()
+        finally:
+            # Losing hedges run on to their own timeout so their outcome still reaches the health window
+            if not won:
+                for task in pending:
+                    task.cancel()
+        self.observe(time.perf_counter() - start, ok=False)
+        return None, None
+
+    async def _attempt(self, backend, text, voice):
+        """One backend's synthesis, bounded by the attempt timeout; records its own outcome"""
+        health = self.health(backend.name)
+        start = time.perf_counter()
+        try:
+            audio_bytes = await asyncio.wait_for(backend.synthesize(text, voice), self.attempt_timeout_s)
+        except asyncio.CancelledError:
+            health.release()
+            raise
+        except Exception as e:
+            logger.warning(f"{backend.name} failed: {str(e) or type(e).__name__}")
+            audio_bytes = None
+        health.record(time.perf_counter() - start, bool(audio_bytes))
+        return audio_bytes
+
+    def stats(self):
+        with self._lock:
+            latencies = list(self._latencies)
+            stats = dict(self.counters)
+            backends = dict(self._health)
+        stats["hedging"] = self.hedging
+        if latencies:
+            stats["audio_p50_s"] = round(_percentile(latencies, 0.5), 3)
+            stats["audio_p95_s"] = round(_percentile(latencies, 0.95), 3)
+            stats["audio_p99_s"] = round(_percentile(latencies, 0.99), 3)
+        stats["backends"] = {name: health.stats() for name, health in backends.items()}
+        return stats
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_tts_scheduler():
+    """Process-wide TTS scheduler, so backend health is shared by every session"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = TTSScheduler(
+                hedging=os.getenv("TTS_HEDGING", "1") != "0",
+                attempt_timeout_s=float(os.getenv("TTS_ATTEMPT_TIMEOUT_S", ATTEMPT_TIMEOUT_S)),
+            )
+        return _scheduler
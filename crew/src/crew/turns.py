@@ -0,0 +1,296 @@
+"""The turn pipeline of one conversation, shared by the Streamlit UI and the API.
+
+Inputs are routed locally first: step navigation, substitutions the local
+index knows and quantity questions never reach the crew, and a context-free
+first turn can be answered from the response cache. Anything else becomes a
+kickoff on the process-wide worker pool, and its result is ingested into
+messages, notes and the recipe plan once it finishes. Messages, notes and
+plan live in the session store; only the most recent ones are kept in memory.
+
+Callers own everything around a turn: which trace is active, how a busy
+session or saturated pool is reported, and how answers are shown or spoken.
+"""
+import logging
+
+from src.crew.context_builder import new_context_builder
+from src.crew.cook_crew import STREAMING, get_shared_crews, run_cooking_crew
+from src.crew.intent_router import CONVERSION, NAVIGATION, SUBSTITUTION, TOPIC, get_router
+from src.crew.jobs import DONE, FAILED, JobQueueFull, get_job_runner
+from src.crew.messages import (
+    RECIPE_STEP, SYSTEM, ChatMessage, build_message, message_to_dict, parse_json_response,
+    recipe_message, system_message, text_message,
+)
+from src.crew.quantities import answer_quantity_question
+from src.crew.recipe_session import RecipeSession
+from src.crew.response_cache import get_response_cache
+from src.crew.streaming import TokenStream
+from src.crew.substitutions import get_substitution_index
+from src.crew.tracing import activate, current_trace, span
+
+logger = logging.getLogger(__name__)
+
+MAX_MEMORY_MESSAGES = 60
+MAX_MEMORY_NOTES = 20
+BUSY_MESSAGE = "🚦 The kitchen is very busy right now. Please try again in a moment!"
+
+
+class SessionBusy(Exception):
+    """Raised when a conversation already has a kickoff in flight"""
+
+
+class Conversation:
+    """Messages, notes, topic and recipe plan of one conversation, backed by the session store"""
+
+    def __init__(self, session_id, state, store, max_messages=MAX_MEMORY_MESSAGES):
+        self.id = session_id
+        self.store = store
+        self.max_messages = max_messages
+        self.history = store.read_messages(session_id, max_messages) if state["message_count"] else []
+        self.notes = store.read_notes(session_id, MAX_MEMORY_NOTES) if state["note_count"] else []
+        self.message_total = state["message_count"]
+        self.notes_total = state["note_count"]
+        self.topic = state["topic"]
+        self.current_step = state["current_step"]
+        self.recipe_session = state["recipe_session"]
+        # Without memory every question is answered on its own: no context, no topic switches
+        self.memory_active = True
+        self.context = new_context_builder()
+        self.pending = None
+        self._saved = self._save_key()
+
+    @classmethod
+    def load(cls, store, session_id, **kwargs):
+        """The stored conversation, or None if the store doesn't know it"""
+        state = store.load_state(session_id) if session_id else None
+        return cls(session_id, state, store, **kwargs) if state is not None else None
+
+    @classmethod
+    def create(cls, store, **kwargs):
+        return cls.load(store, store.create_session(), **kwargs)
+
+    @property
+    def busy(self):
+        return self.pending is not None
+
+    def add_message(self, message):
+        self.store.append_message(self.id, message)
+        self.message_total += 1
+        self.history.append(message)
+        del self.history[:-self.max_messages]
+
+    def add_note(self, note):
+        self.store.append_note(self.id, note)
+        self.notes_total += 1
+        self.notes.append(note)
+        del self.notes[:-MAX_MEMORY_NOTES]
+
+    def _save_key(self):
+        session = self.recipe_session
+        return (self.topic, self.current_step, id(session),
+                session.index if session else None, session.finished if session else None)
+
+    def save(self):
+        """Persist topic, step and plan position if they changed since the last save"""
+        key = self._save_key()
+        if key != self._saved:
+            self.store.save_state(self.id, self.topic, self.current_step, self.recipe_session)
+            self._saved = key
+
+    def show_step(self, input_text):
+        """Append the plan's current step to the chat without calling the crew"""
+        response = self.recipe_session.as_response()
+        if not self.recipe_session.finished:
+            self.add_note(response["notes_making"])
+            self.current_step = f"Step {self.recipe_session.current.number}"
+        else:
+            self.current_step = None
+        self.add_message(recipe_message(input_text, response["cook_recipe"], response["notes_making"]))
+
+    def add_crew_message(self, message):
+        """Append a parsed crew answer and update the recipe step state from it"""
+        if message.kind == RECIPE_STEP:
+            if message.notes:
+                self.add_note(message.notes)
+            # An active plan owns the step pointer
+            if message.step_number and not self.recipe_session:
+                self.current_step = f"Step {message.step_number}"
+        self.add_message(message)
+
+    def is_first_turn(self):
+        """True while the conversation has no context that could change the answer"""
+        return not self.recipe_session and not any(m.kind != SYSTEM for m in self.history)
+
+    def serve_cached(self, input_text, topic):
+        """Answer a context-free first turn from the response cache; False on a miss"""
+        cached = get_response_cache().lookup(input_text, topic)
+        if cached is None:
+            return False
+        payload, tier = cached
+        if payload["kind"] == "plan":
+            session = RecipeSession.from_plan(payload["data"], topic)
+            if not session:
+                return False
+            self.recipe_session = session
+            self.show_step(input_text)
+        else:
+            self.add_crew_message(ChatMessage(question=input_text, **payload["data"]))
+        logger.info(f"✅ Served first turn of session {self.id} from the {tier} response cache")
+        return True
+
+    def context_query(self, input_text):
+        """Wrap the question with the plan, recipe notes and recent conversation"""
+        if not self.memory_active:
+            return input_text
+        with span("build context", "context") as attrs:
+            context = self.context.build(self.history, self.notes, self.recipe_session,
+                                         notes_total=self.notes_total)
+            attrs["tokens"] = self.context.last_tokens
+        if not context:
+            return input_text
+        return f"""
+Current question: "{input_text}"
+
+Context:
+{context}
+
+Please respond to the current question considering the context and previous steps.
+"""
+
+    def submit(self, kind, input_text, query, topic=None, cacheable=False, on_first_sentence=None):
+        """Queue a kickoff on the shared worker pool under the active trace; raises JobQueueFull when saturated"""
+        crews = get_shared_crews()
+        crew = crews.planning_crew() if kind == "plan" else crews.cooking_crew()
+        stream = None
+        if STREAMING and kind == "turn":
+            # Start speaking the first sentence while the rest of the answer is generated
+            stream = TokenStream(on_first_sentence=on_first_sentence)
+        job = get_job_runner().submit(run_cooking_crew, crew, {"user_query": query},
+                                      label=f"{kind}: {input_text[:40]}", stream=stream, trace=current_trace())
+        self.pending = {"job": job, "kind": kind, "input": input_text, "topic": topic,
+                        "cacheable": cacheable, "on_first_sentence": on_first_sentence}
+        return self.pending
+
+    def start_turn(self, input_text, on_first_sentence=None):
+        """Route one input; returns the pending kickoff, or None when it was answered here.
+
+        on_first_sentence is called with the first sentence of a streamed answer.
+        Raises SessionBusy while another kickoff is in flight and JobQueueFull
+        when the worker pool is saturated.
+        """
+        try:
+            return self._route(input_text, on_first_sentence)
+        finally:
+            self.save()
+
+    def _route(self, input_text, on_first_sentence):
+        with span("route", "router"):
+            intent = get_router().route(input_text, self.topic)
+        new_topic = intent.topic if intent.kind == TOPIC else None
+        logger.debug(f"Routed input as {intent.kind} (topic={intent.topic}, command={intent.command})")
+
+        # Navigation commands are served from the stored step plan
+        session = self.recipe_session
+        if session and intent.kind == NAVIGATION and session.navigate(intent.command) is not None:
+            self.show_step(input_text)
+            logger.info(f"✅ Served {self.current_step or 'completion'} from recipe plan")
+            return None
+
+        # Substitution questions about a known ingredient are answered from the local index
+        if intent.kind == SUBSTITUTION:
+            with span("substitutions", "router"):
+                answer = get_substitution_index().answer(input_text, intent.topic)
+            if answer:
+                self.add_message(text_message(input_text, answer))
+                logger.info("✅ Served substitution from local index")
+                return None
+
+        # Conversions and "make it for 6 people" are worked out locally from the step plan
+        if intent.kind == CONVERSION:
+            with span("quantities", "router"):
+                reply = answer_quantity_question(input_text, session, self.notes)
+            if reply and reply.scaled:
+                self.add_message(system_message(f"⚖️ {reply.text}"))
+                self.add_note(reply.text)
+                self.show_step(input_text)
+            elif reply:
+                self.add_message(text_message(input_text, reply.text))
+            if reply:
+                logger.info(f"✅ Served {'scaling' if reply.scaled else 'conversion'} locally")
+                return None
+
+        if self.busy:
+            raise SessionBusy(self.id)
+
+        # Context-free opening questions are often asked before
+        first_turn = self.is_first_turn()
+        if first_turn and self.serve_cached(input_text, intent.topic):
+            if self.memory_active and new_topic:
+                self.topic = new_topic
+            return None
+
+        if self.memory_active and new_topic and new_topic != self.topic:
+            if self.topic:
+                self.add_message(system_message(f"🔄 Switched topic from {self.topic} to {new_topic}"))
+            self.topic = new_topic
+            self.current_step = None
+            self.recipe_session = None
+
+        # First request for a dish: generate the whole plan once and serve step 1 from it
+        session = self.recipe_session
+        if new_topic and (session is None or session.topic != new_topic):
+            logger.info(f"Planning recipe: {new_topic}")
+            return self.submit("plan", input_text, input_text, topic=new_topic, cacheable=first_turn,
+                               on_first_sentence=on_first_sentence)
+        logger.info(f"Processing query: {input_text[:50]}...")
+        return self.submit("turn", input_text, self.context_query(input_text), topic=intent.topic,
+                           cacheable=first_turn, on_first_sentence=on_first_sentence)
+
+    def finish_turn(self, pending):
+        """Ingest a finished kickoff under its trace; returns a follow-up kickoff if the plan fell back to a turn"""
+        self.pending = None
+        try:
+            with activate(pending["job"].trace):
+                return self._ingest(pending)
+        finally:
+            self.save()
+
+    def _ingest(self, pending):
+        job, input_text = pending["job"], pending["input"]
+        if job.status == FAILED:
+            self.add_message(text_message(input_text, f"🚫 Sorry, I encountered an error: {job.error}. "
+                                                      f"Please try again!"))
+            return None
+        if job.status != DONE:
+            self.add_message(system_message(f"⏹️ Stopped working on \"{input_text}\""))
+            return None
+
+        if pending["kind"] == "plan":
+            with span("parse response", "parse"):
+                plan = parse_json_response(job.result)
+                session = RecipeSession.from_plan(plan, pending["topic"])
+            if session:
+                if pending["cacheable"]:
+                    get_response_cache().put(input_text, {"kind": "plan", "data": plan}, pending["topic"])
+                self.recipe_session = session
+                self.show_step(input_text)
+                logger.info(f"✅ Planned {session.total} steps for {session.dish} in {job.elapsed:.1f}s")
+                return None
+            logger.warning("Recipe planning returned no steps, falling back to step-by-step crew")
+            try:
+                return self.submit("turn", input_text, self.context_query(input_text),
+                                   on_first_sentence=pending["on_first_sentence"])
+            except JobQueueFull:
+                self.add_message(text_message(input_text, BUSY_MESSAGE))
+                logger.warning("Crew worker pool saturated, rejected plan fallback")
+                return None
+
+        # Parse the response once; renderers only read the stored record
+        with span("parse response", "parse"):
+            message = build_message(input_text, job.result)
+        if pending["cacheable"]:
+            # Timestamps belong to the message being answered, not the cached one
+            data = {k: v for k, v in message_to_dict(message).items() if k not in ("question", "created")}
+            get_response_cache().put(input_text, {"kind": "turn", "data": data}, pending["topic"])
+        self.add_crew_message(message)
+        logger.info(f"✅ Query processed successfully in {job.elapsed:.1f}s")
+        return None
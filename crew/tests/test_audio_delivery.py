@@ -0,0 +1,76 @@
+"""Publishing synthesized audio by content hash, one stored copy per clip"""
+import os
+import threading
+import time
+
+from src.crew.audio_cache import AudioCache, audio_key, content_key
+from src.crew.audio_delivery import AudioStore, variant_key
+
+WAV = b"RIFF\x24\x1f\x00\x00WAVE" + bytes(8000)
+WEBM = b"\x1a\x45\xdf\xa3" + bytes(40)
+
+
+class GatedEncoder:
+    """Stands in for ffmpeg; each encode waits until the test opens the gate"""
+
+    name = "opus"
+
+    def __init__(self):
+        self.gate = threading.Event()
+        self.calls = 0
+
+    def available(self):
+        return True
+
+    def encode(self, data):
+        self.calls += 1
+        self.gate.wait(5)
+        return WEBM
+
+
+def wait_until_encoded(store):
+    deadline = time.monotonic() + 5
+    while store.stats()["encoding"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+def audio_files(cache):
+    return [name for name in os.listdir(cache.cache_dir) if name.endswith(".audio")]
+
+
+def test_publish_serves_the_clip_until_its_compact_copy_is_ready(tmp_path):
+    encoder = GatedEncoder()
+    store = AudioStore(cache=AudioCache(cache_dir=str(tmp_path)), encoder=encoder)
+
+    started = time.perf_counter()
+    assert store.publish(WAV) == content_key(WAV)
+    assert store.publish(WAV) == content_key(WAV)
+    assert time.perf_counter() - started < 1
+
+    encoder.gate.set()
+    wait_until_encoded(store)
+    assert store.publish(WAV) == variant_key(content_key(WAV), "opus")
+    assert store.get(variant_key(content_key(WAV), "opus")) == WEBM
+    assert encoder.calls == 1
+
+
+def test_a_cached_step_and_its_published_clip_are_one_copy(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path))
+    key = audio_key("Stir the sauce gently.", "Edge TTS", "en-US-AriaNeural")
+    cache.put(key, WAV)
+
+    assert AudioStore(cache=cache).publish(WAV, compact=False) == content_key(WAV)
+    assert audio_files(cache) == [f"{content_key(WAV)}.audio"]
+    assert cache.get(key) == WAV
+    # The link survives a restart, and another process sharing the directory follows it
+    assert AudioCache(cache_dir=str(tmp_path)).get(key) == WAV
+
+
+def test_evicting_a_clip_drops_the_keys_linked_to_it(tmp_path):
+    cache = AudioCache(cache_dir=str(tmp_path), max_disk_bytes=len(WAV) + 100)
+    cache.put("step one", WAV)
+    cache.put("step two", WEBM + bytes(len(WAV)))
+
+    assert "step one" not in cache
+    assert not os.path.exists(tmp_path / "step one.ref")
+    assert AudioCache(cache_dir=str(tmp_path)).stats()["links"] == 1
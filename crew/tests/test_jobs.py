@@ -0,0 +1,34 @@
+"""Cancellation of a running cooking crew kickoff"""
+import pytest
+
+pytest.importorskip("crewai_tools")
+
+from crewai.llms.base_llm import BaseLLM  # noqa: E402
+
+from src.crew import cook_crew  # noqa: E402
+from src.crew.jobs import CrewJob, JobCancelled  # noqa: E402
+
+
+class CancellingLLM(BaseLLM):
+    """Counts calls and cancels the job during the first one, as a user pressing stop would"""
+
+    def __init__(self, job):
+        super().__init__(model="cancelling")
+        self.job = job
+        self.calls = 0
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        self.calls += 1
+        self.job.cancel()
+        return "Thought: I know the answer\nFinal Answer: Boil the pasta in salted water."
+
+
+def test_cancelled_job_makes_no_further_llm_calls(monkeypatch):
+    job = CrewJob("test")
+    llm = CancellingLLM(job)
+    monkeypatch.setattr(cook_crew, "llm", llm)
+    crew = cook_crew.CookCrew().cooking_crew()
+
+    with pytest.raises(JobCancelled):
+        cook_crew.run_cooking_crew(job, crew, {"user_query": "How do I cook pasta?"})
+    assert llm.calls == 1
@@ -0,0 +1,58 @@
+"""Exact and semantic tiers of the first-turn response cache"""
+import pytest
+
+from src.crew.intent_router import get_router
+from src.crew.response_cache import EXACT, SEMANTIC, ResponseCache
+
+FIRST_TURNS = ["How do I make carbonara?", "How do I make banana bread?", "How do I make chicken tikka masala?",
+               "What can I substitute for eggs in cookies?", "How do I make slow cooker beef stew?"]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ResponseCache(db_path=str(tmp_path / "responses.sqlite3"))
+    for question in FIRST_TURNS:
+        cache.put(question, {"question": question}, get_router().detect_topic(question))
+    return cache
+
+
+def lookup(cache, question):
+    return cache.lookup(question, get_router().detect_topic(question))
+
+
+def test_exact_tier_ignores_case_and_punctuation(cache):
+    assert lookup(cache, "how do i make CARBONARA") == ({"question": "How do I make carbonara?"}, EXACT)
+
+
+@pytest.mark.parametrize("question, cached", [
+    ("How do I make carbonera?", "How do I make carbonara?"),
+    ("how do I make bananna bread", "How do I make banana bread?"),
+    ("how to make chiken tikka masala", "How do I make chicken tikka masala?"),
+    ("what can i substitue for eggs in cookies", "What can I substitute for eggs in cookies?"),
+    ("carbonara recipe please", "How do I make carbonara?"),
+    ("egg substitute for cookies", "What can I substitute for eggs in cookies?"),
+])
+def test_typos_and_rewordings_are_served_from_the_semantic_tier(cache, question, cached):
+    assert lookup(cache, question) == ({"question": cached}, SEMANTIC)
+
+
+@pytest.mark.parametrize("question", [
+    "what to serve with chicken tikka masala",
+    "how do I make paneer tikka masala",
+    "how do I make vegan carbonara",
+    "can I freeze slow cooker beef stew",
+    "what can I substitute for eggs in pancakes",
+    "how do I make beef stwe",
+])
+def test_different_questions_about_the_same_dish_miss(cache, question):
+    assert lookup(cache, question) is None
+
+
+def test_embeddings_from_an_older_version_are_rebuilt(tmp_path):
+    path = str(tmp_path / "responses.sqlite3")
+    ResponseCache(db_path=path).put("How do I make carbonara?", {"question": "carbonara"}, "carbonara")
+    stale = ResponseCache(db_path=path)._conn
+    stale.execute("UPDATE responses SET embedding = zeroblob(2048)")
+    stale.execute("PRAGMA user_version = 1")
+
+    assert lookup(ResponseCache(db_path=path), "How do I make carbonera?") == ({"question": "carbonara"}, SEMANTIC)
@@ -0,0 +1,74 @@
+"""The turn pipeline shared by the UI and the API"""
+import pytest
+
+pytest.importorskip("crewai_tools")
+
+from src.crew import turns  # noqa: E402
+from src.crew.jobs import DONE, CrewJob, JobQueueFull  # noqa: E402
+from src.crew.messages import text_message  # noqa: E402
+from src.crew.tools.contextsaver import SessionStore  # noqa: E402
+
+
+class Crews:
+    def planning_crew(self):
+        return "planning"
+
+    def cooking_crew(self):
+        return "cooking"
+
+
+class Runner:
+    """Records kickoffs instead of running them, or rejects them when full"""
+
+    def __init__(self, full=False):
+        self.full = full
+        self.submitted = []
+
+    def submit(self, fn, crew, inputs, label="", stream=None, trace=None):
+        if self.full:
+            raise JobQueueFull("full")
+        self.submitted.append((crew, inputs["user_query"]))
+        return CrewJob(label)
+
+
+class MissingCache:
+    def lookup(self, text, topic=None):
+        return None
+
+    def put(self, text, payload, topic=None):
+        pass
+
+
+@pytest.fixture
+def conversation(tmp_path, monkeypatch):
+    runner = Runner()
+    monkeypatch.setattr(turns, "get_shared_crews", Crews)
+    monkeypatch.setattr(turns, "get_job_runner", lambda: runner)
+    monkeypatch.setattr(turns, "get_response_cache", MissingCache)
+    conversation = turns.Conversation.create(SessionStore(str(tmp_path / "sessions.db")))
+    conversation.runner = runner
+    return conversation
+
+
+def test_memory_off_plans_without_switching_topic(conversation):
+    conversation.topic = "pancakes"
+    conversation.add_message(text_message("how do I make pancakes", "Mix the batter."))
+    conversation.memory_active = False
+
+    conversation.start_turn("how do I make lasagna")
+
+    assert conversation.runner.submitted == [("planning", "how do I make lasagna")]
+    assert conversation.topic == "pancakes"
+    assert conversation.message_total == 1
+
+
+def test_plan_fallback_reports_a_full_pool(conversation):
+    job = CrewJob("plan")
+    job.status, job.result = DONE, "Sorry, no steps here."
+    conversation.runner.full = True
+
+    follow_up = conversation.finish_turn({"job": job, "kind": "plan", "input": "how do I make lasagna",
+                                          "topic": "lasagna", "cacheable": False, "on_first_sentence": None})
+
+    assert follow_up is None and not conversation.busy
+    assert conversation.history[-1].step_text == turns.BUSY_MESSAGE